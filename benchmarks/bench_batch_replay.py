@@ -0,0 +1,85 @@
+# benchmarks/bench_batch_replay.py
+# -*- coding: utf-8 -*-
+"""
+Vazão do processamento em lote contra o servidor local de reprodução (benchmarks/stub_server.py),
+sem acessar o TJ-MS nem o OpenRouter. Compara o lote com threads e o lote assíncrono
+(se o aiohttp estiver instalado) sob a mesma latência e taxa de falhas injetadas.
+
+Uso:
+    python benchmarks/bench_batch_replay.py [--processos 40] [--movimentos 300]
+        [--latencia-soap 0.5] [--latencia-llm 2] [--taxa-erro 0.05] [--cassetes gravacoes/]
+"""
+
+import os
+import sys
+import time
+import logging
+import argparse
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.stub_server import StubServer, StubConfig  # noqa: E402
+
+
+def _percentil(valores, p):
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(round((len(ordenados) - 1) * p / 100)))] if ordenados else 0.0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processos", type=int, default=40)
+    parser.add_argument("--movimentos", type=int, default=300, help="Movimentos do XML sintético")
+    parser.add_argument("--cassetes", help="Reproduz cassetes gravados (os números vêm dos cassetes SOAP)")
+    parser.add_argument("--latencia-soap", type=float, default=0.5)
+    parser.add_argument("--latencia-llm", type=float, default=2.0)
+    parser.add_argument("--taxa-erro", type=float, default=0.0)
+    parser.add_argument("--taxa-desconexao", type=float, default=0.0)
+    parser.add_argument("--semente", type=int, default=1)
+    parser.add_argument("--modo", choices=("threads", "async", "ambos"), default="ambos")
+    args = parser.parse_args(argv)
+
+    cfg = StubConfig(latencia_soap=args.latencia_soap, latencia_llm=args.latencia_llm, taxa_erro=args.taxa_erro,
+                     taxa_desconexao=args.taxa_desconexao, sintetico=args.movimentos, semente=args.semente)
+    stub = StubServer(args.cassetes, cfg)
+    url = stub.start()
+
+    # Os endpoints e chaves são lidos do ambiente na importação de config: definir antes de importar o pipeline
+    os.environ.update({"AJG_TJ_WSDL_URL": f"{url}/soap", "AJG_OPENROUTER_ENDPOINT": f"{url}/llm",
+                       "OPENROUTER_API_KEY": os.environ.get("OPENROUTER_API_KEY") or "sk-or-teste-local",
+                       "AJG_SOAP_CACHE": "0", "AJG_LLM_CACHE": "0", "AJG_METRICS": "0"})
+    from scripts.batch import BatchRunner
+    # As falhas injetadas já aparecem na tabela; o log de cada uma só poluiria a saída
+    logging.getLogger("RelatorioTJMS").setLevel(logging.CRITICAL)
+
+    numeros = sorted(stub.soap) if args.cassetes and stub.soap else \
+        [f"{i:07d}5620238120001" for i in range(1, args.processos + 1)]
+    modos = ["threads", "async"] if args.modo == "ambos" else [args.modo]
+    if "async" in modos:
+        try:
+            import aiohttp  # noqa: F401
+        except ImportError:
+            print("aiohttp não instalado: modo async ignorado.")
+            modos.remove("async")
+
+    print(f"{len(numeros)} processos · SOAP ~{args.latencia_soap}s · LLM ~{args.latencia_llm}s · "
+          f"erro {args.taxa_erro:.0%} · desconexão {args.taxa_desconexao:.0%} · semente {args.semente}")
+    print(f"{'modo':<8} {'total':>8} {'proc/s':>8} {'p50':>7} {'p95':>7} {'OK':>5} {'erros':>6}  servidor")
+    for modo in modos:
+        stub.reset()
+        with tempfile.TemporaryDirectory() as saida:
+            inicio = time.perf_counter()
+            resultados = BatchRunner(saida, use_cache=False, use_async=(modo == "async")).run(numeros)
+            total = time.perf_counter() - inicio
+        segundos = [r["segundos"] for r in resultados]
+        ok = sum(1 for r in resultados if r["status"] == "OK")
+        print(f"{modo:<8} {total:>7.2f}s {len(numeros) / total:>8.2f} {_percentil(segundos, 50):>6.2f}s "
+              f"{_percentil(segundos, 95):>6.2f}s {ok:>5} {len(resultados) - ok:>6}  {stub.stats}")
+    stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
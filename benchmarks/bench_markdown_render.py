@@ -0,0 +1,202 @@
+# benchmarks/bench_markdown_render.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark da renderização do relatório no widget Tk: renderizador anterior
+(busca do itálico caractere a caractere, varredura do restante da linha a cada
+marcador, um insert por trecho e reconfiguração das tags a cada renderização)
+x árvore de scripts/markdown_ast.py (tokenizador em passada única) com um único
+insert em main_exe.py.
+
+A comparação da tokenização roda sem display; a renderização no Tk (com a
+conferência de texto e tags do widget) só quando há display disponível.
+
+Uso:
+    python benchmarks/bench_markdown_render.py [--itens 1000] [--repeticoes 5]
+"""
+
+import re
+import sys
+import time
+import random
+import logging
+import argparse
+from pathlib import Path
+from typing import Any, Callable, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import main_exe  # noqa: E402
+from scripts.markdown_ast import tokenize_inline, parse_markdown  # noqa: E402
+from benchmarks.synthetic import make_relatorio_markdown  # noqa: E402
+
+
+def _parts_anterior(line: str, base_style: str) -> List[Tuple[str, str]]:
+    """Cópia da tokenização do render_line anterior, mantida aqui apenas como referência de desempenho e resultado."""
+    parts = []
+    remaining = line
+    while remaining:
+        next_bold = remaining.find('**')
+        next_italic = -1
+        for i, char in enumerate(remaining):
+            if char == '*' and (i == 0 or remaining[i-1] != '*') and (i+1 >= len(remaining) or remaining[i+1] != '*'):
+                next_italic = i
+                break
+        next_quote = remaining.find('"')
+        positions = [(next_bold, 'bold'), (next_italic, 'italic'), (next_quote, 'quote')]
+        positions = [(pos, type) for pos, type in positions if pos >= 0]
+        if not positions:
+            if remaining:
+                parts.append((remaining, base_style))
+            break
+        positions.sort(key=lambda x: x[0])
+        next_pos, format_type = positions[0]
+        if next_pos > 0:
+            parts.append((remaining[:next_pos], base_style))
+        if format_type == 'bold':
+            end = remaining.find('**', next_pos + 2)
+            if end > next_pos + 2:
+                parts.append((remaining[next_pos + 2:end], 'bold'))
+                remaining = remaining[end + 2:]
+            else:
+                parts.append((remaining[next_pos:next_pos+2], base_style))
+                remaining = remaining[next_pos + 2:]
+        elif format_type == 'italic':
+            end = next_pos + 1
+            while end < len(remaining):
+                if remaining[end] == '*' and (end + 1 >= len(remaining) or remaining[end + 1] != '*'):
+                    content = remaining[next_pos + 1:end]
+                    if content and not content.isspace():
+                        parts.append((content, 'italic'))
+                        remaining = remaining[end + 1:]
+                    else:
+                        parts.append((remaining[next_pos], base_style))
+                        remaining = remaining[next_pos + 1:]
+                    break
+                end += 1
+            else:
+                parts.append((remaining[next_pos], base_style))
+                remaining = remaining[next_pos + 1:]
+        elif format_type == 'quote':
+            end = remaining.find('"', next_pos + 1)
+            if end > next_pos:
+                parts.append(('"' + remaining[next_pos + 1:end] + '"', 'quote'))
+                remaining = remaining[end + 1:]
+            else:
+                parts.append((remaining[next_pos], base_style))
+                remaining = remaining[next_pos + 1:]
+    return parts
+
+
+def _render_anterior(text_widget, markdown_text: str):
+    """Renderização anterior: tags reconfiguradas e um insert/tag_add por trecho e linha."""
+    text_widget.delete("1.0", "end")
+    text_widget._markdown_tags_ok = False
+    main_exe.configure_markdown_tags(text_widget)
+    for line in markdown_text.split('\n'):
+        if line.startswith('### '):
+            line, base_style = line[4:], "h3"
+        elif line.startswith('## '):
+            line, base_style = line[3:], "h2"
+        elif line.startswith('# '):
+            line, base_style = line[2:], "h1"
+        elif re.match(r'^\s*[-*]\s+', line):
+            line, base_style = re.sub(r'^\s*[-*]\s+', '• ', line), "list"
+        elif line.strip():
+            base_style = "normal"
+        else:
+            text_widget.insert("end", "\n")
+            continue
+        line_start = text_widget.index("end-1c")
+        for text, style in _parts_anterior(line, base_style):
+            if text:
+                text_widget.insert("end", text, (style,))
+        text_widget.insert("end", "\n")
+        if base_style not in ["h1", "h2", "h3"]:
+            text_widget.tag_add("default_spacing", line_start, text_widget.index("end-1c"))
+    text_widget.see("1.0")
+
+
+def _linhas_aleatorias(quantidade: int, semente: int = 7) -> List[str]:
+    """Linhas com marcadores mal formados, aninhados e sem fechamento, para conferir a equivalência."""
+    rnd = random.Random(semente)
+    alfabeto = ['*', '*', '**', '"', 'a', 'bc', ' ', ' ', '\t', 'á']
+    return ["".join(rnd.choice(alfabeto) for _ in range(rnd.randint(0, 24))) for _ in range(quantidade)]
+
+
+def _melhor(fn: Callable[[], Any], repeticoes: int) -> float:
+    melhor = float("inf")
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        fn()
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor
+
+
+def _estado_widget(text_widget):
+    """Texto e intervalos de cada tag do widget, para comparar as duas renderizações."""
+    tags = ("h1", "h2", "h3", "bold", "italic", "quote", "normal", "list", "default_spacing")
+    return text_widget.get("1.0", "end"), {t: [str(i) for i in text_widget.tag_ranges(t)] for t in tags}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--itens", type=int, default=1000, help="Itens do relatório sintético")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    logging.getLogger("RelatorioTJMS").setLevel(logging.WARNING)
+    markdown = make_relatorio_markdown(args.itens)
+    linhas = markdown.split("\n")
+    divergentes = 0
+
+    for linha in linhas + _linhas_aleatorias(20000):
+        if _parts_anterior(linha, "") != list(tokenize_inline(linha)):
+            divergentes += 1
+
+    t_antes = _melhor(lambda: [_parts_anterior(linha, "") for linha in linhas], args.repeticoes)
+    t_depois = _melhor(lambda: [tokenize_inline(linha) for linha in linhas], args.repeticoes)
+    print(f"Relatório sintético: {len(markdown):,} chars, {len(linhas):,} linhas "
+          f"(melhor de {args.repeticoes} execuções)")
+    print(f"  tokenização anterior   : {t_antes * 1000:8.1f} ms")
+    print(f"  passada única          : {t_depois * 1000:8.1f} ms")
+    print(f"  ganho                  : {t_antes / t_depois:8.2f}x")
+
+    try:
+        root = main_exe.tk.Tk()
+    except main_exe.tk.TclError as e:
+        print(f"  renderização no Tk ignorada: {e}")
+    else:
+        root.withdraw()
+        antes, depois = main_exe.ScrolledText(root), main_exe.ScrolledText(root)
+        antes.pack()
+        depois.pack()
+
+        def render_antes():
+            _render_anterior(antes, markdown)
+            antes.update_idletasks()
+
+        def render_depois():
+            # Sem o cache da árvore, para medir também a tokenização
+            parse_markdown.cache_clear()
+            main_exe.render_markdown_basic(depois, markdown)
+            depois.update_idletasks()
+
+        t_antes = _melhor(render_antes, args.repeticoes)
+        t_depois = _melhor(render_depois, args.repeticoes)
+        print(f"  render_markdown anterior: {t_antes * 1000:8.1f} ms")
+        print(f"  insert único            : {t_depois * 1000:8.1f} ms")
+        print(f"  ganho                   : {t_antes / t_depois:8.2f}x")
+        if _estado_widget(antes) != _estado_widget(depois):
+            print("ERRO: texto ou tags divergentes no widget")
+            divergentes += 1
+        root.destroy()
+
+    if divergentes:
+        print(f"ERRO: {divergentes} resultado(s) divergente(s) entre as implementações")
+        return 1
+    print("  resultados idênticos")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
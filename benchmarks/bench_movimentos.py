@@ -0,0 +1,101 @@
+# benchmarks/bench_movimentos.py
+# -*- coding: utf-8 -*-
+"""
+Benchmark da extração de movimentos: implementação anterior (várias varreduras
+da subárvore por movimento) x extração em passada única de scripts/pipeline.py.
+
+Uso:
+    python benchmarks/bench_movimentos.py [--movimentos 10000] [--repeticoes 5]
+"""
+
+import sys
+import time
+import logging
+import argparse
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+import xml.etree.ElementTree as ET
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from config import NS  # noqa: E402
+from scripts.pipeline import _extract_movimento, _pretty_esaj_dt, _all_texts  # noqa: E402
+from benchmarks.synthetic import make_processo_xml  # noqa: E402
+
+
+def _extract_movimento_anterior(mov: ET.Element, stats: Dict[str, int]) -> Optional[Dict[str, Any]]:
+    """Cópia da extração anterior, mantida aqui apenas como referência de desempenho e resultado."""
+    cods: List[str] = []
+    descrs: List[str] = []
+    for ml in mov.findall("ns2:movimentoLocal", NS):
+        c = ml.attrib.get("codigoPaiNacional")
+        if c:
+            cods.append(c)
+        dsc = ml.attrib.get("descricao")
+        if dsc:
+            descrs.append(dsc)
+        for mlp in ml.findall("ns2:movimentoLocalPai", NS):
+            cp = mlp.attrib.get("codigoPaiNacional")
+            if cp:
+                cods.append(cp)
+            dp = mlp.attrib.get("descricao")
+            if dp:
+                descrs.append(dp)
+    if not cods:
+        for anynode in mov.iter():
+            if isinstance(anynode.tag, str) and "codigoPaiNacional" in getattr(anynode, "attrib", {}):
+                cods.append(anynode.attrib.get("codigoPaiNacional"))
+    if cods:
+        stats["com_codigo"] += 1
+    if not descrs:
+        descrs = _all_texts(mov, "descricao")
+    if not descrs:
+        return None
+    stats["com_descricao"] += 1
+    complementos = _all_texts(mov, "complemento")
+    return {
+        "codigoPaiNacional": cods[0] if cods else None,
+        "descricao": descrs[0],
+        "dataHora": _pretty_esaj_dt(mov.attrib.get("dataHora")),
+        "complemento": "\n---\n".join(complementos) if complementos else ""
+    }
+
+
+def _run(extract, movimentos, repeticoes: int):
+    melhor = float("inf")
+    resultado = None
+    for _ in range(repeticoes):
+        stats = {"com_codigo": 0, "com_descricao": 0}
+        inicio = time.perf_counter()
+        resultado = [d for d in (extract(m, stats) for m in movimentos) if d is not None]
+        melhor = min(melhor, time.perf_counter() - inicio)
+    return melhor, resultado
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--movimentos", type=int, default=10000)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    logging.getLogger("RelatorioTJMS").setLevel(logging.WARNING)
+    xml_text = make_processo_xml(args.movimentos)
+    movimentos = ET.fromstring(xml_text).findall(".//ns2:movimento", NS)
+
+    t_antes, r_antes = _run(_extract_movimento_anterior, movimentos, args.repeticoes)
+    t_depois, r_depois = _run(_extract_movimento, movimentos, args.repeticoes)
+
+    print(f"XML sintético: {len(xml_text):,} chars, {len(movimentos):,} movimentos "
+          f"(melhor de {args.repeticoes} execuções)")
+    print(f"  extração anterior : {t_antes * 1000:8.1f} ms")
+    print(f"  passada única     : {t_depois * 1000:8.1f} ms")
+    print(f"  ganho             : {t_antes / t_depois:8.2f}x")
+    if r_antes != r_depois:
+        print("ERRO: resultados divergentes entre as implementações")
+        return 1
+    print(f"  resultados idênticos ({len(r_depois):,} movimentos com descrição)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,125 @@
+# benchmarks/bench_prompt_format.py
+# -*- coding: utf-8 -*-
+"""
+Compara a serialização das evidências no prompt: "json" (original) x "compacto".
+
+Sem argumentos, mede os tokens do prompt em XMLs sintéticos de vários tamanhos.
+Com --cnj, usa processos reais (consulta ao TJ-MS); com --llm, gera também os dois
+relatórios e compara os elementos que o relatório precisa preservar (nomes em
+negrito, valores em R$, datas e marcadores de revisão). Os relatórios são gravados
+em --saida para leitura lado a lado.
+
+Uso:
+    python benchmarks/bench_prompt_format.py [--movimentos 10 100 1000]
+    python benchmarks/bench_prompt_format.py --cnj 0800000-00.2023.8.12.0001 [--llm] [--saida relatorios_formato]
+"""
+
+import os
+import re
+import sys
+import logging
+import argparse
+from pathlib import Path
+from typing import Callable, Dict, List, Set, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.pipeline import (  # noqa: E402
+    make_session, validate_cnj, format_cnj, consultar_processo, parse_xml_processo,
+    prepare_messages_for_llm, estimate_tokens, call_openrouter, append_apenso_warning
+)
+from scripts.evidence_format import FORMATOS  # noqa: E402
+from benchmarks.synthetic import make_processo_xml  # noqa: E402
+
+
+def _token_counter() -> Tuple[Callable[[str], int], str]:
+    """Usa tiktoken (cl100k_base) se instalado; senão, a estimativa do pipeline."""
+    try:
+        import tiktoken
+        enc = tiktoken.get_encoding("cl100k_base")
+        return (lambda text: len(enc.encode(text))), "tiktoken cl100k_base"
+    except Exception:
+        return estimate_tokens, "estimativa ~4 caracteres/token"
+
+
+def _prompt_tokens(count: Callable[[str], int], messages: list) -> int:
+    return sum(count(m["content"]) for m in messages)
+
+
+def _elementos(relatorio: str) -> Dict[str, Set[str]]:
+    return {
+        "nomes": set(re.findall(r"\*\*([^*\n]+?)\*\*", relatorio)),
+        "valores": set(re.findall(r"R\$\s?[\d.]+,\d{2}", relatorio)),
+        "datas": set(re.findall(r"\b\d{2}/\d{2}/\d{4}\b|\b\d{4}-\d{2}-\d{2}\b", relatorio)),
+        "revisao": {str(relatorio.count("REVISÃO NECESSÁRIA"))},
+    }
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    return 1.0 if not a and not b else len(a & b) / len(a | b)
+
+
+def _linha_tokens(rotulo: str, tokens: Dict[str, int]):
+    base = tokens["json"]
+    partes = [f"{f}={tokens[f]:>8,}" for f in FORMATOS]
+    reducao = 100 * (1 - tokens["compacto"] / base) if base else 0.0
+    print(f"  {rotulo:<28} {'  '.join(partes)}   redução {reducao:5.1f}%")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--movimentos", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--cnj", nargs="+", default=[], help="Números CNJ reais (consulta o TJ-MS)")
+    parser.add_argument("--llm", action="store_true", help="Gera os relatórios nos dois formatos e compara")
+    parser.add_argument("--modelo", default=None, help="Modelo do OpenRouter (padrão: DEFAULT_MODEL)")
+    parser.add_argument("--saida", default="relatorios_formato", help="Pasta dos relatórios gerados com --llm")
+    args = parser.parse_args(argv)
+
+    logging.getLogger("RelatorioTJMS").setLevel(logging.WARNING)
+    count, metodo = _token_counter()
+    print(f"Tokens do prompt completo ({metodo}), após o pré-filtro de relevância:")
+
+    casos = []
+    if args.cnj:
+        session = make_session()
+        for numero in args.cnj:
+            ok, d, msg = validate_cnj(numero)
+            if not ok:
+                print(f"  {numero}: CNJ inválido ({msg})")
+                continue
+            xml_text = consultar_processo(session, d)
+            casos.append((format_cnj(d), parse_xml_processo(xml_text)))
+    else:
+        for n in args.movimentos:
+            casos.append((f"sintético {n} movimentos", parse_xml_processo(make_processo_xml(n))))
+
+    for rotulo, dados in casos:
+        mensagens = {f: prepare_messages_for_llm(rotulo, dados, formato=f) for f in FORMATOS}
+        _linha_tokens(rotulo, {f: _prompt_tokens(count, m) for f, m in mensagens.items()})
+
+        if not (args.llm and args.cnj):
+            continue
+
+        os.makedirs(args.saida, exist_ok=True)
+        relatorios = {}
+        for f, msgs in mensagens.items():
+            kwargs = {"model": args.modelo} if args.modelo else {}
+            relatorios[f] = append_apenso_warning(dados, call_openrouter(msgs, use_cache=False, **kwargs))
+            nome = f"{re.sub(r'[^0-9]', '', rotulo)}_{f}.md"
+            with open(os.path.join(args.saida, nome), "w", encoding="utf-8") as fh:
+                fh.write(relatorios[f])
+
+        ref, comp = _elementos(relatorios["json"]), _elementos(relatorios["compacto"])
+        print("    concordância compacto x json (Jaccard): " + ", ".join(
+            f"{k}={_jaccard(ref[k], comp[k]):.2f}" for k in ref))
+        faltando: List[str] = sorted((ref["nomes"] | ref["valores"]) - (comp["nomes"] | comp["valores"]))
+        if faltando:
+            print(f"    ausentes no relatório compacto: {', '.join(faltando)}")
+
+    if args.llm and not args.cnj:
+        print("Aviso: --llm requer --cnj (relatórios de dados sintéticos não são comparáveis).")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+# benchmarks/bench_startup.py
+# -*- coding: utf-8 -*-
+"""
+Orçamento de tempo da abertura da interface. Mede, em processos novos e com
+`python -X importtime`, o import de main_exe (tudo o que roda antes da janela
+aparecer) e lista os módulos mais caros; os módulos de PRELOAD_MODULES (pipeline,
+requests, aiohttp, updater, key_manager), importados em segundo plano depois da
+primeira pintura, aparecem à parte. Com display disponível, mede também o tempo
+de parede até a primeira pintura da janela, incluindo a partida do interpretador.
+
+O código de saída é 1 quando a mediana do import de main_exe passa do orçamento.
+
+Uso:
+    python benchmarks/bench_startup.py [--repeticoes 5] [--orcamento-ms 150] [--top 12]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+RAIZ = Path(__file__).parent.parent
+
+_LINHA_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+# __import__ passa pela instrumentação do -X importtime (importlib.import_module não mede o módulo pedido)
+_PRELOAD = ("import main_exe\n"
+            "for m in main_exe.PRELOAD_MODULES:\n"
+            "    __import__(m)\n")
+
+_PRIMEIRA_PINTURA = ("import sys, main_exe\n"
+                     "try:\n"
+                     "    app = main_exe.App()\n"
+                     "except main_exe.tk.TclError as e:\n"
+                     "    print('sem display:', e, flush=True); sys.exit(0)\n"
+                     "app.update()\n"
+                     "print('pintado', flush=True)\n"
+                     "app._on_closing()\n")
+
+
+def _ambiente(tmpdir: str) -> Dict[str, str]:
+    # Sem arquivo de log/métricas do usuário e sem feedback ou chave de verdade
+    env = dict(os.environ, AJG_LOG_DIR=os.path.join(tmpdir, "logs"), AJG_METRICS="0",
+               OPENROUTER_API_KEY=os.environ.get("OPENROUTER_API_KEY") or "sk-or-teste-local")
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def importtime(codigo: str, env: Dict[str, str]) -> List[Tuple[int, str, int, int]]:
+    """(nível, módulo, próprio_us, acumulado_us) de cada import do processo, na ordem do -X importtime."""
+    r = subprocess.run([sys.executable, "-X", "importtime", "-c", codigo], cwd=RAIZ, env=env,
+                       capture_output=True, text=True, encoding="utf-8", errors="replace")
+    if r.returncode != 0:
+        raise RuntimeError(r.stderr.strip().splitlines()[-1] if r.stderr.strip() else f"código {r.returncode}")
+    linhas = []
+    for linha in r.stderr.splitlines():
+        m = _LINHA_RE.match(linha)
+        if m:
+            linhas.append((len(m.group(3)) // 2, m.group(4), int(m.group(1)), int(m.group(2))))
+    return linhas
+
+
+def acumulado(linhas: List[Tuple[int, str, int, int]], modulo: str) -> int:
+    return next((cum for nivel, nome, _, cum in linhas if nome == modulo and nivel == 0), 0)
+
+
+def filhos(linhas: List[Tuple[int, str, int, int]], modulo: str) -> List[Tuple[str, int]]:
+    """Imports diretos feitos durante o import de `modulo` (o -X importtime lista os filhos antes do pai)."""
+    fim = next(i for i, (nivel, nome, _, _) in enumerate(linhas) if nome == modulo and nivel == 0)
+    inicio = fim
+    while inicio > 0 and linhas[inicio - 1][0] > 0:
+        inicio -= 1
+    return [(nome, cum) for nivel, nome, _, cum in linhas[inicio:fim] if nivel == 1]
+
+
+def primeira_pintura(env: Dict[str, str]) -> Optional[float]:
+    """Segundos do início do processo até a janela ser pintada, ou None sem display."""
+    inicio = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-c", _PRIMEIRA_PINTURA], cwd=RAIZ, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    linha = proc.stdout.readline() if proc.stdout else ""
+    decorrido = time.perf_counter() - inicio
+    proc.wait(timeout=30)
+    return decorrido if linha.startswith("pintado") else None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--orcamento-ms", type=float, default=150.0,
+                        help="Mediana máxima do import de main_exe (padrão: 150 ms)")
+    parser.add_argument("--top", type=int, default=12, help="Módulos mais caros listados")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = _ambiente(tmpdir)
+        importtime("import main_exe", env)  # aquecimento: grava os .pyc
+
+        execucoes = [importtime("import main_exe", env) for _ in range(args.repeticoes)]
+        tempos = [acumulado(linhas, "main_exe") / 1000 for linhas in execucoes]
+        mediana = statistics.median(tempos)
+        print(f"import main_exe (antes da janela): mediana {mediana:7.1f} ms · mínimo {min(tempos):7.1f} ms "
+              f"({args.repeticoes} processos) · orçamento {args.orcamento_ms:.0f} ms")
+
+        print("\nImports diretos mais caros de main_exe:")
+        for nome, cum in sorted(filhos(execucoes[-1], "main_exe"), key=lambda x: -x[1])[:args.top]:
+            print(f"  {cum / 1000:8.1f} ms  {nome}")
+
+        depois = importtime(_PRELOAD, env)
+        import_main = acumulado(depois, "main_exe")
+        fim_main = next(i for i, (nivel, nome, _, _) in enumerate(depois) if nome == "main_exe" and nivel == 0)
+        print("\nCarregados em segundo plano após a primeira pintura (PRELOAD_MODULES):")
+        total = 0
+        # Depois de main_exe, cada import de nível 0 é um módulo adiado (os já carregados não aparecem)
+        for nivel, nome, _, cum in depois[fim_main + 1:]:
+            if nivel == 0:
+                print(f"  {cum / 1000:8.1f} ms  {nome}")
+                total += cum
+        print(f"  {total / 1000:8.1f} ms  total (antes importados junto com main_exe: "
+              f"{(total + import_main) / 1000:.1f} ms)")
+
+        pinturas = [primeira_pintura(env) for _ in range(args.repeticoes)]
+        if any(p is None for p in pinturas):
+            print("\nPrimeira pintura ignorada: sem display disponível.")
+        else:
+            print(f"\nInício do processo até a janela pintada: mediana {statistics.median(pinturas) * 1000:7.1f} ms")
+
+    if mediana > args.orcamento_ms:
+        print(f"\nERRO: import de main_exe acima do orçamento ({mediana:.1f} ms > {args.orcamento_ms:.0f} ms)")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,223 @@
+# benchmarks/bench_suite.py
+# -*- coding: utf-8 -*-
+"""
+Suíte de benchmarks dos caminhos críticos com XML sintético de 10, 1.000 e 10.000 movimentos:
+parser, montagem do prompt, renderização no Tk, exportações DOCX/RTF/PDF e a
+formatação inline do DOCX. Cada execução é comparada com a baseline salva
+(benchmarks/baseline.json); medianas acima da tolerância são marcadas como
+regressão e o código de saída passa a ser 1, para barrar a versão antes do release.
+
+Os relatórios usados na renderização e nas exportações têm ~1 item a cada 10
+movimentos (proporção típica de decisões relevantes após o pré-filtro).
+Casos cujas dependências não estão disponíveis (python-docx, reportlab, display
+para o Tk) aparecem como ignorados.
+
+Uso:
+    python benchmarks/bench_suite.py                       # compara com a baseline
+    python benchmarks/bench_suite.py --salvar              # grava/atualiza a baseline
+    python benchmarks/bench_suite.py --filtro docx --tamanhos 1000 --json resultado.json
+"""
+
+import os
+import sys
+import json
+import time
+import logging
+import platform
+import argparse
+import statistics
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+RAIZ = Path(__file__).parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from benchmarks.synthetic import make_processo_xml, make_relatorio_markdown  # noqa: E402
+
+BASELINE_PADRAO = RAIZ / "benchmarks" / "baseline.json"
+TAMANHOS_PADRAO = (10, 1000, 10000)
+# Diferenças abaixo disso são ruído de medição, mesmo que percentualmente grandes
+PISO_RUIDO_S = 0.002
+
+
+class Ignorado(Exception):
+    """Caso sem a dependência necessária neste ambiente."""
+
+
+def _medir(fn: Callable[[], Any], repeticoes: int, orcamento_s: float) -> Dict[str, Any]:
+    fn()  # aquecimento (imports tardios, caches do parser)
+    tempos: List[float] = []
+    inicio = time.perf_counter()
+    while len(tempos) < repeticoes:
+        t0 = time.perf_counter()
+        fn()
+        tempos.append(time.perf_counter() - t0)
+        # Casos lentos (10 mil movimentos) param no orçamento, com pelo menos 3 medições
+        if len(tempos) >= 3 and time.perf_counter() - inicio > orcamento_s:
+            break
+    return {"mediana": statistics.median(tempos), "minimo": min(tempos), "repeticoes": len(tempos)}
+
+
+def _casos(tamanhos: Tuple[int, ...], tmpdir: str) -> List[Tuple[str, Callable[[], Callable[[], Any]]]]:
+    """(id, preparo) de cada caso; o preparo devolve a função medida ou levanta Ignorado."""
+    import main_exe
+    from scripts.pipeline import parse_xml_processo, build_messages_for_llm
+    # main_exe configura o logger na importação; o log do parser distorceria as medições
+    logging.getLogger("RelatorioTJMS").setLevel(logging.CRITICAL)
+
+    tk_root: List[Any] = []
+
+    def text_widget():
+        if not tk_root:
+            try:
+                root = main_exe.tk.Tk()
+            except main_exe.tk.TclError as e:
+                raise Ignorado(f"Tk indisponível ({e})")
+            root.withdraw()
+            tk_root.append(root)
+        widget = main_exe.ScrolledText(tk_root[0])
+        widget.pack()
+        return widget
+
+    def precisa(modulo: str):
+        try:
+            __import__(modulo)
+        except ImportError:
+            raise Ignorado(f"{modulo} não instalado")
+
+    casos: List[Tuple[str, Callable[[], Callable[[], Any]]]] = []
+    for n in tamanhos:
+        xml = make_processo_xml(n)
+        markdown = make_relatorio_markdown(max(5, n // 10))
+        saida = os.path.join(tmpdir, f"relatorio_{n}")
+
+        def parse(xml=xml):
+            return lambda: parse_xml_processo(xml)
+
+        def prompt(xml=xml, n=n):
+            dados = parse_xml_processo(xml)
+            return lambda: build_messages_for_llm(f"{n:07d}-56.2023.8.12.0001", dados)
+
+        def render(markdown=markdown):
+            widget = text_widget()
+
+            def run():
+                main_exe.render_markdown_basic(widget, markdown)
+                widget.update_idletasks()
+            return run
+
+        def rtf(markdown=markdown):
+            return lambda: main_exe.markdown_to_rtf(markdown)
+
+        def docx(markdown=markdown, saida=saida):
+            precisa("docx")
+            return lambda: main_exe.markdown_to_docx(markdown, saida + ".docx")
+
+        def pdf(markdown=markdown, saida=saida):
+            precisa("reportlab")
+            return lambda: main_exe.markdown_to_pdf(markdown, saida + ".pdf")
+
+        def inline(markdown=markdown):
+            precisa("docx")
+            from docx import Document
+            paragrafo = Document().add_paragraph()
+            linhas = [linha for linha in markdown.split("\n") if linha.strip()]
+
+            def run():
+                for linha in linhas:
+                    main_exe.process_docx_inline_formatting(paragrafo, linha)
+            return run
+
+        casos += [(f"parse_xml_processo[{n}]", parse), (f"build_messages_for_llm[{n}]", prompt),
+                  (f"render_markdown_basic[{n}]", render), (f"markdown_to_rtf[{n}]", rtf),
+                  (f"markdown_to_docx[{n}]", docx), (f"markdown_to_pdf[{n}]", pdf),
+                  (f"process_docx_inline_formatting[{n}]", inline)]
+    return casos
+
+
+def comparar(atual: Dict[str, Any], base: Optional[Dict[str, Any]], tolerancia: float) -> Tuple[str, str]:
+    """(variação, situação) de um caso em relação à baseline."""
+    if base is None:
+        return "", "novo"
+    delta = atual["mediana"] / base["mediana"] - 1 if base["mediana"] > 0 else 0.0
+    variacao = f"{delta:+.0%}"
+    if delta > tolerancia and atual["mediana"] - base["mediana"] > PISO_RUIDO_S:
+        return variacao, "REGRESSÃO"
+    if delta < -tolerancia and base["mediana"] - atual["mediana"] > PISO_RUIDO_S:
+        return variacao, "melhor"
+    return variacao, "ok"
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tamanhos", type=int, nargs="+", default=list(TAMANHOS_PADRAO),
+                        help="Quantidades de movimentos (padrão: 10 1000 10000)")
+    parser.add_argument("--filtro", help="Só casos cujo nome contém este texto")
+    parser.add_argument("--repeticoes", type=int, default=7)
+    parser.add_argument("--orcamento", type=float, default=5.0, help="Tempo máximo por caso (s)")
+    parser.add_argument("--baseline", default=str(BASELINE_PADRAO))
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Aumento da mediana tolerado (padrão: 25%%)")
+    parser.add_argument("--salvar", action="store_true", help="Grava os resultados como nova baseline")
+    parser.add_argument("--json", metavar="ARQUIVO", help="Grava os resultados desta execução em JSON")
+    args = parser.parse_args(argv)
+
+    baseline_path = os.path.abspath(args.baseline)
+    json_path = os.path.abspath(args.json) if args.json else None
+    # markdown_to_docx procura templates/template.docx relativo à pasta atual
+    os.chdir(RAIZ)
+
+    baseline: Dict[str, Any] = {}
+    if os.path.exists(baseline_path):
+        with open(baseline_path, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    base_resultados = baseline.get("resultados", {})
+    if baseline:
+        print(f"Baseline: {baseline_path} ({baseline.get('gerado_em', '?')}, {baseline.get('plataforma', '?')})")
+    else:
+        print(f"Sem baseline em {baseline_path}: use --salvar para criar.")
+
+    resultados: Dict[str, Any] = {}
+    regressoes = 0
+    print(f"{'caso':<40} {'mediana':>10} {'mínimo':>10} {'n':>3} {'baseline':>10} {'var.':>6}  situação")
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for nome, preparo in _casos(tuple(args.tamanhos), tmpdir):
+            if args.filtro and args.filtro not in nome:
+                continue
+            try:
+                fn = preparo()
+            except Ignorado as e:
+                print(f"{nome:<40} {'':>10} {'':>10} {'':>3} {'':>10} {'':>6}  ignorado: {e}")
+                continue
+            r = _medir(fn, args.repeticoes, args.orcamento)
+            resultados[nome] = r
+            base = base_resultados.get(nome)
+            variacao, situacao = comparar(r, base, args.tolerancia)
+            regressoes += situacao == "REGRESSÃO"
+            base_txt = f"{base['mediana'] * 1000:.2f}ms" if base else ""
+            print(f"{nome:<40} {r['mediana'] * 1000:>8.2f}ms {r['minimo'] * 1000:>8.2f}ms {r['repeticoes']:>3} "
+                  f"{base_txt:>10} {variacao:>6}  {situacao}")
+
+    documento = {"gerado_em": datetime.now().isoformat(timespec="seconds"),
+                 "plataforma": f"{platform.system()} {platform.machine()} · Python {platform.python_version()}",
+                 "resultados": resultados}
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(documento, f, ensure_ascii=False, indent=2)
+    if args.salvar:
+        # Casos não medidos agora (filtro/ignorados) mantêm o valor anterior
+        documento["resultados"] = {**base_resultados, **resultados}
+        with open(baseline_path, "w", encoding="utf-8") as f:
+            json.dump(documento, f, ensure_ascii=False, indent=2)
+        print(f"Baseline gravada em {baseline_path}.")
+        return 0
+
+    if regressoes:
+        print(f"{regressoes} caso(s) com regressão acima de {args.tolerancia:.0%}.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+# benchmarks/stub_server.py
+# -*- coding: utf-8 -*-
+"""
+Servidor local que substitui o webservice do TJ-MS e o OpenRouter em testes de desempenho.
+Reproduz os cassetes gravados com AJG_RECORD_DIR (scripts/recording.py) ou, com
+--sintetico, responde com XML sintético (benchmarks/synthetic.py) e um relatório fixo.
+Latência, variação e falhas (HTTP 5xx/429 e conexões derrubadas) são injetadas de
+forma determinística: o sorteio depende só da semente, do processo/prompt e de
+quantas vezes ele já foi pedido, não da ordem de chegada das requisições.
+
+Uso:
+    python -m benchmarks.stub_server --cassetes gravacoes/ --latencia-soap 0.8 --latencia-llm 3
+    python -m benchmarks.stub_server --sintetico 1000 --taxa-erro 0.05 --semente 7
+
+Depois, aponte o aplicativo (interface, lote ou linha de comando) para o servidor:
+    AJG_TJ_WSDL_URL=http://127.0.0.1:8765/soap AJG_OPENROUTER_ENDPOINT=http://127.0.0.1:8765/llm
+"""
+
+import os
+import re
+import sys
+import json
+import glob
+import time
+import random
+import argparse
+import threading
+import http.server
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from scripts.llm_cache import LLMCache  # noqa: E402
+from benchmarks.synthetic import make_processo_xml  # noqa: E402
+
+_NUMERO_RE = re.compile(r"<tip:numeroProcesso>\s*([^<\s]+)\s*</tip:numeroProcesso>")
+
+RELATORIO_SINTETICO = (
+    "## 1. Gratuidade da Justiça\n"
+    "- **Maria da Silva** (polo ativo): gratuidade **deferida**.\n\n"
+    "## 2. Perícia\n"
+    "- **Designação de perícia:** Sim.\n"
+    "- **Valor arbitrado:** R$ 370,00\n"
+    "- **Responsável pelo pagamento:** Estado de Mato Grosso do Sul\n"
+    "- **Momento do pagamento:** ao final\n\n"
+    "## 3. Processos Apensados\n- Não identificado.\n"
+)
+
+SOAP_FAULT = (
+    '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/"><soap:Body><soap:Fault>'
+    "<faultcode>soap:Server</faultcode><faultstring>{}</faultstring>"
+    "</soap:Fault></soap:Body></soap:Envelope>"
+)
+
+
+@dataclass
+class StubConfig:
+    latencia_soap: float = 0.0        # segundos (média) por consulta ao TJ-MS
+    latencia_llm: float = 0.0         # segundos (média) por resposta da LLM
+    variacao: float = 0.2             # variação relativa da latência (±20%)
+    latencia_gravada: bool = False    # usa a latência registrada em cada cassete
+    taxa_erro: float = 0.0            # fração de respostas com status_erro
+    status_erro: int = 503
+    taxa_desconexao: float = 0.0      # fração de conexões derrubadas sem resposta
+    intervalo_stream: float = 0.0     # pausa entre eventos SSE (streaming)
+    trechos_stream: int = 20          # em quantos eventos SSE a resposta é dividida
+    sintetico: int = 0                # >0: XML sintético com N movimentos quando não há cassete
+    semente: int = 1
+
+
+class StubServer:
+    """Servidor HTTP em thread própria; start() devolve a URL base."""
+
+    def __init__(self, cassetes_dir: Optional[str] = None, config: Optional[StubConfig] = None,
+                 host: str = "127.0.0.1", port: int = 0):
+        self.config = config or StubConfig()
+        self.soap: Dict[str, Dict[str, Any]] = {}
+        self.llm: Dict[str, Dict[str, Any]] = {}
+        if cassetes_dir:
+            self.load(cassetes_dir)
+        self.stats = {"soap": 0, "llm": 0, "erros_injetados": 0, "desconexoes": 0, "sem_cassete": 0}
+        self._contagem: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        self._xml_sintetico: Optional[str] = None
+        self._httpd = http.server.ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    def load(self, directory: str):
+        for path in glob.glob(os.path.join(directory, "*.json")):
+            with open(path, "r", encoding="utf-8") as f:
+                cassete = json.load(f)
+            if cassete.get("tipo") == "soap":
+                self.soap[cassete["numero"]] = cassete
+            elif cassete.get("tipo") == "llm":
+                self.llm[cassete["chave"]] = cassete
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="stub-server", daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def reset(self):
+        """Zera contadores e sorteios: a próxima rodada recebe exatamente as mesmas falhas e latências."""
+        with self._lock:
+            self._contagem.clear()
+            self.stats = dict.fromkeys(self.stats, 0)
+
+    # ---------- decisões determinísticas ----------
+    def _sorteio(self, tipo: str, chave: str) -> random.Random:
+        with self._lock:
+            n = self._contagem.get((tipo, chave), 0)
+            self._contagem[(tipo, chave)] = n + 1
+        return random.Random(f"{self.config.semente}:{tipo}:{chave}:{n}")
+
+    def _count(self, nome: str):
+        with self._lock:
+            self.stats[nome] += 1
+
+    def _latencia(self, base: float, rnd: random.Random) -> float:
+        return max(0.0, base * (1 + self.config.variacao * (2 * rnd.random() - 1)))
+
+    def _falha(self, rnd: random.Random) -> Optional[str]:
+        sorteio = rnd.random()
+        if sorteio < self.config.taxa_desconexao:
+            return "desconexao"
+        if sorteio < self.config.taxa_desconexao + self.config.taxa_erro:
+            return "erro"
+        return None
+
+    # ---------- respostas ----------
+    def soap_response(self, body: str) -> Tuple[Optional[str], int, str, float]:
+        """(falha, status, corpo, latência) da consulta consultarProcesso."""
+        m = _NUMERO_RE.search(body)
+        numero = m.group(1) if m else ""
+        rnd = self._sorteio("soap", numero)
+        cassete = self.soap.get(numero)
+        base = cassete["latencia"] if cassete and self.config.latencia_gravada else self.config.latencia_soap
+        latencia = self._latencia(base, rnd)
+        falha = self._falha(rnd)
+        if cassete is not None:
+            return falha, 200, cassete["resposta"], latencia
+        if self.config.sintetico:
+            if self._xml_sintetico is None:
+                self._xml_sintetico = make_processo_xml(self.config.sintetico, seed=self.config.semente)
+            return falha, 200, self._xml_sintetico, latencia
+        self._count("sem_cassete")
+        return falha, 500, SOAP_FAULT.format(f"Processo {numero} sem cassete gravado"), latencia
+
+    def llm_response(self, payload: Dict[str, Any]) -> Tuple[Optional[str], int, Dict[str, Any], float]:
+        chave = LLMCache.make_key(payload.get("model", ""), payload.get("temperature"), payload.get("messages", []))
+        rnd = self._sorteio("llm", chave)
+        cassete = self.llm.get(chave)
+        base = cassete["latencia"] if cassete and self.config.latencia_gravada else self.config.latencia_llm
+        latencia = self._latencia(base, rnd)
+        falha = self._falha(rnd)
+        if cassete is not None:
+            return falha, 200, cassete["resposta"], latencia
+        if self.config.sintetico:
+            prompt = sum(len(m.get("content") or "") for m in payload.get("messages", [])) // 4
+            return falha, 200, {"choices": [{"message": {"content": RELATORIO_SINTETICO}}],
+                                "usage": {"prompt_tokens": prompt,
+                                          "completion_tokens": len(RELATORIO_SINTETICO) // 4}}, latencia
+        self._count("sem_cassete")
+        return falha, 404, {"error": {"message": "Prompt sem cassete gravado", "code": 404}}, latencia
+
+    def _sse_events(self, j: Dict[str, Any]):
+        message = j["choices"][0]["message"]
+        content = message.get("content") or ""
+        n = max(1, self.config.trechos_stream)
+        passo = max(1, -(-len(content) // n))
+        for i in range(0, len(content), passo):
+            yield {"choices": [{"delta": {"content": content[i:i + passo]}}]}
+        if message.get("reasoning"):
+            yield {"choices": [{"delta": {"reasoning": message["reasoning"]}}]}
+        yield {"choices": [{"delta": {}, "finish_reason": j["choices"][0].get("finish_reason") or "stop"}]}
+        if j.get("usage"):
+            yield {"choices": [], "usage": j["usage"]}
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status: int, body: bytes, content_type: str):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                corpo = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                if self.path.startswith("/soap"):
+                    stub._count("soap")
+                    falha, status, resposta, latencia = stub.soap_response(corpo.decode("utf-8", "replace"))
+                    payload = None
+                else:
+                    stub._count("llm")
+                    payload = json.loads(corpo or b"{}")
+                    falha, status, resposta, latencia = stub.llm_response(payload)
+                time.sleep(latencia)
+
+                if falha == "desconexao":
+                    stub._count("desconexoes")
+                    self.close_connection = True
+                    return
+                if falha == "erro":
+                    stub._count("erros_injetados")
+                    self._send(stub.config.status_erro, b"Falha injetada pelo servidor de teste", "text/plain")
+                    return
+
+                if payload is None:
+                    self._send(status, resposta.encode("utf-8"), "text/xml; charset=utf-8")
+                elif payload.get("stream") and status == 200:
+                    self._stream(resposta)
+                else:
+                    self._send(status, json.dumps(resposta, ensure_ascii=False).encode("utf-8"), "application/json")
+
+            def _stream(self, j: Dict[str, Any]):
+                eventos = [f"data: {json.dumps(e, ensure_ascii=False)}\n\n".encode("utf-8")
+                           for e in stub._sse_events(j)] + [b"data: [DONE]\n\n"]
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Content-Length", str(sum(len(e) for e in eventos)))
+                self.end_headers()
+                for evento in eventos:
+                    self.wfile.write(evento)
+                    self.wfile.flush()
+                    if stub.config.intervalo_stream:
+                        time.sleep(stub.config.intervalo_stream)
+
+        return Handler
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.stub_server",
+                                     description="TJ-MS e OpenRouter locais para testes offline.")
+    parser.add_argument("--cassetes", help="Pasta com os cassetes gravados (AJG_RECORD_DIR)")
+    parser.add_argument("--sintetico", type=int, default=0, metavar="N",
+                        help="Sem cassete, responde com XML sintético de N movimentos e relatório fixo")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--latencia-soap", type=float, default=0.0, help="Latência média do TJ-MS (s)")
+    parser.add_argument("--latencia-llm", type=float, default=0.0, help="Latência média da LLM (s)")
+    parser.add_argument("--latencia-gravada", action="store_true", help="Usa a latência registrada em cada cassete")
+    parser.add_argument("--variacao", type=float, default=0.2, help="Variação relativa da latência (padrão: 0.2)")
+    parser.add_argument("--taxa-erro", type=float, default=0.0, help="Fração de respostas com --status-erro")
+    parser.add_argument("--status-erro", type=int, default=503)
+    parser.add_argument("--taxa-desconexao", type=float, default=0.0, help="Fração de conexões derrubadas")
+    parser.add_argument("--intervalo-stream", type=float, default=0.0, help="Pausa entre eventos SSE (s)")
+    parser.add_argument("--semente", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    if not args.cassetes and not args.sintetico:
+        parser.error("informe --cassetes e/ou --sintetico")
+    cfg = StubConfig(latencia_soap=args.latencia_soap, latencia_llm=args.latencia_llm, variacao=args.variacao,
+                     latencia_gravada=args.latencia_gravada, taxa_erro=args.taxa_erro,
+                     status_erro=args.status_erro, taxa_desconexao=args.taxa_desconexao,
+                     intervalo_stream=args.intervalo_stream, sintetico=args.sintetico, semente=args.semente)
+    stub = StubServer(args.cassetes, cfg, port=args.porta)
+    url = stub.start()
+    print(f"Servidor de reprodução em {url} ({len(stub.soap)} cassetes SOAP, {len(stub.llm)} da LLM)")
+    print(f"  AJG_TJ_WSDL_URL={url}/soap")
+    print(f"  AJG_OPENROUTER_ENDPOINT={url}/llm")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        print(f"Encerrado. Estatísticas: {stub.stats}")
+        stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
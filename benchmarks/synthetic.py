@@ -0,0 +1,105 @@
+# benchmarks/synthetic.py
+# -*- coding: utf-8 -*-
+"""
+Gerador de XML sintético no formato da resposta consultarProcesso (MNI 2.2.2),
+usado pelos benchmarks. Determinístico (seed fixa) para resultados comparáveis.
+"""
+
+import random
+
+_NS_ENVELOPE = "http://schemas.xmlsoap.org/soap/envelope/"
+_NS2 = "http://www.cnj.jus.br/intercomunicacao-2.2.2"
+_NS4 = "http://www.cnj.jus.br/servico-intercomunicacao-2.2.2/"
+
+_COMPLEMENTOS = [
+    "Defiro a gratuidade da justiça à parte autora, nos termos do art. 98 do CPC.",
+    "Nomeio perito o Dr. Fulano de Tal, fixando os honorários periciais em R$ 370,00, a serem pagos ao final pelo Estado.",
+    "Intime-se a parte requerida para apresentar contestação no prazo legal.",
+    "Certifico que decorreu o prazo sem manifestação das partes.",
+    "Junte-se aos autos a petição protocolada. Após, conclusos.",
+    "Designo audiência de conciliação para data a ser definida pela secretaria.",
+]
+
+_DESCRICOES = [
+    ("3", "Decisão interlocutória"),
+    ("11009", "Despacho"),
+    ("60", "Expedição de documento"),
+    ("581", "Juntada de petição"),
+    ("123", "Certidão"),
+]
+
+
+def _movimento(i: int, rnd: random.Random) -> str:
+    codigo, descricao = rnd.choice(_DESCRICOES)
+    data_hora = f"20{10 + i % 14:02d}{1 + i % 12:02d}{1 + i % 28:02d}1030{i % 60:02d}"
+    complementos = "".join(
+        f"<ns2:complemento>{rnd.choice(_COMPLEMENTOS)}</ns2:complemento>"
+        for _ in range(rnd.randint(0, 3))
+    )
+    variante = i % 4
+    if variante == 0:
+        # Código e descrição em movimentoLocal + movimentoLocalPai
+        corpo = (f'<ns2:movimentoLocal codigoMovimento="{1000 + i}" descricao="{descricao}" codigoPaiNacional="{codigo}">'
+                 f'<ns2:movimentoLocalPai codigoPaiNacional="{codigo}" descricao="{descricao}"/>'
+                 f'</ns2:movimentoLocal>')
+    elif variante == 1:
+        # Código apenas em nó arbitrário (fallback) e descrição em elemento de texto
+        corpo = (f'<ns2:movimentoNacional codigoNacional="{codigo}" codigoPaiNacional="{codigo}"/>'
+                 f'<ns2:descricao>{descricao}</ns2:descricao>')
+    elif variante == 2:
+        corpo = f'<ns2:movimentoLocal codigoMovimento="{1000 + i}" descricao="{descricao}"/>'
+    else:
+        # Movimento sem descrição (ignorado pelo parser)
+        corpo = f'<ns2:movimentoNacional codigoNacional="{codigo}"/>'
+    return (f'<ns2:movimento dataHora="{data_hora}" identificadorMovimento="{i}">'
+            f'{corpo}{complementos}</ns2:movimento>')
+
+
+def make_processo_xml(n_movimentos: int, seed: int = 42, apenso: bool = True) -> str:
+    """Gera a resposta SOAP completa com n_movimentos movimentos."""
+    rnd = random.Random(seed)
+    partes = (
+        '<ns2:polo polo="AT">'
+        '<ns2:parte assistenciaJudiciaria="true"><ns2:pessoa nome="Maria da Silva"/></ns2:parte>'
+        '<ns2:parte assistenciaJudiciaria="false"><ns2:pessoa nome="João Santos"/></ns2:parte>'
+        '</ns2:polo>'
+        '<ns2:polo polo="PA">'
+        '<ns2:parte><ns2:pessoa nome="Estado de Mato Grosso do Sul"/></ns2:parte>'
+        '</ns2:polo>'
+    )
+    movimentos = "".join(_movimento(i, rnd) for i in range(n_movimentos))
+    aviso_apenso = "<ns2:outroParametro nome=\"obs\" valor=\"Processo em apenso\"/>" if apenso else ""
+    return (
+        f'<soap:Envelope xmlns:soap="{_NS_ENVELOPE}"><soap:Body>'
+        f'<ns4:consultarProcessoResposta xmlns:ns2="{_NS2}" xmlns:ns4="{_NS4}">'
+        f'<sucesso>true</sucesso><mensagem>Processo consultado com sucesso</mensagem>'
+        f'<processo><ns2:dadosBasicos classeProcessual="156" codigoLocalidade="1">'
+        f'{partes}{aviso_apenso}</ns2:dadosBasicos>{movimentos}</processo>'
+        f'</ns4:consultarProcessoResposta></soap:Body></soap:Envelope>'
+    )
+
+
+_NOMES = ["Maria da Silva", "João Santos", "Ana Pereira", "Carlos Souza", "Estado de Mato Grosso do Sul"]
+
+
+def make_relatorio_markdown(n_itens: int, seed: int = 42) -> str:
+    """
+    Relatório no formato devolvido pela LLM (cabeçalhos, listas, **nomes**, *ênfase*
+    e trechos entre aspas), com n_itens decisões citadas.
+    """
+    rnd = random.Random(seed)
+    linhas = ["# RELATÓRIO - ASSISTÊNCIA JUDICIÁRIA GRATUITA", "", "## 1. Gratuidade da Justiça", ""]
+    for i in range(n_itens):
+        nome = rnd.choice(_NOMES)
+        trecho = rnd.choice(_COMPLEMENTOS)
+        data = f"{1 + i % 28:02d}/{1 + i % 12:02d}/20{10 + i % 14:02d}"
+        if i % 3 == 0:
+            linhas.append(f"- **{nome}** (polo ativo): gratuidade *deferida* em {data}.")
+        elif i % 3 == 1:
+            linhas.append(f"- **Trecho da decisão ({data}):** *\"{trecho}\"*")
+        else:
+            linhas.append(f"Em {data}, o juízo registrou: \"{trecho}\" — parte **{nome}**.")
+        if i == n_itens // 2:
+            linhas += ["", "## 2. Perícia", "", "### Honorários periciais", ""]
+    linhas += ["", "## 3. Processos Apensados", "- Não identificado."]
+    return "\n".join(linhas)
@@ -44,6 +44,21 @@ HIDDEN_IMPORTS = [
     # Scripts customizados
     "scripts.updater",
     "scripts.key_manager",
+    "scripts.pipeline",
+    "scripts.batch",
+    "scripts.cli",
+    "scripts.soap_cache",
+    "scripts.llm_cache",
+    "scripts.prefilter",
+    "scripts.evidence_format",
+    "scripts.http_client",
+    "scripts.async_pipeline",
+    "scripts.tracing",
+    "scripts.metrics",
+    "scripts.recording",
+    "scripts.markdown_ast",
+    "scripts.logfile",
+    "scripts.feedback",
 ]
 
 
@@ -5,6 +5,9 @@ Configurações embutidas para o executável
 Substitui a dependência do arquivo .env
 """
 
+import os
+import sys
+
 # ==================================================
 # CONFIGURAÇÕES DO TJ-MS
 # ==================================================
@@ -16,8 +19,6 @@ TJ_WS_PASS = "SAJ03PGEMS"
 # ==================================================
 # CONFIGURAÇÕES DO OPENROUTER
 # ==================================================
-import os
-
 # Função para carregar arquivo .env
 def load_env_file(env_file=".env"):
     """Carrega variáveis do arquivo .env se existir"""
@@ -83,6 +84,99 @@ if not OPENROUTER_API_KEY or OPENROUTER_API_KEY in ["SUA_CHAVE_AQUI", "GITHUB_BU
 OPENROUTER_ENDPOINT = "https://openrouter.ai/api/v1/chat/completions"
 DEFAULT_MODEL = "google/gemini-2.5-flash"
 
+# ==================================================
+# CACHE LOCAL
+# ==================================================
+# Mesma convenção do key_manager: pasta do executável ou pasta do projeto
+APP_DIR = os.path.dirname(sys.executable) if getattr(sys, 'frozen', False) else os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.getenv("AJG_CACHE_DIR", os.path.join(APP_DIR, "cache"))
+
+# Respostas SOAP consultarProcesso (XML bruto, comprimido)
+SOAP_CACHE_ENABLED = os.getenv("AJG_SOAP_CACHE", "1") != "0"
+SOAP_CACHE_TTL_SECONDS = int(os.getenv("AJG_SOAP_CACHE_TTL", str(6 * 3600)))
+SOAP_CACHE_MAX_MB = int(os.getenv("AJG_SOAP_CACHE_MAX_MB", "200"))
+
+# Respostas do OpenRouter (SQLite), chave = modelo + temperatura + hash das mensagens
+LLM_CACHE_ENABLED = os.getenv("AJG_LLM_CACHE", "1") != "0"
+LLM_CACHE_MAX_AGE_SECONDS = int(os.getenv("AJG_LLM_CACHE_MAX_AGE", str(30 * 24 * 3600)))
+LLM_CACHE_MAX_MB = int(os.getenv("AJG_LLM_CACHE_MAX_MB", "50"))
+
+# ==================================================
+# CONEXÕES HTTP (sessões compartilhadas por host)
+# ==================================================
+# Conexões keep-alive mantidas por host; deve cobrir a concorrência do lote
+HTTP_POOL_MAXSIZE = int(os.getenv("AJG_HTTP_POOL_MAXSIZE", "16"))
+HTTP_POOL_CONNECTIONS = int(os.getenv("AJG_HTTP_POOL_CONNECTIONS", "4"))
+# HTTP/2 experimental do urllib3 (requer urllib3 >= 2.3 e o pacote h2)
+HTTP2_ENABLED = os.getenv("AJG_HTTP2", "0") == "1"
+
+# ==================================================
+# PRÉ-FILTRO DE RELEVÂNCIA (antes do prompt da LLM)
+# ==================================================
+# Descarta movimentos sem relação com gratuidade/perícia e trunca complementos pouco relevantes
+PREFILTER_ENABLED = os.getenv("AJG_PREFILTER", "1") != "0"
+PREFILTER_COMPLEMENTO_MAX_CHARS = int(os.getenv("AJG_PREFILTER_COMPLEMENTO_MAX_CHARS", "300"))
+
+# ==================================================
+# ORÇAMENTO DE TOKENS DO PROMPT
+# ==================================================
+# Acima do orçamento, as decisões são divididas em blocos cronológicos resumidos em
+# paralelo (map) e consolidados em uma chamada final (reduce). 0 desativa a divisão.
+LLM_PROMPT_TOKEN_BUDGET = int(os.getenv("AJG_LLM_TOKEN_BUDGET", "60000"))
+LLM_CHUNK_TOKENS = int(os.getenv("AJG_LLM_CHUNK_TOKENS", "20000"))
+LLM_MAP_CONCURRENCY = int(os.getenv("AJG_LLM_MAP_CONCURRENCY", "4"))
+
+# Serialização das evidências no prompt: "json" (original) ou "compacto" (linhas + legenda)
+PROMPT_EVIDENCE_FORMAT = os.getenv("AJG_PROMPT_FORMATO", "json")
+
+# ==================================================
+# RASTREAMENTO DE TEMPOS (trace por relatório)
+# ==================================================
+# O resumo de tempos por etapa sempre vai para o log; com AJG_TRACE=1 cada relatório
+# também gera um arquivo no formato Chrome Trace Event (chrome://tracing / Perfetto)
+TRACE_EXPORT = os.getenv("AJG_TRACE", "0") == "1"
+TRACE_DIR = os.getenv("AJG_TRACE_DIR", os.path.join(APP_DIR, "traces"))
+
+# ==================================================
+# MÉTRICAS DE DESEMPENHO (histórico local)
+# ==================================================
+# Cada geração grava tempos por etapa, tamanho do XML, tokens e retentativas em SQLite;
+# resumo com percentis em "Desempenho..." na interface ou "python -m scripts.metrics"
+METRICS_ENABLED = os.getenv("AJG_METRICS", "1") != "0"
+METRICS_DB = os.getenv("AJG_METRICS_DB", os.path.join(APP_DIR, "metricas.sqlite3"))
+
+# ==================================================
+# LOG (painel da interface e arquivo)
+# ==================================================
+# O painel guarda as últimas AJG_LOG_BUFFER_LINES linhas em memória (para os filtros)
+# e exibe no máximo AJG_LOG_PANE_LINES; o histórico completo vai para logs/relatorio.jsonl
+# (JSON lines com o identificador do relatório, gravado em thread própria), com rotação
+# por tamanho; consulta offline com "python -m scripts.logfile"
+LOG_DIR = os.getenv("AJG_LOG_DIR", os.path.join(APP_DIR, "logs"))
+LOG_BUFFER_LINES = int(os.getenv("AJG_LOG_BUFFER_LINES", "20000"))
+LOG_PANE_LINES = int(os.getenv("AJG_LOG_PANE_LINES", "2000"))
+LOG_FILE_MAX_MB = float(os.getenv("AJG_LOG_FILE_MAX_MB", "5"))
+LOG_FILE_BACKUPS = int(os.getenv("AJG_LOG_FILE_BACKUPS", "5"))
+
+# ==================================================
+# FEEDBACK (caixa de saída do Google Forms)
+# ==================================================
+# O feedback é gravado localmente e enviado em segundo plano, com novas tentativas;
+# o que não saiu (sem conexão) é enviado na próxima abertura do aplicativo
+FEEDBACK_OUTBOX_DB = os.getenv("AJG_FEEDBACK_OUTBOX", os.path.join(APP_DIR, "feedback_pendente.sqlite3"))
+FEEDBACK_TIMEOUT = float(os.getenv("AJG_FEEDBACK_TIMEOUT", "15"))
+FEEDBACK_MAX_AGE_DAYS = int(os.getenv("AJG_FEEDBACK_MAX_AGE_DAYS", "30"))
+
+# ==================================================
+# GRAVAÇÃO / REPRODUÇÃO OFFLINE (testes de desempenho)
+# ==================================================
+# Endpoints substituíveis para apontar o aplicativo ao servidor local de reprodução
+# (python -m benchmarks.stub_server); sem as variáveis, os serviços reais são usados
+TJ_WSDL_URL = os.getenv("AJG_TJ_WSDL_URL", TJ_WSDL_URL)
+OPENROUTER_ENDPOINT = os.getenv("AJG_OPENROUTER_ENDPOINT", OPENROUTER_ENDPOINT)
+# Pasta onde gravar as trocas com o TJ-MS e o OpenRouter (credenciais mascaradas); vazio desativa
+RECORD_DIR = os.getenv("AJG_RECORD_DIR", "")
+
 # ==================================================
 # OUTRAS CONFIGURAÇÕES
 # ==================================================
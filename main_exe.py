@@ -15,16 +15,17 @@ import os
 import sys
 import re
 import json
-import html
+import time
+import queue
 import logging
 import threading
-import base64
-from datetime import datetime
-from typing import Tuple, List, Dict, Any
-
-import requests
-from requests.adapters import HTTPAdapter, Retry
-import xml.etree.ElementTree as ET
+import importlib
+import importlib.util
+import contextvars
+from collections import deque
+from itertools import islice
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
 
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
@@ -34,574 +35,80 @@ from tkinter import font as tkfont
 # =========================
 # Importa configurações do config.py
 # =========================
-from config import (
-    TJ_WSDL_URL, TJ_WS_USER, TJ_WS_PASS,
-    OPENROUTER_API_KEY, OPENROUTER_ENDPOINT, DEFAULT_MODEL,
-    STRICT_CNJ_CHECK, CLASSES_CUMPRIMENTO, NS
-)
+import config
+from config import OPENROUTER_API_KEY, DEFAULT_MODEL
 
 # =========================
-# Importa módulo de auto-atualização
+# Módulos leves (necessários antes da janela aparecer)
 # =========================
-try:
-    from scripts.updater import check_and_update
-    UPDATER_AVAILABLE = True
-except ImportError:
-    try:
-        # Fallback para importação antiga (compatibilidade)
-        from updater import check_and_update  # type: ignore[import-not-found]
-        UPDATER_AVAILABLE = True
-    except ImportError:
-        UPDATER_AVAILABLE = False
-        print("Modulo updater nao encontrado - funcionalidade de auto-update desabilitada")
-
-# =========================
-# Importa gerenciador de chaves
-# =========================
-try:
-    from scripts.key_manager import get_api_key, KeyManager
-    KEY_MANAGER_AVAILABLE = True
-except ImportError:
-    try:
-        # Fallback para importação antiga (compatibilidade)
-        from key_manager import get_api_key, KeyManager  # type: ignore[import-not-found]
-        KEY_MANAGER_AVAILABLE = True
-    except ImportError:
-        KEY_MANAGER_AVAILABLE = False
-        print("Modulo key_manager nao encontrado - usando configuracao estatica")
+# O núcleo do pipeline (scripts.pipeline: requests, ElementTree), o lote, o pipeline
+# assíncrono (aiohttp), o updater e o key_manager são importados só depois da primeira
+# pintura da janela (ver App._preload_modules) ou no primeiro uso.
+from scripts.tracing import Trace, use_trace, span, traced, export_trace
+from scripts.logfile import start_file_logging, stop_file_logging
+from scripts.markdown_ast import (
+    Bloco, parse_markdown, parse_line as parse_markdown_line, tokenize_inline,
+    to_rtf, to_rtf_simple, to_reportlab, to_html
+)
 
-# =========================
-# Logging (terminal)
-# =========================
 logger = logging.getLogger("RelatorioTJMS")
-logger.setLevel(logging.INFO)
-_ch = logging.StreamHandler()
-_ch.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
-logger.addHandler(_ch)
+if logger.level == logging.NOTSET:
+    logger.setLevel(logging.INFO)
 
-# =========================
-# Utilitários gerais
-# =========================
-def make_session() -> requests.Session:
-    s = requests.Session()
-    retry = Retry(total=4, backoff_factor=0.6, status_forcelist=[429, 500, 502, 503, 504])
-    s.mount("http://", HTTPAdapter(max_retries=retry))
-    s.mount("https://", HTTPAdapter(max_retries=retry))
-
-    # Configurar certificados SSL para executável PyInstaller
-    if getattr(sys, 'frozen', False):
-        # Executável empacotado - usar cacert.pem incluído
-        import os
-        bundle_path = sys._MEIPASS
-        cacert_path = os.path.join(bundle_path, 'certifi', 'cacert.pem')
-        if os.path.exists(cacert_path):
-            s.verify = cacert_path
-            logger.info(f"Usando certificados SSL de: {cacert_path}")
-        else:
-            # Fallback: usar certifi padrão
-            import certifi
-            s.verify = certifi.where()
-            logger.info(f"Fallback: usando certificados SSL de: {certifi.where()}")
-
-    return s
-
-def only_digits(s: str) -> str:
-    return re.sub(r"\D", "", s or "")
-
-def format_cnj(num: str) -> str:
-    d = only_digits(num)
-    if len(d) != 20:
-        return num
-    return f"{d[0:7]}-{d[7:9]}.{d[9:13]}.{d[13:14]}.{d[14:16]}.{d[16:20]}"
-
-def cnj_checksum_ok(d: str) -> bool:
-    # Checagem simplificada (se quiser, troque pelo algoritmo 97-10 completo)
-    if len(d) != 20 or not d.isdigit():
-        return False
-    ano = int(d[9:13])
-    return 1900 <= ano <= datetime.now().year + 1
-
-def validate_config() -> Tuple[bool, str]:
-    miss = []
-    if not TJ_WSDL_URL: miss.append("TJ_WSDL_URL")
-    if not TJ_WS_USER:  miss.append("TJ_WS_USER")
-    if not TJ_WS_PASS:  miss.append("TJ_WS_PASS")
-    # Permite placeholder durante build/desenvolvimento
-    if not OPENROUTER_API_KEY or OPENROUTER_API_KEY == "SUA_CHAVE_AQUI":
-        miss.append("OPENROUTER_API_KEY")
-    if miss:
-        return False, "Variáveis ausentes no config.py: " + ", ".join(miss)
-    return True, "OK"
-
-def validate_cnj(num: str) -> Tuple[bool, str, str]:
-    d = only_digits(num)
-    if len(d) != 20:
-        return False, d, "Número CNJ deve conter 20 dígitos (com ou sem pontuação)."
-    if STRICT_CNJ_CHECK and not cnj_checksum_ok(d):
-        return False, d, "Dígito/verificação do CNJ inválido (STRICT_CNJ_CHECK=True)."
-    return True, d, "OK"
-
-def soap_consultar_processo(session: requests.Session, numero_processo: str, timeout=90,
-                            movimentos=True, incluir_docs=False, debug=False) -> str:
-    """
-    Chama o serviço SOAP consultarProcesso e retorna o XML (texto).
-    """
-    envelope = f"""
-    <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"
-                      xmlns:ser="http://www.cnj.jus.br/servico-intercomunicacao-2.2.2/"
-                      xmlns:tip="http://www.cnj.jus.br/tipos-servico-intercomunicacao-2.2.2">
-        <soapenv:Header/>
-        <soapenv:Body>
-            <ser:consultarProcesso>
-                <tip:idConsultante>{html.escape(TJ_WS_USER)}</tip:idConsultante>
-                <tip:senhaConsultante>{html.escape(TJ_WS_PASS)}</tip:senhaConsultante>
-                <tip:numeroProcesso>{html.escape(numero_processo)}</tip:numeroProcesso>
-                <tip:movimentos>{"true" if movimentos else "false"}</tip:movimentos>
-                <tip:incluirDocumentos>{"true" if incluir_docs else "false"}</tip:incluirDocumentos>
-            </ser:consultarProcesso>
-        </soapenv:Body>
-    </soapenv:Envelope>
-    """.strip()
-    if debug:
-        # Mascarar credenciais no log para segurança
-        envelope_log = envelope.replace(TJ_WS_USER, "***USER***").replace(TJ_WS_PASS, "***PASS***")
-        logger.debug("SOAP request: %s", envelope_log)
-    r = session.post(TJ_WSDL_URL, data=envelope, timeout=timeout)
-    r.raise_for_status()
-    return r.text
-
-def _text_of(elem: ET.Element) -> str:
-    return (elem.text or "").strip() if elem is not None and elem.text else ""
-
-def _pretty_esaj_dt(esaj_dt_str: str) -> str:
-    if not esaj_dt_str:
-        return esaj_dt_str
-    m = re.match(r"^(\d{4})(\d{2})(\d{2})(\d{2})(\d{2})(\d{2})$", esaj_dt_str)
-    if m:
+
+def find_module(*names: str) -> Optional[str]:
+    """Primeiro módulo disponível entre `names`, sem importá-lo (só localiza o arquivo)."""
+    for name in names:
         try:
-            dt = datetime(*map(int, m.groups()))
-            return dt.strftime("%Y-%m-%d %H:%M:%S")
-        except Exception:
-            pass
-    return esaj_dt_str
-
-def has_apenso_hint(xml_text: str) -> bool:
-    t = xml_text.casefold()
-    return (" apenso" in t) or (" apensad" in t) or (" apensamento" in t)
-
-# ========= helpers do parser robusto (ignorando namespaces quando útil) =========
-def _tagname(e: ET.Element) -> str:
-    return e.tag.split('}')[-1] if isinstance(e.tag, str) else str(e)
-
-def _iter_desc_elems(elem: ET.Element, name_endswith: str):
-    """Itera descendentes cujo tag (sem ns) termina com name_endswith (case-insensitive)."""
-    t = name_endswith.lower()
-    for e in elem.iter():
-        if _tagname(e).lower().endswith(t):
-            yield e
-
-def _all_texts(elem: ET.Element, name_endswith: str) -> List[str]:
-    """Coleta todos os textos de nós cujo tag termina com name_endswith."""
-    out: List[str] = []
-    for e in _iter_desc_elems(elem, name_endswith):
-        if e.text and e.text.strip():
-            out.append(e.text.strip())
-    return out
+            if importlib.util.find_spec(name) is not None:
+                return name
+        except (ImportError, ValueError):
+            continue
+    return None
 
 # =========================
-# Parser do XML (robusto)
+# Pipeline assíncrono (opcional, requer aiohttp)
 # =========================
-def parse_xml_processo(xml_text: str) -> Dict[str, Any]:
-    """
-    Extrai:
-      - classeProcessual (+ flag cumprimento)
-      - partes AT/PA (nome + assistenciaJudiciaria)
-      - decisões / despachos: codigoPaiNacional = 3 (decisão) ou 11009 (despacho)
-          * aceita código em movimentoLocal e/ou movimentoLocalPai
-          * coleta TODOS os <...:complemento> desse movimento
-      - possivel_apenso: heurística textual
-    """
-    root = ET.fromstring(xml_text)
-    data: Dict[str, Any] = {
-        "classeProcessual": None,
-        "cumprimento": False,
-        "possivel_apenso": has_apenso_hint(xml_text),
-        "partes": {"AT": [], "PA": []},
-        "decisoes": []
-    }
-
-    # Classe processual
-    dados_basicos = root.find(".//ns2:dadosBasicos", NS)
-    if dados_basicos is not None:
-        cls = dados_basicos.attrib.get("classeProcessual")
-        data["classeProcessual"] = cls
-        data["cumprimento"] = (cls in CLASSES_CUMPRIMENTO)
-
-    # Partes por polo
-    for polo_node in root.findall(".//ns2:polo", NS):
-        polo = polo_node.attrib.get("polo")
-        if polo not in ("AT", "PA"):
-            continue
-        for parte in polo_node.findall("ns2:parte", NS):
-            ajg = (parte.attrib.get("assistenciaJudiciaria", "").lower() == "true")
-            pessoa = parte.find("ns2:pessoa", NS)
-            if pessoa is not None:
-                nome = pessoa.attrib.get("nome")
-                if nome:
-                    data["partes"][polo].append({"nome": nome, "assistenciaJudiciaria": ajg})
-
-    # Movimentos - AGORA COLETA TODOS OS MOVIMENTOS COM DESCRIÇÃO
-    movimentos = root.findall(".//ns2:movimento", NS)
-    logger.debug("Total de movimentos no XML: %d", len(movimentos))
-
-    com_codigo = 0
-    com_descricao = 0
-
-    for mov in movimentos:
-        # Códigos e descrições podem aparecer em movimentoLocal e/ou movimentoLocalPai
-        cods: List[str] = []
-        descrs: List[str] = []
-
-        for ml in mov.findall("ns2:movimentoLocal", NS):
-            c = ml.attrib.get("codigoPaiNacional")
-            if c:
-                cods.append(c)
-            dsc = ml.attrib.get("descricao")
-            if dsc:
-                descrs.append(dsc)
-
-            for mlp in ml.findall("ns2:movimentoLocalPai", NS):
-                cp = mlp.attrib.get("codigoPaiNacional")
-                if cp:
-                    cods.append(cp)
-                dp = mlp.attrib.get("descricao")
-                if dp:
-                    descrs.append(dp)
-
-        # Fallback: qualquer nó com atributo codigoPaiNacional
-        if not cods:
-            for anynode in mov.iter():
-                if isinstance(anynode.tag, str) and "codigoPaiNacional" in getattr(anynode, "attrib", {}):
-                    cods.append(anynode.attrib.get("codigoPaiNacional"))
-
-        if cods:
-            com_codigo += 1
-
-        # MUDANÇA: Agora coleta TODOS os movimentos que tenham descrição
-        # Prioriza códigos 3 (decisão) e 11009 (despacho), mas inclui todos
-        # A filtragem para perícia será feita no prompt LLM
-        if not descrs:
-            descrs = _all_texts(mov, "descricao")
-
-        # Só adiciona se tiver descrição (para não poluir com movimentos vazios)
-        if not descrs:
-            continue
-
-        com_descricao += 1
-
-        # Pega o primeiro código disponível (se houver)
-        codigo_principal = cods[0] if cods else None
-
-        dataHora = _pretty_esaj_dt(mov.attrib.get("dataHora"))
-        complementos = _all_texts(mov, "complemento")
-        complemento_txt = "\n---\n".join(complementos) if complementos else ""
-        descricao_final = descrs[0] if descrs else None
-
-        data["decisoes"].append({
-            "codigoPaiNacional": codigo_principal,
-            "descricao": descricao_final,
-            "dataHora": dataHora,
-            "complemento": complemento_txt
-        })
-
-    logger.info("Movimentos com algum codigoPaiNacional: %d", com_codigo)
-    logger.info("Movimentos com descrição coletados: %d", com_descricao)
-    return data
+ASYNC_AVAILABLE = find_module("aiohttp") is not None
 
 # =========================
-# Prompt atualizado para LLM
+# Módulo de auto-atualização
 # =========================
-def build_messages_for_llm(numero_cnj_fmt: str, dados: dict) -> list:
-    resumo_json = json.dumps(dados, ensure_ascii=False, indent=2)
-
-    sys = (
-        "Você é um assistente especializado em análise processual. "
-        "Produza um RELATÓRIO claro, objetivo e formal, em linguagem própria da prática forense. "
-        "IMPORTANTE: Responda SEMPRE em português brasileiro, utilizando a norma culta da língua portuguesa. "
-
-        "REGRA CRÍTICA: Todo nome de pessoa/parte deve ter **asteriscos duplos** em volta. "
-        "Evite termos técnicos de programação (como true/false, AT/PA). "
-        "Use expressões jurídicas completas, como 'polo ativo' e 'polo passivo'. "
-        "Ao tratar de prazos, indique se o pagamento é imediato ou ao final do processo. "
-        "Não escreva Tribunal de Justiça por extenso, apenas TJ-MS."
-    )
-
-    user = f"""
-<contexto>
-Processo: {numero_cnj_fmt}
-
-DADOS EVIDENCIAIS (JSON):
-{resumo_json}
-</contexto>
-
-<tarefas>
-
-1. **Identificação das Partes**
-   - Apresente as partes separadas por polo processual, utilizando "polo ativo" e "polo passivo".
-   - OBRIGATÓRIO: Para cada parte, coloque o nome entre **asteriscos duplos** seguido de dois pontos.
-   - Indique, em linguagem natural, se cada parte consta no sistema do TJ-MS como beneficiária da justiça gratuita.
-   - Formato obrigatório: **Nome da Parte**: Consta no sistema como beneficiária da justiça gratuita.
-   - Exemplo EXATO: **Maria da Silva**: Consta no sistema do TJ-MS como beneficiária da justiça gratuita.
-   - Exemplo EXATO: **João Santos**: Não consta no sistema do TJ-MS como beneficiário da justiça gratuita.
-
-2. **Confirmação da Gratuidade da Justiça**
-   - Esclareça, para cada parte, se o sistema do TJ-MS indica a gratuidade da justiça.
-   - Verifique se há decisão nos autos que conceda a gratuidade e transcreva o trecho relevante entre aspas.
-   - **IMPORTANTE - IDENTIFICAÇÃO DO BENEFICIÁRIO:**
-     * Analise CUIDADOSAMENTE a descrição de cada decisão/despacho para identificar QUEM é o beneficiário da justiça gratuita.
-     * Procure por nomes específicos, termos como "parte autora", "requerente", "autor", "réu", "executado", etc.
-     * Se a decisão mencionar nome específico de uma parte (ex: "Defiro a gratuidade a João da Silva"), associe ao nome correspondente no polo processual.
-     * Se a decisão usar termo genérico mas houver apenas UMA parte naquele polo (ex: "Defiro ao autor" e só há um autor), associe àquela parte específica.
-     * Se a decisão usar termo genérico e houver MÚLTIPLAS partes no polo (ex: "Defiro aos autores" e há 3 autores), considere que TODAS as partes daquele polo foram beneficiadas.
-     * Se houver DÚVIDA sobre quem é o beneficiário, indique explicitamente no relatório: "⚠️ REVISÃO NECESSÁRIA: Não foi possível identificar com certeza qual parte foi beneficiada por esta decisão. Verificar manualmente."
-   - Diferencie expressamente:
-     (a) quando o sistema aponta gratuidade mas não há decisão confirmatória;
-     (b) quando existe decisão judicial concedendo a gratuidade com beneficiário claramente identificado;
-     (c) quando existe decisão judicial mas o beneficiário é ambíguo ou incerto;
-     (d) quando não se identificam elementos.
-   - Para cada parte, use o formato: **Nome da Parte**: [informação sobre gratuidade do sistema] + [informação sobre decisão judicial com identificação do beneficiário].
-   - Exemplos de saída esperada:
-     * "**João da Silva**: Consta no sistema como beneficiário. Decisão confirmatória identificou especificamente esta parte como beneficiária: 'Defiro a gratuidade ao autor João da Silva' (Despacho, 01/01/2023)."
-     * "**Maria Santos**: Consta no sistema como beneficiária. Decisão deferindo gratuidade, mas ⚠️ REVISÃO NECESSÁRIA: o texto não especifica qual dos autores foi beneficiado."
-     * "**Pedro Oliveira**: Não consta no sistema. Há decisão deferindo gratuidade 'aos autores', mas há 3 autores no processo. ⚠️ REVISÃO NECESSÁRIA: confirmar se esta parte específica foi beneficiada."
-
-3. **Análise das Decisões sobre Perícia**
-   - Analise EXCLUSIVAMENTE as decisões e despachos que tratam de perícia, incluindo designação, nomeação de peritos, arbitramento de honorários periciais, ou determinações relacionadas à prova pericial.
-   - Se não houver nenhuma decisão ou despacho tratando de perícia, informe claramente: "Não há decisões ou despachos tratando de perícia nos autos analisados."
-   - Para cada decisão pericial encontrada, indique:
-     * Se houve designação de perícia (Sim/Não)
-     * O valor arbitrado para honorários periciais, quando existente (ex: R$ 500,00)
-     * Quem deve arcar com o pagamento dos honorários (autor, réu, Estado ou outra forma)
-     * O momento do pagamento: se imediato ou ao final do processo
-     * Transcreva o trecho relevante da decisão entre aspas
-   - Realize a análise de conformidade com a TABELA de honorários periciais transcrita abaixo:
-     - Considere que o juiz pode ultrapassar o limite em até 5 vezes, desde que fundamentado.
-     - Classifique o valor como:
-       (a) dentro da tabela;
-       (b) acima da tabela, mas dentro do limite de 5 vezes com fundamentação;
-       (c) acima do limite permitido;
-       (d) não identificado.
-     - Ao concluir, escreva obrigatoriamente:
-       "Análise realizada com base na Resolução CNJ n. 232/2016, conforme redação dada pelas Resoluções n. 326/2020, n. 545/2024 e n. 599/2024."
-
-4. **Apenso em cumprimento de sentença**
-   - Se o processo não for de cumprimento de sentença, mas houve indicação de apensamento, indique isso no relatório.
-   - Caso o processo seja de cumprimento de sentença e haja indícios de apensamento, finalize o relatório com a advertência:
-     "Aviso: Processo de cumprimento possivelmente apensado. Recomenda-se consulta ao processo originário para confirmar a concessão da justiça gratuita."
-</tarefas>
-
-<tabela_resolucao_232>
-Use a seguinte TABELA DE HONORÁRIOS como referência (valores máximos):
-
-1. Ciências Econômicas/Contábeis
-- Laudo em demanda de servidor(es) contra União/Estado/Município: R$ 300,00
-- Laudo revisional envolvendo negócios bancários até 4 contratos: R$ 370,00
-- Laudo revisional envolvendo negócios bancários acima de 4 contratos: R$ 630,00
-- Laudo em dissolução/liquidação de sociedades civis e mercantis: R$ 830,00
-- Outras: R$ 370,00
-
-2. Engenharia/Arquitetura
-- Avaliação de imóvel urbano (ABNT): R$ 430,00
-- Avaliação de imóvel rural (ABNT): R$ 530,00
-- Laudo estrutural/segurança de imóvel (ABNT): R$ 370,00
-- Avaliação de bens fungíveis/rural/urbano (ABNT): R$ 700,00
-- Ação Demarcatória: R$ 870,00
-- Laudo de insalubridade/periculosidade: R$ 370,00
-- Outras: R$ 370,00
-
-3. Medicina/Odontologia
-- Interdição/DNA: R$ 370,00
-- Danos físicos/estéticos: R$ 370,00
-- Outras: R$ 370,00
-
-4. Psicologia: R$ 300,00
-5. Serviço Social – Estudo social: R$ 300,00
-
-6. Outras especialidades
-- Avaliação comercial de bens imóveis: R$ 170,00
-- Avaliação comercial por corretor: R$ 330,00
-- Outras: R$ 300,00
-
-**Regra especial (§4º do art. 2º):** O juiz pode ultrapassar o limite fixado em até 5 vezes, desde que fundamentado.
-</tabela_resolucao_232>
-
-<instruções_de_formatação>
-- Estruture o relatório em seções numeradas.  
-- Utilize linguagem formal, como se fosse redigido por um assistente jurídico.  
-- Prefira construções como "consta no sistema", "há decisão judicial que defere", "não identificado nos autos".  
-- Evite linguagem técnica de programação.  
-</instruções_de_formatação>
-
-<formato_de_saida>
-A resposta deve ser redigida em **Markdown**, no formato de relatório jurídico estruturado em seções numeradas:
-
-# Relatório - Processo XXXXXXX-XX.XXXX.X.XX.XXXX
-
-## 1. Partes, Polos Processuais e Gratuidade da Justiça
-- Apresente as partes separadas por polo processual ("polo ativo" e "polo passivo").
-- Para cada parte, coloque o nome entre **asteriscos duplos** seguido de dois pontos.
-- Informe, em linguagem natural:
-  (a) se consta no sistema do TJ-MS como beneficiária da justiça gratuita;
-  (b) se há decisão judicial confirmatória, transcrevendo o trecho relevante entre aspas E identificando SE POSSÍVEL qual parte específica foi beneficiada;
-  (c) se há dúvida sobre qual parte foi beneficiada, use o marcador "⚠️ REVISÃO NECESSÁRIA";
-  (d) se não há qualquer indicação.
-- **REGRA CRÍTICA DE IDENTIFICAÇÃO:**
-  * Se a decisão menciona nome específico, associe àquela parte.
-  * Se termo genérico com UMA parte no polo, associe àquela parte.
-  * Se termo genérico com MÚLTIPLAS partes no polo, considere todas beneficiadas.
-  * Se AMBÍGUO ou INCERTO, marque com "⚠️ REVISÃO NECESSÁRIA".
-
-**Formato obrigatório:**
-**Nome da Parte**: [informação do sistema do TJ-MS] + [informação sobre decisão judicial com identificação clara do beneficiário].
-
-**Exemplos de saída:**
-
-**Polo ativo:**
-- **Maria da Silva**: Consta no sistema do TJ-MS como beneficiária da justiça gratuita. Decisão confirmatória identificou especificamente esta parte: *"Defiro a gratuidade de justiça à autora Maria da Silva."* (Despacho, 01/01/2023).
-- **João Santos**: Consta no sistema como beneficiário da justiça gratuita. Há decisão deferindo gratuidade aos autores de forma genérica (há 2 autores). Considera-se que ambos foram beneficiados: *"Defiro aos autores."* (Despacho, 01/01/2023).
-- **Pedro Costa**: Consta no sistema como beneficiário. Há decisão deferindo gratuidade, mas ⚠️ REVISÃO NECESSÁRIA: o texto não especifica qual dos 3 autores foi beneficiado: *"Defiro ao primeiro requerente."* (Despacho, 05/01/2023).
-
-**Polo passivo:**
-- **Banco X S.A.**: Não consta no sistema nem há decisão sobre o tema.  
-
-## 2. Análise das Decisões sobre Perícia
-- Listar APENAS decisões e despachos relacionados à perícia em subtópicos (por data).
-- Se não houver decisões sobre perícia, informar: "Não há decisões ou despachos tratando de perícia nos autos analisados."
-- Para cada decisão pericial, informar:
-  - Designação de perícia (Sim/Não).
-  - Valor arbitrado para honorários periciais (em reais).
-  - Responsável pelo pagamento dos honorários (Estado/autor/réu).
-  - Momento do pagamento (imediato/ao final do processo).
-  - Trecho relevante da decisão entre aspas.
-
-**Exemplo de saída:**
-
-### Decisão de 01/01/2023
-- **Designação de perícia:** Sim.  
-- **Valor arbitrado:** R$ 1.500,00.  
-- **Responsável pelo pagamento:** Autor.  
-- **Momento do pagamento:** Ao final do processo.  
-- **Trecho da decisão:** *“Defiro a produção de prova pericial, a ser custeada ao final.”*  
-
-### Decisão de 10/02/2023
-- **Designação de perícia:** Não (indeferimento).
-- **Valor arbitrado:** —
-- **Responsável pelo pagamento:** —
-- **Momento do pagamento:** —
-- **Trecho da decisão:** *"Indefiro o pedido de prova pericial por considerar desnecessária."*  
-
-## 3. Processos Apensados
-- Caso aplicável, incluir o aviso sobre possível apensamento. 
-
-</formato_de_saida>
-
-"""
-    return [
-        {"role": "system", "content": sys},
-        {"role": "user", "content": user},
-    ]
+# Fallback para o nome antigo (compatibilidade)
+UPDATER_MODULE = find_module("scripts.updater", "updater")
+UPDATER_AVAILABLE = UPDATER_MODULE is not None
+if not UPDATER_AVAILABLE:
+    print("Modulo updater nao encontrado - funcionalidade de auto-update desabilitada")
 
 # =========================
-# Cliente OpenRouter (com fallback e logs)
+# Gerenciador de chaves
 # =========================
-def call_openrouter(messages: list, model: str = DEFAULT_MODEL, temperature=0.2, timeout=120) -> str:
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-        "HTTP-Referer": "https://pge-ms.lab",
-        "X-Title": "Relatório TJMS",
-    }
-    payload = {
-        "model": model,
-        "messages": messages,
-        "temperature": temperature,
-        "max_tokens": 20000,
-    }
-    r = requests.post(OPENROUTER_ENDPOINT, headers=headers, json=payload, timeout=timeout)
-    logger.debug("OpenRouter status=%s", r.status_code)
-    logger.debug("OpenRouter headers=%s", dict(r.headers))
-    r.raise_for_status()
-    j = r.json()
-    # Loga só um pedaço para não poluir
-    logger.debug("OpenRouter body (primeiros 600 chars): %s", json.dumps(j, ensure_ascii=False)[:600])
-
-    # Fallbacks defensivos
-    try:
-        message = j["choices"][0]["message"]
-        content = message.get("content", "")
+KEY_MANAGER_MODULE = find_module("scripts.key_manager", "key_manager")
+KEY_MANAGER_AVAILABLE = KEY_MANAGER_MODULE is not None
+if not KEY_MANAGER_AVAILABLE:
+    print("Modulo key_manager nao encontrado - usando configuracao estatica")
 
-        # Se tem content válido, retorna
-        if content and content.strip():
-            return content
 
-        # Se não tem content, verifica se tem reasoning
-        reasoning = message.get("reasoning", "")
-        if reasoning and reasoning.strip():
-            logger.warning("Resposta sem 'content' mas com 'reasoning'. Usando reasoning como resposta.")
-            return reasoning
+def check_and_update(*args, **kwargs):
+    return importlib.import_module(UPDATER_MODULE).check_and_update(*args, **kwargs)
 
-        # Se não tem nem content nem reasoning, tenta outros campos
-        alt_content = message.get("refusal") or message.get("tool_calls") or ""
-        if alt_content:
-            logger.warning("Usando campo alternativo da resposta.")
-            return str(alt_content)
 
-        logger.warning("Resposta completamente vazia. Retornando mensagem de erro.")
-        return "Erro: A API retornou uma resposta vazia. Tente novamente com um modelo diferente."
+def get_api_key(*args, **kwargs):
+    return importlib.import_module(KEY_MANAGER_MODULE).get_api_key(*args, **kwargs)
 
-    except Exception:
-        logger.exception("Falha ao interpretar resposta da LLM")
-        return f"Erro ao processar resposta da API:\n{json.dumps(j, ensure_ascii=False, indent=2)}"
 
-# =========================
-# Pipeline alto nível
-# =========================
-def full_flow(numero_raw: str, model: str, diagnostic_mode=False) -> Tuple[Dict[str, Any], str]:
-    ok_config, msg_config = validate_config()
-    if not ok_config:
-        raise RuntimeError(f"Falha na configuração: {msg_config}")
-    logger.info("Configuração validada.")
-
-    ok_cnj, d, msg_cnj = validate_cnj(numero_raw)
-    if not ok_cnj:
-        raise ValueError(f"CNJ inválido: {msg_cnj}")
-    cnj_fmt = format_cnj(d)
-    logger.info("CNJ normalizado: %s", cnj_fmt)
-
-    session = make_session()
-    xml_text = soap_consultar_processo(session, d, timeout=90, movimentos=True, incluir_docs=False, debug=(logger.level==logging.DEBUG))
-    logger.info("XML recebido (%d chars).", len(xml_text))
-
-    dados = parse_xml_processo(xml_text)
-    logger.info("Dados extraídos: partes AT=%d, PA=%d; decisões=%d; classe=%s; cumprimento=%s; apenso? %s",
-                len(dados["partes"]["AT"]), len(dados["partes"]["PA"]), len(dados["decisoes"]),
-                dados["classeProcessual"], dados["cumprimento"], dados["possivel_apenso"])
-
-    if diagnostic_mode:
-        messages = [
-            {"role": "system", "content": "Você é um analisador de sanidade. Responda sucintamente."},
-            {"role": "user", "content": f"Teste: recebi JSON com AT={len(dados['partes']['AT'])}, "
-                                         f"PA={len(dados['partes']['PA'])}, decs={len(dados['decisoes'])}. Diga 'OK' e ecoe os números."}
-        ]
-    else:
-        messages = build_messages_for_llm(cnj_fmt, dados)
+# Importados em segundo plano logo após a primeira pintura da janela, para que o
+# primeiro clique não pague o import (a ordem segue o uso provável)
+PRELOAD_MODULES = tuple(m for m in ("scripts.pipeline", "scripts.batch",
+                                    "scripts.async_pipeline" if ASYNC_AVAILABLE else None,
+                                    "scripts.metrics", UPDATER_MODULE, KEY_MANAGER_MODULE) if m)
+PRELOAD_DELAY_MS = 100
 
-    rel = call_openrouter(messages, model=model)
-    # reforço do aviso se for cumprimento + apenso
-    if dados.get("cumprimento") and dados.get("possivel_apenso"):
-        rel += "\n\nAviso: Processo de cumprimento possivelmente apensado. Talvez seja necessário consultar o processo originário para confirmar a AJG."
-    logger.info("LLM respondeu com %d caracteres.", len(rel))
-    return dados, rel
+# Intervalo (ms) entre drenagens da fila de atualizações da interface (~30 quadros/s); os
+# trechos do streaming e as linhas de log que chegam nesse intervalo são aplicados juntos
+UI_FRAME_MS = 33
+# Tempo máximo (s) de cada drenagem; o que sobrar fica para o próximo quadro
+UI_FRAME_BUDGET_S = 0.02
 
 # =========================
 # UI com log incorporado
@@ -614,21 +121,132 @@ class UILogHandler(logging.Handler):
 
     def emit(self, record):
         try:
-            self.writer(self.format(record))
+            # O nível acompanha a linha para os filtros do painel (ver LogPane)
+            self.writer((record.levelno, self.format(record)))
         except Exception:
             pass
 
-# ========= FUNÇÃO CORRIGIDA PARA RENDERIZAÇÃO DE MARKDOWN =========
-def render_markdown_basic(text_widget: ScrolledText, markdown_text: str):
+
+class UIUpdateQueue:
     """
-    Renderiza markdown básico no widget de texto com formatação.
-    Suporta: **negrito**, *itálico*, # cabeçalhos, - listas, citações com aspas.
+    Fila thread-safe de atualizações da interface. Threads de trabalho, callbacks
+    do event loop e o handler de log só enfileiram; a thread da interface drena a
+    fila a cada UI_FRAME_MS (via after), na ordem de chegada. Linhas de log
+    consecutivas são entregues juntas a log_writer (um único insert por quadro).
     """
-    import re
 
-    # Limpar widget
-    text_widget.delete("1.0", "end")
+    def __init__(self, root: tk.Misc, log_writer: Callable[[List[Tuple[int, str]]], None]):
+        self._root = root
+        self._log_writer = log_writer
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._after_id = None
+
+    def call(self, fn: Callable, *args):
+        """Agenda fn(*args) na thread da interface (pode ser chamado de qualquer thread)."""
+        self._queue.put((fn, args))
+
+    def log(self, entry: Tuple[int, str]):
+        """Enfileira uma linha de log (nível, texto)."""
+        self._queue.put((None, entry))
+
+    def start(self):
+        self._after_id = self._root.after(UI_FRAME_MS, self._drain)
 
+    def stop(self):
+        if self._after_id is not None:
+            self._root.after_cancel(self._after_id)
+            self._after_id = None
+
+    def _flush_log(self, lines: List[Tuple[int, str]]):
+        try:
+            self._log_writer(lines)
+        except tk.TclError:
+            pass
+
+    def _drain(self):
+        limite = time.perf_counter() + UI_FRAME_BUDGET_S
+        lines: List[Tuple[int, str]] = []
+        try:
+            while time.perf_counter() < limite:
+                fn, args = self._queue.get_nowait()
+                if fn is None:
+                    lines.append(args)
+                    continue
+                # Mantém a ordem entre o log e as demais atualizações
+                if lines:
+                    self._flush_log(lines)
+                    lines = []
+                try:
+                    fn(*args)
+                except Exception:
+                    logger.exception("Falha ao atualizar a interface")
+        except queue.Empty:
+            pass
+        if lines:
+            self._flush_log(lines)
+        self._after_id = self._root.after(UI_FRAME_MS, self._drain)
+
+
+class LogPane:
+    """
+    Painel de log com tamanho limitado. As linhas (nível, texto) ficam em um buffer
+    circular de max_buffer entradas; o widget mostra só as últimas max_lines que
+    passam no filtro de nível/texto e é aparado pelo início quando passa do limite
+    (com folga de 10%, para não apagar a cada quadro). Mudar o filtro redesenha o
+    widget a partir do buffer com um único insert. O histórico completo fica no
+    arquivo de log (config.LOG_DIR), não na memória do widget.
+    """
+
+    def __init__(self, text_widget: ScrolledText, max_buffer: int, max_lines: int):
+        self.text = text_widget
+        self.buffer: "deque[Tuple[int, str]]" = deque(maxlen=max(1, max_buffer))
+        self.max_lines = max(1, max_lines)
+        self.min_level = logging.NOTSET
+        self.pattern = ""
+        self._lines = 0  # linhas (com as quebras internas) atualmente no widget
+
+    def _visible(self, level: int, line: str) -> bool:
+        return level >= self.min_level and (not self.pattern or self.pattern in line.lower())
+
+    def append(self, entries: List[Tuple[int, str]]):
+        self.buffer.extend(entries)
+        lines = [line for level, line in entries if self._visible(level, line)]
+        if not lines:
+            return
+        text = "\n".join(lines[-self.max_lines:]) + "\n"
+        self.text.insert("end", text)
+        self._lines += text.count("\n")
+        if self._lines > self.max_lines + self.max_lines // 10:
+            excess = self._lines - self.max_lines
+            self.text.delete("1.0", f"{excess + 1}.0")
+            self._lines = self.max_lines
+        self.text.see("end")
+
+    def set_filter(self, min_level: int, pattern: str):
+        """Aplica o filtro (nível mínimo e texto, sem diferenciar maiúsculas) e redesenha a partir do buffer."""
+        self.min_level = min_level
+        self.pattern = pattern.strip().lower()
+        lines = list(islice((line for level, line in reversed(self.buffer) if self._visible(level, line)),
+                            self.max_lines))
+        lines.reverse()
+        self.text.delete("1.0", "end")
+        self._lines = 0
+        if lines:
+            text = "\n".join(lines) + "\n"
+            self.text.insert("end", text)
+            self._lines = text.count("\n")
+        self.text.see("end")
+
+    def clear(self):
+        self.buffer.clear()
+        self.text.delete("1.0", "end")
+        self._lines = 0
+
+# ========= RENDERIZAÇÃO DE MARKDOWN NO WIDGET =========
+def configure_markdown_tags(text_widget: ScrolledText):
+    """Configura as tags de formatação usadas pela renderização de markdown (uma vez por widget)."""
+    if getattr(text_widget, "_markdown_tags_ok", False):
+        return
     margin_left = 20
     margin_right = 20
     line_spacing = 6
@@ -652,281 +270,186 @@ def render_markdown_basic(text_widget: ScrolledText, markdown_text: str):
 
     # Configurar espaçamento padrão apenas para texto normal (será aplicado seletivamente)
     text_widget.tag_configure("default_spacing", spacing3=line_spacing, justify="left")
+    text_widget._markdown_tags_ok = True
 
 
-    lines = markdown_text.split('\n')
-
-    for i, line in enumerate(lines):
-        # Identificar tipo de linha
-        if line.startswith('### '):
-            render_line(text_widget, line[4:], "h3")
-        elif line.startswith('## '):
-            render_line(text_widget, line[3:], "h2")
-        elif line.startswith('# '):
-            render_line(text_widget, line[2:], "h1")
-        elif re.match(r'^\s*[-*]\s+', line):
-            # Converter marcador para bullet point
-            text = re.sub(r'^\s*[-*]\s+', '• ', line)
-            render_line(text_widget, text, "list")
+def _append_block_runs(args: List[Any], bloco: Bloco):
+    """
+    Acrescenta a args os pares texto/tags de um bloco (com a quebra final), no
+    formato aceito por Text.insert. Os tipos de bloco e estilos inline da árvore
+    são os próprios nomes das tags; pares seguidos com as mesmas tags são unidos.
+    """
+    tipo = bloco.tipo
+    if tipo == "empty":
+        pairs = [("\n", ())]
+    elif tipo in ("h1", "h2", "h3"):
+        pairs = [(t, (s or tipo,)) for t, s in bloco.trechos] + [("\n", ())]
+    else:
+        # Espaçamento padrão na linha toda, inclusive a quebra (Tkinter não suporta justificação)
+        pairs = [("• ", ("list", "default_spacing"))] if tipo == "list" else []
+        pairs += [(t, (s or tipo, "default_spacing")) for t, s in bloco.trechos]
+        pairs.append(("\n", ("default_spacing",)))
+    for t, tags in pairs:
+        if args and args[-1] == tags:
+            args[-2] += t
         else:
-            if line.strip():
-                render_line(text_widget, line, "normal")
-            else:
-                text_widget.insert("end", "\n")
+            args += [t, tags]
+
+
+def markdown_runs(markdown_text: str) -> List[Any]:
+    """Pares texto/tags do relatório inteiro, prontos para um único Text.insert."""
+    args: List[Any] = []
+    for bloco in parse_markdown(markdown_text):
+        _append_block_runs(args, bloco)
+    return args
 
+
+def render_markdown_line(text_widget: ScrolledText, line: str):
+    """Identifica o tipo de uma linha markdown e a renderiza no final do widget."""
+    args: List[Any] = []
+    _append_block_runs(args, parse_markdown_line(line))
+    text_widget.insert("end", *args)
+
+@traced("render_markdown_basic")
+def render_markdown_basic(text_widget: ScrolledText, markdown_text: str):
+    """
+    Renderiza markdown básico no widget de texto com formatação.
+    Suporta: **negrito**, *itálico*, # cabeçalhos, - listas, > citações, citações com aspas.
+    O relatório é inserido de uma vez (uma chamada a insert com texto/tags alternados).
+    """
+    # Limpar widget
+    text_widget.delete("1.0", "end")
+    configure_markdown_tags(text_widget)
+    text_widget.insert("end", *markdown_runs(markdown_text))
     text_widget.see("1.0")
 
-def render_line(text_widget: ScrolledText, line: str, base_style: str):
+
+class JobCancelled(Exception):
+    """Levantada no pipeline com threads para interromper um job cancelado."""
+
+
+class GenerationJob:
     """
-    Renderiza uma linha com formatações inline mantidas.
-    Remove marcadores markdown e aplica as formatações correspondentes.
+    Geração de relatório em andamento na interface.
+    cancel() marca o job como cancelado e, no pipeline assíncrono, cancela a task
+    (abortando as requisições HTTP); no pipeline com threads, a requisição em curso
+    termina normalmente e o fluxo para na etapa seguinte (raise_if_cancelled) ou no
+    próximo trecho do streaming.
     """
-    import re
 
-    # Estrutura para armazenar partes do texto com suas formatações
-    parts = []
-
-    # Processar a linha para identificar formatações
-    remaining = line
-    position = 0
-
-    while remaining:
-        # Procurar próxima formatação
-        next_bold = remaining.find('**')
-        next_italic = -1
-
-        # Procurar itálico (evitando confundir com negrito)
-        for i, char in enumerate(remaining):
-            if char == '*' and (i == 0 or remaining[i-1] != '*') and (i+1 >= len(remaining) or remaining[i+1] != '*'):
-                next_italic = i
-                break
-
-        next_quote = remaining.find('"')
-
-        # Determinar qual vem primeiro
-        positions = [(next_bold, 'bold'), (next_italic, 'italic'), (next_quote, 'quote')]
-        positions = [(pos, type) for pos, type in positions if pos >= 0]
-
-        if not positions:
-            # Sem mais formatações, adicionar o resto como texto normal
-            if remaining:
-                parts.append((remaining, base_style))
-            break
-
-        # Ordenar por posição
-        positions.sort(key=lambda x: x[0])
-        next_pos, format_type = positions[0]
-
-        # Adicionar texto antes da formatação
-        if next_pos > 0:
-            parts.append((remaining[:next_pos], base_style))
-
-        # Processar a formatação
-        if format_type == 'bold':
-            # Encontrar o fechamento
-            end = remaining.find('**', next_pos + 2)
-            if end > next_pos + 2:
-                content = remaining[next_pos + 2:end]
-                parts.append((content, 'bold'))
-                remaining = remaining[end + 2:]
-            else:
-                # Sem fechamento, tratar como texto normal
-                parts.append((remaining[next_pos:next_pos+2], base_style))
-                remaining = remaining[next_pos + 2:]
-
-        elif format_type == 'italic':
-            # Encontrar o próximo asterisco isolado
-            end = next_pos + 1
-            while end < len(remaining):
-                if remaining[end] == '*' and (end + 1 >= len(remaining) or remaining[end + 1] != '*'):
-                    content = remaining[next_pos + 1:end]
-                    if content and not content.isspace():
-                        parts.append((content, 'italic'))
-                        remaining = remaining[end + 1:]
-                    else:
-                        parts.append((remaining[next_pos], base_style))
-                        remaining = remaining[next_pos + 1:]
-                    break
-                end += 1
-            else:
-                # Sem fechamento
-                parts.append((remaining[next_pos], base_style))
-                remaining = remaining[next_pos + 1:]
-
-        elif format_type == 'quote':
-            # Encontrar o fechamento
-            end = remaining.find('"', next_pos + 1)
-            if end > next_pos:
-                content = '"' + remaining[next_pos + 1:end] + '"'
-                parts.append((content, 'quote'))
-                remaining = remaining[end + 1:]
-            else:
-                # Sem fechamento
-                parts.append((remaining[next_pos], base_style))
-                remaining = remaining[next_pos + 1:]
+    def __init__(self, job_id: int, numero: str):
+        self.id = job_id
+        self.numero = numero
+        self.future: Optional[Future] = None
+        self.cancelled = threading.Event()
+        self.trace = Trace("relatorio", processo=numero)
+        self.erro: Optional[BaseException] = None
 
-    # Inserir as partes no widget com suas formatações
-    line_start = text_widget.index("end-1c")
+    def cancel(self):
+        self.cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
 
-    for text, style in parts:
-        if text:
-            # Inserir com a tag diretamente
-            text_widget.insert("end", text, (style,))
+    def raise_if_cancelled(self):
+        if self.cancelled.is_set():
+            raise JobCancelled()
 
-    text_widget.insert("end", "\n")
 
-    # Aplicar espaçamento padrão à linha toda (Tkinter não suporta justificação)
-    if base_style not in ["h1", "h2", "h3"]:
-        line_end = text_widget.index("end-1c")
-        text_widget.tag_add("default_spacing", line_start, line_end)
+class StreamingMarkdownRenderer:
+    """
+    Renderização incremental do relatório durante o streaming da LLM.
+    Linhas completas são renderizadas como em render_markdown_basic (um insert
+    por trecho recebido); a linha ainda incompleta fica como texto simples
+    (tag "stream_tail") e é substituída a cada novo trecho. Deve ser usada
+    apenas na thread da interface.
+    """
 
+    def __init__(self, text_widget: ScrolledText):
+        self.text_widget = text_widget
+        self._pending = ""
+        text_widget.delete("1.0", "end")
+        configure_markdown_tags(text_widget)
+
+    def _drop_tail(self):
+        ranges = self.text_widget.tag_ranges("stream_tail")
+        if ranges:
+            self.text_widget.delete(ranges[0], ranges[-1])
+
+    def feed(self, chunk: str):
+        if not chunk:
+            return
+        self._pending += chunk
+        *complete_lines, self._pending = self._pending.split('\n')
+        self._drop_tail()
+        args: List[Any] = []
+        for line in complete_lines:
+            _append_block_runs(args, parse_markdown_line(line))
+        if self._pending:
+            args += [self._pending, ("normal", "stream_tail")]
+        if args:
+            self.text_widget.insert("end", *args)
+        self.text_widget.see("end")
+
+    def close(self):
+        """Renderiza a última linha pendente (sem quebra final)."""
+        self._drop_tail()
+        if self._pending:
+            render_markdown_line(self.text_widget, self._pending)
+            self._pending = ""
+
+@traced("markdown_to_rtf")
 def markdown_to_rtf(markdown_text: str) -> str:
     """
     Converte markdown básico para RTF (Rich Text Format) com formatação completa.
     Suporta: **negrito**, *itálico*, # cabeçalhos, citações com aspas, listas.
     """
-    import re
-
     # Cabeçalho RTF com configuração completa
     rtf_content = r"""{\rtf1\ansi\deff0\nouicompat\deflang1046{\fonttbl{\f0\fnil\fcharset0 Arial;}}
 {\colortbl;\red0\green0\blue0;\red46\green74\blue107;\red102\green102\blue102;}
 \viewkind4\uc1
 \pard\sa200\sl276\slmult1\f0\fs22\lang22 """
 
-    lines = markdown_text.split('\n')
+    partes = [rtf_content]
 
-    for line in lines:
+    for bloco in parse_markdown(markdown_text):
+        tipo = bloco.tipo
         # Linhas vazias
-        if not line.strip():
-            rtf_content += r"\par "
+        if tipo == "empty":
+            partes.append(r"\par ")
             continue
 
-        # Detectar e processar cabeçalhos
-        if line.startswith('# '):
+        processed_text = to_rtf(bloco.trechos)
+        if tipo == "h1":
             # H1 - Tamanho 32 (16pt), negrito, azul, centralizado
-            text = line[2:].strip()
-            processed_text = process_inline_rtf(text)
-            rtf_content += r"\pard\qc\sa200\sl276\slmult1{\cf2\b\fs32 " + processed_text + r"\cf0\b0\fs22\par}"
-            rtf_content += r"\pard\sa200\sl276\slmult1 "
-
-        elif line.startswith('## '):
+            partes.append(r"\pard\qc\sa200\sl276\slmult1{\cf2\b\fs32 " + processed_text + r"\cf0\b0\fs22\par}")
+            partes.append(r"\pard\sa200\sl276\slmult1 ")
+        elif tipo == "h2":
             # H2 - Tamanho 28 (14pt), negrito, azul
-            text = line[3:].strip()
-            processed_text = process_inline_rtf(text)
-            rtf_content += r"\pard\sa200\sl276\slmult1{\cf2\b\fs28 " + processed_text + r"\cf0\b0\fs22\par}"
-
-        elif line.startswith('### '):
+            partes.append(r"\pard\sa200\sl276\slmult1{\cf2\b\fs28 " + processed_text + r"\cf0\b0\fs22\par}")
+        elif tipo == "h3":
             # H3 - Tamanho 24 (12pt), negrito, azul
-            text = line[4:].strip()
-            processed_text = process_inline_rtf(text)
-            rtf_content += r"\pard\sa200\sl276\slmult1{\cf2\b\fs24 " + processed_text + r"\cf0\b0\fs22\par}"
-
-        # Processar listas
-        elif line.strip().startswith('- ') or line.strip().startswith('* ') or line.strip().startswith('• '):
-            # Remove o marcador e processa o texto
-            text = re.sub(r'^\s*[-*•]\s*', '', line.strip())
-            processed_text = process_inline_rtf(text)
+            partes.append(r"\pard\sa200\sl276\slmult1{\cf2\b\fs24 " + processed_text + r"\cf0\b0\fs22\par}")
+        elif tipo == "list":
             # Usa o bullet point unicode
-            rtf_content += r"\pard\li720\fi-360\sa200\sl276\slmult1{\bullet\tab}" + processed_text + r"\par "
-
+            partes.append(r"\pard\li720\fi-360\sa200\sl276\slmult1{\bullet\tab}" + processed_text + r"\par ")
+        elif tipo == "quote":
+            # Citação em bloco: recuada, em itálico e cinza
+            partes.append(r"\pard\li720\ri720\sa200\sl276\slmult1\qj{\i\cf3 " + processed_text + r"\cf0\i0}\par ")
         else:
             # Texto normal - justificado
-            processed_text = process_inline_rtf(line.strip())
-            rtf_content += r"\pard\sa200\sl276\slmult1\qj " + processed_text + r"\par "
+            partes.append(r"\pard\sa200\sl276\slmult1\qj " + processed_text + r"\par ")
 
-    rtf_content += r"}"
-    return rtf_content
+    partes.append(r"}")
+    return "".join(partes)
 
 def process_inline_rtf(text: str) -> str:
     """
     Processa formatação inline (negrito, itálico, citações) para RTF.
     Mantém a estrutura e aplica formatação corretamente.
     """
-    import re
-
-    # Debug: verificar se tem marcações
-    original_text = text
-
-    # Primeiro, fazer escape de caracteres especiais RTF (exceto os marcadores markdown)
-    text = text.replace('\\', '\\\\')
-    text = text.replace('{', '\\{')
-    text = text.replace('}', '\\}')
-
-    # Converter caracteres acentuados para códigos RTF
-    replacements = {
-        'á': r"\'e1", 'à': r"\'e0", 'ã': r"\'e3", 'â': r"\'e2",
-        'é': r"\'e9", 'è': r"\'e8", 'ê': r"\'ea",
-        'í': r"\'ed", 'ì': r"\'ec", 'î': r"\'ee",
-        'ó': r"\'f3", 'ò': r"\'f2", 'õ': r"\'f5", 'ô': r"\'f4",
-        'ú': r"\'fa", 'ù': r"\'f9", 'û': r"\'fb", 'ü': r"\'fc",
-        'ç': r"\'e7", 'Ç': r"\'c7",
-        'Á': r"\'c1", 'À': r"\'c0", 'Ã': r"\'c3", 'Â': r"\'c2",
-        'É': r"\'c9", 'È': r"\'c8", 'Ê': r"\'ca",
-        'Í': r"\'cd", 'Ì': r"\'cc", 'Î': r"\'ce",
-        'Ó': r"\'d3", 'Ò': r"\'d2", 'Õ': r"\'d5", 'Ô': r"\'d4",
-        'Ú': r"\'da", 'Ù': r"\'d9", 'Û': r"\'db", 'Ü': r"\'dc"
-    }
-
-    for char, rtf_code in replacements.items():
-        text = text.replace(char, rtf_code)
-
-    # Processar formatações markdown
-    result = ""
-    i = 0
-
-    while i < len(text):
-        # Verificar negrito **texto**
-        if i < len(text) - 1 and text[i:i+2] == '**':
-            # Procurar o fechamento
-            end = text.find('**', i + 2)
-            if end != -1:
-                content = text[i+2:end]
-                # Aplicar negrito
-                result += r"{\b " + content + r"}"
-                i = end + 2
-                continue
-
-        # Verificar itálico *texto* (mas não confundir com negrito)
-        if text[i] == '*' and (i == 0 or text[i-1] != '*') and (i+1 < len(text) and text[i+1] != '*'):
-            # Procurar o próximo * isolado
-            j = i + 1
-            found = False
-            while j < len(text):
-                if text[j] == '*' and (j+1 >= len(text) or text[j+1] != '*'):
-                    content = text[i+1:j]
-                    if content and not content.isspace():
-                        # Aplicar itálico
-                        result += r"{\i " + content + r"}"
-                        i = j + 1
-                        found = True
-                        break
-                j += 1
-
-            if not found:
-                result += text[i]
-                i += 1
-            continue
-
-        # Verificar citações "texto"
-        if text[i] == '"':
-            end = text.find('"', i + 1)
-            if end != -1:
-                content = text[i+1:end]
-                # Citações em itálico com cor cinza
-                result += r'{\i\cf3 "' + content + r'"\cf0\i0}'
-                i = end + 1
-                continue
-
-        # Caractere normal
-        result += text[i]
-        i += 1
-
-    # Debug: verificar se a conversão funcionou
-    if '**' in original_text and '\\b' not in result:
-        logger.warning(f"AVISO: Negrito não convertido em RTF! Original: {original_text[:50]}...")
-
-    return result
+    return to_rtf(tokenize_inline(text))
 
+@traced("markdown_to_pdf")
 def markdown_to_pdf(markdown_text: str, output_path: str, numero_processo: str = ""):
     """
     Converte markdown para PDF mantendo formatação (negrito, itálico, cabeçalhos).
@@ -1005,6 +528,16 @@ def markdown_to_pdf(markdown_text: str, output_path: str, numero_processo: str =
             leading=15
         )
 
+        # Estilo para citações em bloco ("> ")
+        quote_style = ParagraphStyle(
+            'CustomQuote',
+            parent=normal_style,
+            fontName='Helvetica-Oblique',
+            leftIndent=36,
+            rightIndent=36,
+            textColor=HexColor('#666666')
+        )
+
         # Processar conteúdo
         story = []
 
@@ -1013,34 +546,19 @@ def markdown_to_pdf(markdown_text: str, output_path: str, numero_processo: str =
             story.append(Paragraph(f"RELATÓRIO - Processo {numero_processo}", title_style))
             story.append(Spacer(1, 20))
 
-        lines = markdown_text.split('\n')
+        block_styles = {"h1": title_style, "h2": h2_style, "h3": h3_style, "quote": quote_style}
 
-        for line in lines:
-            line = line.strip()
-            if not line:
+        for bloco in parse_markdown(markdown_text):
+            if bloco.tipo == "empty":
                 story.append(Spacer(1, 6))
                 continue
 
             # Processar diferentes tipos de linha
-            if line.startswith('# '):
-                text = process_inline_pdf(line[2:].strip())
-                story.append(Paragraph(text, title_style))
-
-            elif line.startswith('## '):
-                text = process_inline_pdf(line[3:].strip())
-                story.append(Paragraph(text, h2_style))
-
-            elif line.startswith('### '):
-                text = process_inline_pdf(line[4:].strip())
-                story.append(Paragraph(text, h3_style))
-
-            elif line.startswith('- ') or line.startswith('* ') or line.startswith('• '):
-                text = process_inline_pdf(line[2:].strip())
+            text = to_reportlab(bloco.trechos)
+            if bloco.tipo == "list":
                 story.append(Paragraph(f"• {text}", list_style))
-
             else:
-                text = process_inline_pdf(line)
-                story.append(Paragraph(text, normal_style))
+                story.append(Paragraph(text, block_styles.get(bloco.tipo, normal_style)))
 
         # Gerar PDF
         doc.build(story)
@@ -1055,29 +573,7 @@ def process_inline_pdf(text: str) -> str:
     """
     Processa formatação inline para PDF (ReportLab).
     """
-    import re
-
-    original_text = text
-
-    # Escapar caracteres especiais do ReportLab
-    text = text.replace('&', '&amp;')
-    text = text.replace('<', '&lt;')
-    text = text.replace('>', '&gt;')
-
-    # Processar negritos **texto** -> <b>texto</b>
-    text = re.sub(r'\*\*(.*?)\*\*', r'<b>\1</b>', text)
-
-    # Processar itálicos *texto* -> <i>texto</i>
-    text = re.sub(r'(?<!\*)\*([^*\s][^*]*?[^*\s])\*(?!\*)', r'<i>\1</i>', text)
-
-    # Processar citações "texto" -> <i><font color="#666666">texto</font></i>
-    text = re.sub(r'"([^"]+)"', r'<i><font color="#666666">"\1"</font></i>', text)
-
-    # Debug: verificar se a conversão funcionou
-    if '**' in original_text and '<b>' not in text:
-        logger.warning(f"AVISO: Negrito não convertido em PDF! Original: {original_text[:50]}...")
-
-    return text
+    return to_reportlab(tokenize_inline(text))
 
 # ============= FUNÇÃO DE TEMPLATE SIMPLES =============
 
@@ -1129,44 +625,24 @@ def convert_markdown_to_rtf_content(markdown_text: str) -> str:
     Converte markdown para conteúdo RTF formatado (SEM cabeçalhos {\rtf1...)
     Retorna apenas os comandos de formatação e texto.
     """
-    import re
-
     if not markdown_text or not markdown_text.strip():
         logger.warning("AVISO: Markdown vazio para conversão RTF!")
         return r'\pard\qj Conteúdo não disponível.\par '
 
-    lines = markdown_text.split('\n')
     rtf_lines = []
     list_counter = 0  # Contador para listas numeradas
+    header_sizes = {"h1": 24, "h2": 20, "h3": 18}
 
-    for line in lines:
-        line = line.strip()
-        if not line:
+    for bloco in parse_markdown(markdown_text):
+        tipo = bloco.tipo
+        if tipo == "empty":
             rtf_lines.append(r'\par ')
             list_counter = 0  # Reset contador em linha vazia
             continue
 
-        # Cabeçalhos
-        if line.startswith('### '):
-            text = line[4:]
-            text = process_inline_rtf_simple(text)
-            rtf_lines.append(rf'\pard\qc\b\fs18 {text}\b0\fs20\par ')
-            list_counter = 0
-        elif line.startswith('## '):
-            text = line[3:]
-            text = process_inline_rtf_simple(text)
-            rtf_lines.append(rf'\pard\qc\b\fs20 {text}\b0\fs20\par ')
-            list_counter = 0
-        elif line.startswith('# '):
-            text = line[2:]
-            text = process_inline_rtf_simple(text)
-            rtf_lines.append(rf'\pard\qc\b\fs24 {text}\b0\fs20\par ')
-            list_counter = 0
-
+        text = to_rtf_simple(bloco.trechos)
         # Listas com marcadores inteligentes
-        elif line.startswith('- '):
-            text = line[2:]
-            text = process_inline_rtf_simple(text)
+        if tipo == "list":
             list_counter += 1
 
             # Usar letras para listas pequenas, bolinhas para grandes
@@ -1174,22 +650,23 @@ def convert_markdown_to_rtf_content(markdown_text: str) -> str:
                 letter = chr(ord('a') + list_counter - 1)
                 marker = f"{letter})"
             else:  # Bolinhas para listas muito grandes
-                marker = "•"
+                marker = r"\'95"
 
             rtf_lines.append(rf'\pard\qj\li360\fi-180 {marker} {text}\par ')
+            continue
+
+        list_counter = 0
+        # Cabeçalhos
+        if tipo in header_sizes:
+            rtf_lines.append(rf'\pard\qc\b\fs{header_sizes[tipo]} {text}\b0\fs20\par ')
 
         # Citações em bloco (com recuo maior e justificação)
-        elif line.startswith('> '):
-            text = line[2:]
-            text = process_inline_rtf_simple(text)
+        elif tipo == "quote":
             rtf_lines.append(rf'\pard\qj\li720\ri720\sb120\sa120\i {text}\i0\par ')
-            list_counter = 0
 
         # Texto normal
         else:
-            text = process_inline_rtf_simple(line)
             rtf_lines.append(rf'\pard\qj {text}\par ')
-            list_counter = 0
 
     result = '\n'.join(rtf_lines)
 
@@ -1205,38 +682,9 @@ def process_inline_rtf_simple(text: str) -> str:
     """
     Processa formatação inline para RTF de forma mais simples e segura
     """
-    import re
-
-    # Escapar caracteres especiais RTF
-    text = text.replace('\\', r'\\')
-    text = text.replace('{', r'\{')
-    text = text.replace('}', r'\}')
-
-    # Converter acentos
-    accent_map = {
-        'á': r"\'e1", 'à': r"\'e0", 'ã': r"\'e3", 'â': r"\'e2",
-        'é': r"\'e9", 'è': r"\'e8", 'ê': r"\'ea",
-        'í': r"\'ed", 'ì': r"\'ec", 'î': r"\'ee",
-        'ó': r"\'f3", 'ò': r"\'f2", 'õ': r"\'f5", 'ô': r"\'f4",
-        'ú': r"\'fa", 'ù': r"\'f9", 'û': r"\'fb",
-        'ç': r"\'e7", 'Ç': r"\'c7",
-        'Á': r"\'c1", 'É': r"\'c9", 'Í': r"\'cd", 'Ó': r"\'d3", 'Ú': r"\'da"
-    }
-
-    for char, code in accent_map.items():
-        text = text.replace(char, code)
-
-    # Processar negritos **texto** -> \b texto\b0
-    text = re.sub(r'\*\*(.*?)\*\*', r'\\b \1\\b0 ', text)
-
-    # Processar itálicos *texto* -> \i texto\i0
-    text = re.sub(r'(?<!\*)\*([^*\s][^*]*?[^*\s])\*(?!\*)', r'\\i \1\\i0 ', text)
-
-    # Processar citações "texto" (mantendo aspas mas em itálico)
-    text = re.sub(r'"([^"]+)"', r'"\\i \1\\i0 "', text)
-
-    return text
+    return to_rtf_simple(tokenize_inline(text))
 
+@traced("rtf_to_pdf")
 def rtf_to_pdf(rtf_path: str, pdf_path: str) -> bool:
     """
     Converte arquivo RTF para PDF usando LibreOffice ou método alternativo
@@ -1286,6 +734,7 @@ def rtf_to_pdf_reportlab(rtf_path: str, pdf_path: str) -> bool:
     logger.warning("Conversão RTF->PDF via reportlab desabilitada (gerava PDFs corrompidos)")
     return "ERRO: LibreOffice necessário para conversão RTF->PDF. Instale LibreOffice ou salve como RTF."
 
+@traced("markdown_to_docx")
 def markdown_to_docx(markdown_text: str, output_path: str, numero_processo: str = "") -> bool:
     """
     Converte markdown para DOCX usando python-docx com template se disponível
@@ -1340,70 +789,50 @@ def markdown_to_docx(markdown_text: str, output_path: str, numero_processo: str
                 section.right_margin = Inches(1.0)
 
         # Processar markdown
-        lines = markdown_text.split('\n')
         list_counter = 0
+        header_sizes = {"h1": 16, "h2": 14, "h3": 12}
 
         # Filtrar linhas vazias consecutivas para evitar parágrafos desnecessários
-        filtered_lines = []
+        blocos = []
         prev_empty = False
-        for line in lines:
-            line = line.strip()
-            if not line:
-                if not prev_empty and filtered_lines:  # Só adicionar linha vazia se já há conteúdo
-                    filtered_lines.append("")
+        for bloco in parse_markdown(markdown_text):
+            if bloco.tipo == "empty":
+                if not prev_empty and blocos:  # Só adicionar linha vazia se já há conteúdo
+                    blocos.append(bloco)
                 prev_empty = True
             else:
-                filtered_lines.append(line)
+                blocos.append(bloco)
                 prev_empty = False
 
-        # Remover linhas vazias do início e fim
-        while filtered_lines and not filtered_lines[0]:
-            filtered_lines.pop(0)
-        while filtered_lines and not filtered_lines[-1]:
-            filtered_lines.pop()
+        # Remover linhas vazias do fim
+        while blocos and blocos[-1].tipo == "empty":
+            blocos.pop()
 
-        for i, line in enumerate(filtered_lines):
-            if not line:
+        for i, bloco in enumerate(blocos):
+            tipo = bloco.tipo
+            if tipo == "empty":
                 # Apenas um espaço pequeno, não um parágrafo completo
-                if i > 0 and i < len(filtered_lines) - 1:  # Se não é a primeira ou última linha
+                if i > 0 and i < len(blocos) - 1:  # Se não é a primeira ou última linha
                     p = doc.add_paragraph()
                     p.space_after = Pt(6)  # Espaço menor
                 list_counter = 0
                 continue
 
             # Cabeçalhos (usando parágrafos com formatação manual para controle total)
-            if line.startswith('### '):
-                p = doc.add_paragraph()
-                p.space_before = Pt(0)
-                p.space_after = Pt(0)
-                run = p.add_run(line[4:])
-                run.font.size = Pt(12)
-                run.font.bold = True
-                run.font.color.rgb = RGBColor(46, 74, 107)  # #2E4A6B
-                list_counter = 0
-            elif line.startswith('## '):
+            if tipo in header_sizes:
                 p = doc.add_paragraph()
                 p.space_before = Pt(0)
                 p.space_after = Pt(0)
-                run = p.add_run(line[3:])
-                run.font.size = Pt(14)
-                run.font.bold = True
-                run.font.color.rgb = RGBColor(46, 74, 107)  # #2E4A6B
-                list_counter = 0
-            elif line.startswith('# '):
-                p = doc.add_paragraph()
-                p.space_before = Pt(0)
-                p.space_after = Pt(0)
-                p.alignment = WD_ALIGN_PARAGRAPH.CENTER
-                run = p.add_run(line[2:])
-                run.font.size = Pt(16)
-                run.font.bold = True
-                run.font.color.rgb = RGBColor(46, 74, 107)  # #2E4A6B
+                if tipo == "h1":
+                    p.alignment = WD_ALIGN_PARAGRAPH.CENTER
+                for run in add_docx_runs(p, bloco.trechos):
+                    run.font.size = Pt(header_sizes[tipo])
+                    run.font.bold = True
+                    run.font.color.rgb = RGBColor(46, 74, 107)  # #2E4A6B
                 list_counter = 0
 
             # Listas
-            elif line.startswith('- '):
-                text = line[2:]
+            elif tipo == "list":
                 list_counter += 1
 
                 # Usar letras ou bolinhas
@@ -1415,14 +844,13 @@ def markdown_to_docx(markdown_text: str, output_path: str, numero_processo: str
 
                 p = doc.add_paragraph()
                 p.add_run(marker)
-                process_docx_inline_formatting(p, text)
+                add_docx_runs(p, bloco.trechos)
                 p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
 
             # Citações
-            elif line.startswith('> '):
-                text = line[2:]
+            elif tipo == "quote":
                 p = doc.add_paragraph()
-                process_docx_inline_formatting(p, text, base_italic=True)
+                add_docx_runs(p, bloco.trechos, base_italic=True)
                 p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
                 p.left_indent = Inches(0.5)
                 p.right_indent = Inches(0.5)
@@ -1431,7 +859,7 @@ def markdown_to_docx(markdown_text: str, output_path: str, numero_processo: str
             # Texto normal
             else:
                 p = doc.add_paragraph()
-                process_docx_inline_formatting(p, line)
+                add_docx_runs(p, bloco.trechos)
                 p.alignment = WD_ALIGN_PARAGRAPH.JUSTIFY
                 list_counter = 0
 
@@ -1446,6 +874,7 @@ def markdown_to_docx(markdown_text: str, output_path: str, numero_processo: str
         logger.exception(f"Erro ao gerar DOCX: {e}")
         return f"ERRO: {str(e)}"
 
+@traced("markdown_to_pdf_weasyprint")
 def markdown_to_pdf_weasyprint(markdown_text: str, output_path: str, numero_processo: str = "") -> bool:
     """
     Converte markdown para PDF usando weasyprint (alternativa ao LibreOffice)
@@ -1522,30 +951,19 @@ def markdown_to_pdf_weasyprint(markdown_text: str, output_path: str, numero_proc
             html_content += f"<h1>Relatório - Processo {numero_processo}</h1>"
 
         # Processar markdown para HTML
-        lines = markdown_text.split('\n')
+        partes = [html_content]
         list_counter = 0
 
-        for i, line in enumerate(lines):
-            line = line.strip()
-            if not line:
-                html_content += "<br>"
+        for bloco in parse_markdown(markdown_text):
+            tipo = bloco.tipo
+            if tipo == "empty":
+                partes.append("<br>")
                 list_counter = 0
                 continue
 
-            # Cabeçalhos
-            if line.startswith('### '):
-                html_content += f"<h3>{line[4:]}</h3>"
-                list_counter = 0
-            elif line.startswith('## '):
-                html_content += f"<h2>{line[3:]}</h2>"
-                list_counter = 0
-            elif line.startswith('# '):
-                html_content += f"<h1>{line[2:]}</h1>"
-                list_counter = 0
-
+            text = to_html(bloco.trechos)
             # Listas
-            elif line.startswith('- '):
-                text = line[2:]
+            if tipo == "list":
                 list_counter += 1
 
                 # Usar letras ou bolinhas
@@ -1555,22 +973,23 @@ def markdown_to_pdf_weasyprint(markdown_text: str, output_path: str, numero_proc
                 else:
                     marker = "• "
 
-                # Processar formatação inline
-                text = process_markdown_inline_html(marker + text)
-                html_content += f'<div class="list-item">{text}</div>'
+                partes.append(f'<div class="list-item">{marker}{text}</div>')
+                continue
+
+            list_counter = 0
+            # Cabeçalhos
+            if tipo in ("h1", "h2", "h3"):
+                partes.append(f"<{tipo}>{text}</{tipo}>")
 
             # Citações
-            elif line.startswith('> '):
-                text = process_markdown_inline_html(line[2:])
-                html_content += f'<div class="quote">{text}</div>'
-                list_counter = 0
+            elif tipo == "quote":
+                partes.append(f'<div class="quote">{text}</div>')
 
             # Texto normal
             else:
-                text = process_markdown_inline_html(line)
-                html_content += f"<p>{text}</p>"
-                list_counter = 0
+                partes.append(f"<p>{text}</p>")
 
+        html_content = "".join(partes)
         html_content += "</body></html>"
 
         # Gerar PDF
@@ -1588,106 +1007,29 @@ def process_docx_inline_formatting(paragraph, text: str, base_italic: bool = Fal
     """
     Processa formatação inline markdown e adiciona runs formatados ao parágrafo DOCX
     """
-    import re
-
     # Limpar o parágrafo (remover runs existentes se houver)
     paragraph.clear()
-
-    # Processar texto com regex para encontrar formatações
-    parts = []
-    i = 0
-    current_text = ""
-
-    while i < len(text):
-        # Negrito **texto**
-        if text[i:i+2] == '**':
-            end_pos = text.find('**', i+2)
-            if end_pos != -1:
-                # Adicionar texto anterior se houver
-                if current_text:
-                    run = paragraph.add_run(current_text)
-                    if base_italic:
-                        run.italic = True
-                    current_text = ""
-
-                # Adicionar texto em negrito
-                bold_text = text[i+2:end_pos]
-                run = paragraph.add_run(bold_text)
-                run.bold = True
-                if base_italic:
-                    run.italic = True
-
-                i = end_pos + 2
-                continue
-
-        # Itálico *texto* (mas não **)
-        elif text[i] == '*' and i+1 < len(text) and text[i+1] != '*':
-            end_pos = text.find('*', i+1)
-            if end_pos != -1 and not text[i-1:i+1] == '**' if i > 0 else True:
-                # Adicionar texto anterior se houver
-                if current_text:
-                    run = paragraph.add_run(current_text)
-                    if base_italic:
-                        run.italic = True
-                    current_text = ""
-
-                # Adicionar texto em itálico
-                italic_text = text[i+1:end_pos]
-                run = paragraph.add_run(italic_text)
-                run.italic = True
-
-                i = end_pos + 1
-                continue
-
-        # Citações "texto"
-        elif text[i] == '"':
-            end_pos = text.find('"', i+1)
-            if end_pos != -1:
-                # Adicionar texto anterior se houver
-                if current_text:
-                    run = paragraph.add_run(current_text)
-                    if base_italic:
-                        run.italic = True
-                    current_text = ""
-
-                # Adicionar aspas e texto em itálico
-                quote_text = text[i:end_pos+1]
-                run = paragraph.add_run(quote_text)
-                run.italic = True
-
-                i = end_pos + 1
-                continue
-
-        # Caractere normal
-        current_text += text[i]
-        i += 1
-
-    # Adicionar texto restante
-    if current_text:
-        run = paragraph.add_run(current_text)
-        if base_italic:
+    add_docx_runs(paragraph, tokenize_inline(text), base_italic)
+
+def add_docx_runs(paragraph, trechos, base_italic: bool = False) -> list:
+    """Adiciona ao parágrafo DOCX um run por trecho da árvore de markdown e devolve os runs."""
+    runs = []
+    for texto, estilo in trechos:
+        run = paragraph.add_run(texto)
+        if estilo == "bold":
+            run.bold = True
+        if base_italic or estilo in ("italic", "quote"):
             run.italic = True
+        runs.append(run)
+    return runs
 
 def process_markdown_inline_html(text: str) -> str:
     """
     Processa formatação markdown inline para HTML
     """
-    import re
-
-    # Escapar HTML
-    text = text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
-
-    # Negrito **texto** -> <strong>texto</strong>
-    text = re.sub(r'\*\*(.*?)\*\*', r'<strong>\1</strong>', text)
-
-    # Itálico *texto* -> <em>texto</em>
-    text = re.sub(r'(?<!\*)\*([^*\s][^*]*?[^*\s])\*(?!\*)', r'<em>\1</em>', text)
-
-    # Citações "texto"
-    text = re.sub(r'"([^"]+)"', r'<em>"\1"</em>', text)
-
-    return text
+    return to_html(tokenize_inline(text))
 
+@traced("docx_to_pdf")
 def docx_to_pdf(docx_path: str, pdf_path: str) -> bool:
     """
     Converte DOCX para PDF usando LibreOffice ou outras opções
@@ -1737,6 +1079,87 @@ def docx_to_pdf(docx_path: str, pdf_path: str) -> bool:
         logger.exception(f"Erro na conversão DOCX→PDF: {e}")
         return f"ERRO: {str(e)}"
 
+EXPORT_FORMATS = ("docx", "pdf", "txt", "rtf")
+
+def docx_pdf_converter_available() -> bool:
+    """LibreOffice no PATH ou docx2pdf instalado (os conversores usados por docx_to_pdf)."""
+    import shutil
+    import importlib.util
+    return shutil.which("soffice") is not None or importlib.util.find_spec("docx2pdf") is not None
+
+@traced("export_all")
+def export_all(content: str, paths: Dict[str, str], numero_processo: str = "",
+               progress_callback: Optional[Callable[[str, Any], None]] = None) -> Dict[str, Any]:
+    """
+    Grava o relatório nos formatos de `paths` ({"docx": caminho, "pdf": ..., "txt": ..., "rtf": ...})
+    em paralelo, em um pool de threads. O DOCX é gerado uma única vez e reaproveitado
+    na conversão para PDF (LibreOffice/docx2pdf); sem conversor disponível, o PDF sai
+    direto pelo reportlab, sem esperar o DOCX. progress_callback(formato, resultado) é chamado na thread
+    de trabalho a cada formato concluído.
+    Devolve {formato: True | mensagem de erro}.
+    """
+    formatos = [f for f in EXPORT_FORMATS if f in paths]
+    # Árvore do markdown pronta antes de dividir o trabalho: todos os formatos usam o mesmo cache
+    parse_markdown(content)
+    docx_path = paths.get("docx") or os.path.splitext(paths.get("pdf", ""))[0] + "_temp.docx"
+    pdf_via_docx = "pdf" in paths and docx_pdf_converter_available()
+
+    def write_docx():
+        return markdown_to_docx(content, docx_path, numero_processo)
+
+    def write_pdf():
+        if not pdf_via_docx:
+            return markdown_to_pdf(content, paths["pdf"], numero_processo)
+        try:
+            if docx_future.result() is True:
+                result = docx_to_pdf(docx_path, paths["pdf"])
+                if result is True:
+                    return True
+                logger.warning("Conversão DOCX→PDF indisponível (%s); gerando o PDF com reportlab",
+                               str(result).splitlines()[0])
+            return markdown_to_pdf(content, paths["pdf"], numero_processo)
+        finally:
+            # DOCX temporário (só o PDF foi pedido)
+            if "docx" not in paths and os.path.exists(docx_path):
+                os.remove(docx_path)
+
+    def write_txt():
+        with open(paths["txt"], "w", encoding="utf-8") as f:
+            f.write(content)
+        return True
+
+    def write_rtf():
+        rtf = apply_simple_template(content)
+        with open(paths["rtf"], "w", encoding="utf-8") as f:
+            f.write(rtf)
+        return True
+
+    def run(formato: str, fn: Callable[[], Any]):
+        with span(f"salvar_{formato}"):
+            return fn()
+
+    tarefas = {"docx": write_docx, "pdf": write_pdf, "txt": write_txt, "rtf": write_rtf}
+    resultados: Dict[str, Any] = {}
+    with ThreadPoolExecutor(max_workers=len(formatos) + 1, thread_name_prefix="exportar") as pool:
+        docx_future = None
+        if "docx" in paths or pdf_via_docx:
+            docx_future = pool.submit(contextvars.copy_context().run, run, "docx", write_docx)
+        futures = {pool.submit(contextvars.copy_context().run, run, f, tarefas[f]): f
+                   for f in formatos if f != "docx"}
+        if "docx" in paths:
+            futures[docx_future] = "docx"
+        for future in as_completed(futures):
+            formato = futures[future]
+            try:
+                resultado = future.result()
+            except Exception as e:
+                logger.exception("Falha ao gerar %s", formato.upper())
+                resultado = f"ERRO: {e}"
+            resultados[formato] = resultado
+            if progress_callback:
+                progress_callback(formato, resultado)
+    return resultados
+
 def extract_text_from_rtf(rtf_content: str) -> str:
     """
     Extrai texto de um arquivo RTF de forma mais inteligente
@@ -1776,6 +1199,8 @@ class App(tk.Tk):
 
         self.var_num   = tk.StringVar()
         self.var_debug = tk.BooleanVar(value=False)
+        self.var_force = tk.BooleanVar(value=False)  # Ignorar caches locais (forçar nova geração)
+        self.var_export_rtf = tk.BooleanVar(value=False)  # Incluir RTF em "Salvar tudo"
 
         self._dados_brutos_cache: Dict[str, Any] = {}
         self._markdown_original: str = ""  # Armazenar markdown original para exportação
@@ -1783,8 +1208,31 @@ class App(tk.Tk):
         self._processo_atual: str = ""  # Número do processo atual
         self._relatorio_gerado_com_sucesso: bool = False  # Controla se relatório foi gerado com sucesso
 
+        # Estado do streaming do relatório (ver _on_run/_flush_stream)
+        self._stream_renderer = None
+        self._stream_lock = threading.Lock()
+        self._stream_chunks: list = []
+        self._stream_flush_pending: bool = False
+
+        # Atualizações da interface vindas de outras threads (ver UIUpdateQueue)
+        self._ui = UIUpdateQueue(self, self._append_log_lines)
+
+        # Trace do último relatório exibido; as exportações (Salvar) são anexadas a ele
+        self._last_trace: Optional[Trace] = None
+
+        # Geração em andamento (ver _on_run/_on_cancel); resultados de jobs substituídos são descartados
+        self._active_job: Optional[GenerationJob] = None
+        self._job_seq = 0
+
+        # Event loop compartilhado (criado no primeiro uso) quando aiohttp está disponível
+        self._async_loop = None
+        self._async_pipe = None
+
         self._build_ui()
         self._wire_logging()
+        self._ui.start()
+        # Imports pesados depois que a janela aparece (ver PRELOAD_MODULES)
+        self.after(PRELOAD_DELAY_MS, self._preload_modules)
 
         # Configurar handler para fechamento da janela
         self.protocol("WM_DELETE_WINDOW", self._on_closing)
@@ -1792,6 +1240,23 @@ class App(tk.Tk):
         # Verificar chave API na inicialização (após um delay para UI carregar)
         self.after(500, self._check_api_key_on_startup)
 
+    def _preload_modules(self):
+        """Importa em segundo plano os módulos adiados, com o tempo de cada um no log (DEBUG)."""
+        def go():
+            for nome in PRELOAD_MODULES:
+                inicio = time.perf_counter()
+                try:
+                    importlib.import_module(nome)
+                except Exception as e:
+                    # O erro reaparece (e é tratado) no primeiro uso do módulo
+                    logger.debug(f"Pré-carregamento de {nome} falhou: {e}")
+                    continue
+                logger.debug(f"Módulo {nome} carregado em {(time.perf_counter() - inicio) * 1000:.0f} ms")
+            # Envia o feedback que ficou pendente de sessões anteriores
+            from scripts.feedback import get_sender
+            get_sender().start()
+        threading.Thread(target=go, name="preload", daemon=True).start()
+
     # --- layout ---
     def _build_ui(self):
         top = ttk.Frame(self); top.pack(fill=tk.X, padx=10, pady=8)
@@ -1816,13 +1281,23 @@ class App(tk.Tk):
 
         ttk.Checkbutton(top, text="Modo detalhado (DEBUG)", variable=self.var_debug,
                         command=self._toggle_debug).grid(row=0, column=2, sticky="w", padx=10)
+        ttk.Checkbutton(top, text="Forçar nova geração (ignorar cache)",
+                        variable=self.var_force).grid(row=1, column=2, sticky="w", padx=10)
+        ttk.Checkbutton(top, text="Incluir RTF em \"Salvar tudo\"",
+                        variable=self.var_export_rtf).grid(row=2, column=2, sticky="w", padx=10)
 
         btns = ttk.Frame(self); btns.pack(fill=tk.X, padx=10, pady=6)
         ttk.Button(btns, text="Gerar Relatório", command=self._on_run).pack(side=tk.LEFT, padx=4)
+        self.btn_cancel = ttk.Button(btns, text="Cancelar", command=self._on_cancel, state="disabled")
+        self.btn_cancel.pack(side=tk.LEFT, padx=4)
+        self.btn_batch = ttk.Button(btns, text="Gerar em Lote...", command=self._on_run_batch)
+        self.btn_batch.pack(side=tk.LEFT, padx=4)
         self.btn_json = ttk.Button(btns, text="Ver JSON (dados brutos)", command=self._on_view_json, state="disabled")
         self.btn_json.pack(side=tk.LEFT, padx=4)
         self.btn_save = ttk.Button(btns, text="Salvar relatório...", command=self._on_save, state="disabled")
         self.btn_save.pack(side=tk.LEFT, padx=4)
+        self.btn_save_all = ttk.Button(btns, text="Salvar tudo (DOCX/PDF/TXT)...", command=self._on_save_all, state="disabled")
+        self.btn_save_all.pack(side=tk.LEFT, padx=4)
         self.btn_feedback = ttk.Button(btns, text="⚠️ Reportar Erro no Conteúdo do Relatório", command=self._on_report_error, state="disabled")
         self.btn_feedback.pack(side=tk.LEFT, padx=4)
 
@@ -1830,6 +1305,9 @@ class App(tk.Tk):
         right_btns = ttk.Frame(btns)
         right_btns.pack(side=tk.RIGHT)
 
+        self.btn_metrics = ttk.Button(right_btns, text="📊 Desempenho...", command=self._on_view_metrics)
+        self.btn_metrics.pack(side=tk.LEFT, padx=4)
+
         # Botão de configuração de chave
         if KEY_MANAGER_AVAILABLE:
             self.btn_config_key = ttk.Button(right_btns, text="⚙️ Configurar Chave", command=self._on_config_key)
@@ -1847,24 +1325,58 @@ class App(tk.Tk):
         self.txt_out = ScrolledText(left, wrap="word"); self.txt_out.pack(fill=tk.BOTH, expand=True)
 
         right = ttk.Frame(body); body.add(right, weight=2)
-        ttk.Label(right, text="Log:").pack(anchor="w")
+        log_bar = ttk.Frame(right); log_bar.pack(fill=tk.X)
+        ttk.Label(log_bar, text="Log:").pack(side=tk.LEFT)
+        ttk.Button(log_bar, text="Limpar", command=self._on_clear_log).pack(side=tk.RIGHT, padx=(4, 0))
+        self.var_log_filter = tk.StringVar(value="")
+        self.var_log_filter.trace_add("write", lambda *_: self._schedule_log_filter())
+        ttk.Entry(log_bar, textvariable=self.var_log_filter, width=18).pack(side=tk.RIGHT, padx=(4, 0))
+        ttk.Label(log_bar, text="Filtro:").pack(side=tk.RIGHT, padx=(8, 0))
+        self.var_log_level = tk.StringVar(value="DEBUG")
+        cmb_level = ttk.Combobox(log_bar, textvariable=self.var_log_level, width=9, state="readonly",
+                                 values=("DEBUG", "INFO", "WARNING", "ERROR"))
+        cmb_level.pack(side=tk.RIGHT)
+        cmb_level.bind("<<ComboboxSelected>>", lambda _e: self._apply_log_filter())
         self.txt_log = ScrolledText(right, wrap="word"); self.txt_log.pack(fill=tk.BOTH, expand=True)
+        self._log_pane = LogPane(self.txt_log, config.LOG_BUFFER_LINES, config.LOG_PANE_LINES)
+        self._log_filter_after = None
 
         self.status = ttk.Label(self, text="Pronto.", anchor="w")
         self.status.pack(fill=tk.X, padx=10, pady=(0,8))
 
     def _wire_logging(self):
-        ui_handler = UILogHandler(self._append_log)
+        # O handler só enfileira: os registros podem vir de qualquer thread
+        ui_handler = UILogHandler(self._ui.log)
         logger.addHandler(ui_handler)
+        # Histórico completo em arquivo (JSON lines, gravado em thread própria); o painel guarda só as últimas linhas
+        if config.LOG_DIR:
+            start_file_logging(logger, config.LOG_DIR, int(config.LOG_FILE_MAX_MB * 1024 * 1024),
+                               config.LOG_FILE_BACKUPS)
 
     # --- helpers UI ---
-    def _append_log(self, msg: str):
+    def _append_log_lines(self, lines: List[Tuple[int, str]]):
+        self._log_pane.append(lines)
+
+    def _append_log(self, msg: str, level: int = logging.INFO):
         try:
-            self.txt_log.insert("end", msg + "\n")
-            self.txt_log.see("end")
+            self._append_log_lines([(level, msg)])
         except tk.TclError:
             pass
 
+    def _schedule_log_filter(self):
+        # Espera a digitação parar antes de redesenhar o painel a partir do buffer
+        if self._log_filter_after is not None:
+            self.after_cancel(self._log_filter_after)
+        self._log_filter_after = self.after(250, self._apply_log_filter)
+
+    def _apply_log_filter(self):
+        self._log_filter_after = None
+        level = logging.getLevelName(self.var_log_level.get())
+        self._log_pane.set_filter(level if isinstance(level, int) else logging.NOTSET, self.var_log_filter.get())
+
+    def _on_clear_log(self):
+        self._log_pane.clear()
+
     def _toggle_debug(self):
         logger.setLevel(logging.DEBUG if self.var_debug.get() else logging.INFO)
         self._append_log(f"[INFO] Nível de log ajustado para {'DEBUG' if self.var_debug.get() else 'INFO'}")
@@ -2009,7 +1521,7 @@ class App(tk.Tk):
                 messagebox.showwarning("Erro", "Por favor, descreva o erro com mais detalhes.")
                 return
 
-            # Enviar feedback negativo
+            # Registrar feedback negativo (enviado em segundo plano)
             success = self.send_feedback_to_google_forms(
                 tipo="ERRO",
                 descricao=error_description,
@@ -2021,9 +1533,10 @@ class App(tk.Tk):
                 self._feedback_enviado = True
                 self.btn_feedback.configure(state="disabled")
                 feedback_window.destroy()
-                messagebox.showinfo("Obrigado", "Erro reportado com sucesso! Obrigado pelo feedback.")
+                messagebox.showinfo("Obrigado", "Erro reportado com sucesso! Obrigado pelo feedback.\n\n"
+                                    "Sem conexão, o envio é repetido automaticamente (inclusive na próxima abertura).")
             else:
-                messagebox.showerror("Erro", "Falha ao enviar feedback. Tente novamente.")
+                messagebox.showerror("Erro", "Falha ao registrar o feedback. Tente novamente.")
 
         def cancel_report():
             feedback_window.destroy()
@@ -2046,7 +1559,7 @@ class App(tk.Tk):
                 processo=self._processo_atual,
                 modelo=DEFAULT_MODEL
             )
-            logger.info(f"Feedback positivo automático enviado para processo {self._processo_atual}")
+            logger.info(f"Feedback positivo automático registrado para processo {self._processo_atual}")
 
             # Reset do estado apenas após enviar o feedback
             self._relatorio_gerado_com_sucesso = False
@@ -2056,48 +1569,21 @@ class App(tk.Tk):
         # Desabilitar todos os botões até o novo relatório ser gerado
         self.btn_json.configure(state="disabled")
         self.btn_save.configure(state="disabled")
+        self.btn_save_all.configure(state="disabled")
         self.btn_feedback.configure(state="disabled")
 
     def send_feedback_to_google_forms(self, tipo: str, descricao: str, processo: str, modelo: str) -> bool:
-        """Envia feedback para Google Forms - VERSÃO FUNCIONAL TESTADA"""
-        import requests
-        from datetime import datetime
-
-        url = "https://docs.google.com/forms/d/e/1FAIpQLSdnbKWxgHAzaQC-RhnsSG7ojfIXz25UkaWv0xKRhMwkT0qz7A/formResponse"
-
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
-            'Content-Type': 'application/x-www-form-urlencoded',
-            'Origin': 'https://docs.google.com',
-            'Referer': 'https://docs.google.com/forms/d/e/1FAIpQLSdnbKWxgHAzaQC-RhnsSG7ojfIXz25UkaWv0xKRhMwkT0qz7A/viewform'
-        }
-
-        # Qualquer uma dessas versões funciona (escolha uma):
-
-        # VERSÃO 1: Com sentinel (mais segura)
-        data = {
-            "entry.1930801017_sentinel": "",
-            "entry.1930801017": tipo,
-            "entry.811378283": descricao,
-            "entry.77871712": processo,
-            "entry.72495185": modelo,
-            "entry.864187237": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-
-        # OU VERSÃO 2: Sem sentinel (mais simples)
-        # data = {
-        #     "entry.1930801017": tipo,
-        #     "entry.811378283": descricao,
-        #     "entry.77871712": processo,
-        #     "entry.72495185": modelo,
-        #     "entry.864187237": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        # }
-
+        """
+        Registra o feedback na caixa de saída local e volta na hora; o envio ao Google
+        Forms é feito pela thread de scripts/feedback.py, com novas tentativas e entrega
+        na próxima abertura se estiver sem conexão. False só se não foi possível gravar.
+        """
+        from scripts.feedback import get_sender
         try:
-            response = requests.post(url, data=data, headers=headers, timeout=30)
-            return response.status_code == 200
+            get_sender().enqueue(tipo, descricao, processo, modelo)
+            return True
         except Exception as e:
-            print(f"Erro ao enviar feedback: {e}")
+            logger.warning(f"Erro ao registrar feedback: {e}")
             return False
 
     # Use assim em qualquer lugar do seu código:
@@ -2112,16 +1598,14 @@ class App(tk.Tk):
         """Verifica se há atualizações disponíveis"""
         def check_in_thread():
             try:
-                self.btn_update.configure(text="🔄 Verificando...", state="disabled")
                 check_and_update(parent_window=self, silent=False)
             except Exception as e:
                 logger.error(f"Erro ao verificar atualizações: {e}")
-                messagebox.showerror("Erro", f"Erro ao verificar atualizações:\n{e}", parent=self)
+                self._ui.call(lambda: messagebox.showerror("Erro", f"Erro ao verificar atualizações:\n{e}", parent=self))
             finally:
-                try:
-                    self.btn_update.configure(text="🔄 Verificar Atualizações", state="normal")
-                except:
-                    pass
+                self._ui.call(self.btn_update.configure, {"text": "🔄 Verificar Atualizações", "state": "normal"})
+
+        self.btn_update.configure(text="🔄 Verificando...", state="disabled")
 
         threading.Thread(target=check_in_thread, daemon=True).start()
 
@@ -2186,7 +1670,7 @@ class App(tk.Tk):
 
     def _on_closing(self):
         """Handler para fechamento da janela - envia feedback automático se necessário"""
-        # Enviar feedback positivo automático se havia um relatório sem feedback
+        # Registrar feedback positivo automático se havia um relatório sem feedback (envio em segundo plano)
         if self._relatorio_gerado_com_sucesso and not self._feedback_enviado:
             self.send_feedback_to_google_forms(
                 tipo="SUCESSO_AUTO",
@@ -2194,9 +1678,25 @@ class App(tk.Tk):
                 processo=self._processo_atual,
                 modelo=DEFAULT_MODEL
             )
-            logger.info(f"Feedback positivo automático enviado ao fechar sistema para processo {self._processo_atual}")
+            logger.info(f"Feedback positivo automático registrado ao fechar sistema para processo {self._processo_atual}")
 
         # Fechar a aplicação
+        if self._async_loop is not None:
+            try:
+                self._async_loop.submit(self._async_pipe.close()).result(timeout=2)
+            except Exception:
+                logger.debug("Falha ao fechar o pipeline assíncrono", exc_info=True)
+            self._async_loop.stop()
+        # Sem relatório nesta sessão, a pilha HTTP nem chegou a ser importada
+        http_client = sys.modules.get("scripts.http_client")
+        if http_client is not None:
+            http_client.close_all()
+        self._ui.stop()
+        # O feedback ainda não enviado fica na caixa de saída para a próxima abertura
+        feedback = sys.modules.get("scripts.feedback")
+        if feedback is not None:
+            feedback.get_sender().stop()
+        stop_file_logging()
         self.destroy()
 
     def _write_report(self, text: str):
@@ -2209,6 +1709,7 @@ class App(tk.Tk):
         # Habilitar botões agora que temos conteúdo
         self.btn_json.configure(state="normal")
         self.btn_save.configure(state="normal")
+        self.btn_save_all.configure(state="normal")
 
         # Habilitar feedback apenas para gerações bem-sucedidas
         if is_success:
@@ -2255,19 +1756,189 @@ class App(tk.Tk):
         if not numero:
             messagebox.showinfo("Atenção", "Informe um número de processo CNJ.")
             return
+        # Um novo clique substitui a geração em andamento (evita corrida em txt_out/_dados_brutos_cache)
+        if self._active_job is not None:
+            logger.info("Geração anterior (%s) substituída por nova solicitação.", self._active_job.numero)
+            self._active_job.cancel()
+
+        self._job_seq += 1
+        job = GenerationJob(self._job_seq, numero)
+        self._active_job = job
+        self.btn_cancel.configure(state="normal")
         self._set_status("Gerando relatório...")
         self._write_report("")
+        use_cache = not self.var_force.get()
+
+        # Renderização incremental: os trechos chegam na thread de trabalho e são
+        # agrupados e aplicados ao widget pela thread da interface (fila de atualizações, um quadro por vez)
+        renderer = StreamingMarkdownRenderer(self.txt_out)
+        self._stream_renderer = renderer
+        with self._stream_lock:
+            self._stream_chunks = []
+            self._stream_flush_pending = False
+
+        def on_delta(chunk: str):
+            # No pipeline com threads, interrompe o streaming assim que o job é cancelado
+            job.raise_if_cancelled()
+            with self._stream_lock:
+                self._stream_chunks.append(chunk)
+                if self._stream_flush_pending:
+                    return
+                self._stream_flush_pending = True
+            self._ui.call(self._flush_stream, renderer)
+
+        def done(fut):
+            if job.cancelled.is_set() or fut.cancelled():
+                self._ui.call(self._finish_cancelled, job)
+                return
+            try:
+                dados, rel = fut.result()
+                self._ui.call(self._finish_run, job, dados, rel, "Concluído.")
+            except JobCancelled:
+                self._ui.call(self._finish_cancelled, job)
+            except Exception as e:
+                logger.exception("Falha ao gerar relatório")
+                job.erro = e
+                self._ui.call(self._finish_run, job, None, f"[ERRO] {type(e).__name__}: {e}", "Erro — ver log.")
+
+        if ASYNC_AVAILABLE:
+            pipe = self._get_async_pipeline()
+
+            async def run():
+                with use_trace(job.trace), span("full_flow"):
+                    await pipe.open()
+                    return await pipe.full_flow(numero, DEFAULT_MODEL, diagnostic_mode=False, use_cache=use_cache,
+                                                on_delta=on_delta)
+            # Cancelar o Future cancela a task e aborta as requisições aiohttp em curso
+            job.future = self._async_loop.submit(run())
+            job.future.add_done_callback(done)
+            return
 
         def go():
+            from scripts.pipeline import full_flow
+            fut = Future()
             try:
-                dados, rel = full_flow(numero, DEFAULT_MODEL, diagnostic_mode=False)
-                self._dados_brutos_cache = dados
-                self._write_report(rel)
-                self._set_status("Concluído.")
+                with use_trace(job.trace), span("full_flow"):
+                    fut.set_result(full_flow(numero, DEFAULT_MODEL, diagnostic_mode=False, use_cache=use_cache,
+                                             on_delta=on_delta, checkpoint=job.raise_if_cancelled))
             except Exception as e:
-                logger.exception("Falha ao gerar relatório")
-                self._write_report(f"[ERRO] {type(e).__name__}: {e}")
-                self._set_status("Erro — ver log.")
+                fut.set_exception(e)
+            done(fut)
+        threading.Thread(target=go, daemon=True).start()
+
+    def _on_cancel(self):
+        """Cancela a geração em andamento; o resultado, se chegar depois, é descartado."""
+        job = self._active_job
+        if job is None:
+            return
+        job.cancel()
+        logger.info("Geração do processo %s cancelada pelo usuário.", job.numero)
+        if job.future is None:
+            # Pipeline com threads: a consulta/chamada em curso não é abortada; o job para na
+            # etapa seguinte e done() finaliza o cancelamento
+            self.btn_cancel.configure(state="disabled")
+            self._set_status("Cancelando... a chamada de rede em curso termina antes.")
+            return
+        self._finish_cancelled(job)
+
+    def _get_async_pipeline(self) -> "AsyncPipeline":
+        """Loop asyncio em thread própria + pipeline com sessão aiohttp reaproveitada entre relatórios."""
+        if self._async_loop is None:
+            from scripts.async_pipeline import AsyncPipeline, BackgroundLoop
+            self._async_loop = BackgroundLoop()
+            self._async_pipe = AsyncPipeline()
+        return self._async_pipe
+
+    def _flush_stream(self, renderer: "StreamingMarkdownRenderer"):
+        with self._stream_lock:
+            chunks, self._stream_chunks = self._stream_chunks, []
+            self._stream_flush_pending = False
+        # Trechos atrasados de uma geração já finalizada são descartados
+        if renderer is not self._stream_renderer or not chunks:
+            return
+        if renderer.text_widget.compare("end-1c", "==", "1.0"):
+            self._set_status("Recebendo relatório...")
+        renderer.feed("".join(chunks))
+
+    def _finish_cancelled(self, job: "GenerationJob"):
+        if job is not self._active_job:
+            return
+        self._active_job = None
+        self._stream_renderer = None
+        self.btn_cancel.configure(state="disabled")
+        self._set_status("Geração cancelada.")
+
+    def _finish_run(self, job: "GenerationJob", dados, rel: str, status: str):
+        """Finaliza a geração na thread da interface: texto final substitui o parcial do streaming."""
+        # Resultado de um job cancelado ou substituído por outro clique: descartado
+        if job is not self._active_job:
+            logger.debug("Resultado descartado do job %d (%s).", job.id, job.numero)
+            return
+        self._active_job = None
+        self.btn_cancel.configure(state="disabled")
+        self._stream_renderer = None
+        self._last_trace = job.trace
+        if dados is not None:
+            self._dados_brutos_cache = dados
+        with use_trace(job.trace):
+            self._write_report(rel)
+        self._set_status(status)
+        logger.info(job.trace.summary())
+        self._export_trace(job.trace)
+        from scripts.metrics import record_run
+        record_run(job.trace, "ui", DEFAULT_MODEL, ok=dados is not None, erro=job.erro)
+
+    def _export_trace(self, trace: Trace):
+        """Grava o trace do relatório (formato Chrome Trace Event) se AJG_TRACE=1."""
+        if not config.TRACE_EXPORT:
+            return
+        try:
+            logger.info("Trace gravado em %s", export_trace(trace, config.TRACE_DIR))
+        except OSError as e:
+            logger.warning("Falha ao gravar trace: %s", e)
+
+    def _on_run_batch(self):
+        """Gera relatórios para uma lista de CNJs (CSV/TXT), gravando cada um em disco ao concluir"""
+        list_path = filedialog.askopenfilename(
+            title="Lista de processos (CNJ)",
+            filetypes=[("Lista CSV/TXT", "*.csv *.txt"), ("Todos os arquivos", "*.*")]
+        )
+        if not list_path:
+            return
+
+        from scripts.batch import BatchRunner, read_cnj_list
+        try:
+            numeros = read_cnj_list(list_path)
+        except Exception as e:
+            messagebox.showerror("Erro", f"Falha ao ler a lista:\n{e}")
+            return
+        if not numeros:
+            messagebox.showinfo("Lote", "Nenhum número CNJ válido encontrado no arquivo.")
+            return
+
+        output_dir = filedialog.askdirectory(title="Pasta de destino dos relatórios")
+        if not output_dir:
+            return
+
+        self.btn_batch.configure(state="disabled")
+        self._set_status(f"Lote: 0/{len(numeros)} concluídos...")
+
+        def on_progress(p):
+            msg = f"Lote: {p['concluidos']}/{p['total']} concluídos ({p['erros']} com erro)..."
+            self._ui.call(self._set_status, msg)
+
+        def go():
+            try:
+                resultados = BatchRunner(output_dir, model=DEFAULT_MODEL, progress_callback=on_progress,
+                                         use_cache=not self.var_force.get(),
+                                         use_async=ASYNC_AVAILABLE).run(numeros)
+                ok = sum(1 for r in resultados if r["status"] == "OK")
+                self._ui.call(self._set_status, f"Lote concluído: {ok}/{len(resultados)} relatórios gerados.")
+            except Exception as e:
+                logger.exception("Falha no processamento em lote")
+                self._ui.call(self._set_status, f"Erro no lote — ver log. ({type(e).__name__})")
+            finally:
+                self._ui.call(self.btn_batch.configure, {"state": "normal"})
         threading.Thread(target=go, daemon=True).start()
 
     def _on_view_json(self):
@@ -2279,17 +1950,50 @@ class App(tk.Tk):
         box = ScrolledText(win, wrap="word"); box.pack(fill=tk.BOTH, expand=True)
         box.insert("end", txt); box.configure(state="disabled")
 
-    def _on_save(self):
+    def _on_view_metrics(self):
+        """Janela com percentis e tendência do histórico local de desempenho (scripts/metrics.py)."""
+        from scripts.metrics import get_store as get_metrics_store, format_summary, export_csv
+        win = tk.Toplevel(self); win.title("Desempenho da geração de relatórios"); win.geometry("900x600")
+        top = ttk.Frame(win); top.pack(fill=tk.X, padx=10, pady=6)
+        janelas = {"7 dias": 7, "30 dias": 30, "90 dias": 90, "Tudo": 0}
+        var_janela = tk.StringVar(value="30 dias")
+        var_por = tk.StringVar(value="semana")
+        ttk.Label(top, text="Período:").pack(side=tk.LEFT)
+        ttk.Combobox(top, textvariable=var_janela, values=list(janelas), state="readonly", width=10).pack(side=tk.LEFT, padx=4)
+        ttk.Label(top, text="Tendência por:").pack(side=tk.LEFT, padx=(12, 0))
+        ttk.Combobox(top, textvariable=var_por, values=["dia", "semana"], state="readonly", width=8).pack(side=tk.LEFT, padx=4)
+        box = ScrolledText(win, wrap="none", font=("Consolas", 10)); box.pack(fill=tk.BOTH, expand=True, padx=10, pady=(0, 10))
+        linhas: list = []
+
+        def atualizar(event=None):
+            dias = janelas[var_janela.get()]
+            linhas[:] = get_metrics_store().rows(desde=time.time() - dias * 86400 if dias else None)
+            box.configure(state="normal"); box.delete("1.0", "end")
+            box.insert("end", format_summary(linhas, por=var_por.get()))
+            box.configure(state="disabled")
+
+        def exportar():
+            path = filedialog.asksaveasfilename(title="Exportar métricas", defaultextension=".csv",
+                                                initialfile="metricas_ajg.csv", filetypes=[("CSV", "*.csv")])
+            if path:
+                export_csv(linhas, path)
+                self._set_status(f"{len(linhas)} execuções exportadas para {path}")
+
+        ttk.Button(top, text="Atualizar", command=atualizar).pack(side=tk.LEFT, padx=(12, 4))
+        ttk.Button(top, text="Exportar CSV...", command=exportar).pack(side=tk.LEFT, padx=4)
+        for child in top.winfo_children():
+            if isinstance(child, ttk.Combobox):
+                child.bind("<<ComboboxSelected>>", atualizar)
+        atualizar()
+
+    def _report_to_save(self) -> Tuple[str, str, str]:
+        """(markdown, número do processo, nome de arquivo padrão) do relatório exibido."""
         # Usar o markdown original para manter formatação, ou texto da interface como fallback
         if self._markdown_original.strip():
             content = self._markdown_original.strip()
         else:
             content = self.txt_out.get("1.0", "end").strip()
 
-        if not content:
-            messagebox.showinfo("Salvar", "Nada para salvar.")
-            return
-
         # Gerar nome padrão do arquivo
         numero_processo = self.var_num.get().strip()
         if numero_processo:
@@ -2298,6 +2002,13 @@ class App(tk.Tk):
             default_filename = f"relatório_AJG_{numero_limpo}"
         else:
             default_filename = "relatório_AJG"
+        return content, numero_processo, default_filename
+
+    def _on_save(self):
+        content, numero_processo, default_filename = self._report_to_save()
+        if not content:
+            messagebox.showinfo("Salvar", "Nada para salvar.")
+            return
 
         path = filedialog.asksaveasfilename(
             defaultextension=".docx",
@@ -2309,61 +2020,85 @@ class App(tk.Tk):
             ],
             title="Salvar relatório"
         )
+        if not path:
+            return
 
-        if path:
-            try:
-                if path.lower().endswith('.docx'):
-                    # Gerar DOCX diretamente do markdown
-                    if self.var_debug.get():
-                        logger.debug(f"Salvando DOCX com {len(content)} chars")
-
-                    result = markdown_to_docx(content, path, numero_processo)
-                    if result == True:
-                        messagebox.showinfo("OK", f"Relatório DOCX salvo em:\n{path}")
-                    else:
-                        messagebox.showerror("Erro", f"Falha ao gerar DOCX:\n{result}")
-
-                elif path.lower().endswith('.pdf'):
-                    # Gerar PDF via DOCX (método mais confiável)
-                    if self.var_debug.get():
-                        logger.debug(f"Salvando PDF via DOCX com {len(content)} chars")
-
-                    # Gerar DOCX temporário
-                    temp_docx_path = path.replace('.pdf', '_temp.docx')
-
-                    try:
-                        # Primeiro gerar DOCX
-                        result = markdown_to_docx(content, temp_docx_path, numero_processo)
-                        if result != True:
-                            raise Exception(f"Falha ao gerar DOCX temporário: {result}")
-
-                        # Converter DOCX para PDF
-                        result_pdf = docx_to_pdf(temp_docx_path, path)
-
-                        # Limpar arquivo temporário
-                        if os.path.exists(temp_docx_path):
-                            os.remove(temp_docx_path)
-
-                        if result_pdf == True:
-                            messagebox.showinfo("OK", f"Relatório PDF salvo em:\n{path}")
-                        else:
-                            messagebox.showerror("Erro", f"Falha ao gerar PDF:\n{result_pdf}")
-
-                    except Exception as e:
-                        # Limpar arquivo temporário em caso de erro
-                        if os.path.exists(temp_docx_path):
-                            os.remove(temp_docx_path)
-                        messagebox.showerror("Erro", f"Falha ao gerar PDF via DOCX:\n{str(e)}")
+        # Outras extensões são salvas como texto simples
+        formato = os.path.splitext(path)[1].lower().lstrip(".")
+        if formato not in ("docx", "pdf"):
+            formato = "txt"
+        if self.var_debug.get():
+            logger.debug(f"Salvando {formato.upper()} com {len(content)} chars")
+        self._start_export(content, {formato: path}, numero_processo)
 
-                else:
-                    # Salvar como texto simples
-                    with open(path, "w", encoding="utf-8") as f:
-                        f.write(content)
-                    messagebox.showinfo("OK", f"Relatório TXT salvo em:\n{path}")
+    def _on_save_all(self):
+        """Grava DOCX, PDF e TXT (e RTF, se marcado) de uma vez na pasta escolhida."""
+        content, numero_processo, default_filename = self._report_to_save()
+        if not content:
+            messagebox.showinfo("Salvar", "Nada para salvar.")
+            return
+
+        pasta = filedialog.askdirectory(title="Pasta para salvar o relatório (DOCX, PDF e TXT)")
+        if not pasta:
+            return
+
+        formatos = ["docx", "pdf", "txt"] + (["rtf"] if self.var_export_rtf.get() else [])
+        paths = {f: os.path.join(pasta, f"{default_filename}.{f}") for f in formatos}
+        existentes = [p for p in paths.values() if os.path.exists(p)]
+        if existentes and not messagebox.askyesno(
+                "Salvar tudo", "Substituir os arquivos existentes?\n\n" + "\n".join(existentes)):
+            return
+        self._start_export(content, paths, numero_processo)
+
+    def _start_export(self, content: str, paths: Dict[str, str], numero_processo: str):
+        """Exporta em uma thread de trabalho (export_all), mantendo a janela responsiva."""
+        trace = self._last_trace
+        antes = len(trace.spans) if trace is not None else 0
+        total = len(paths)
+        concluidos: List[str] = []
+        self.btn_save.configure(state="disabled")
+        self.btn_save_all.configure(state="disabled")
+        self._set_status(f"Salvando: 0/{total} formato(s)...")
 
+        def on_progress(formato, resultado):
+            concluidos.append(formato)
+            situacao = "ok" if resultado is True else "com erro"
+            self._ui.call(self._set_status, f"Salvando: {len(concluidos)}/{total} formato(s) ({formato.upper()} {situacao})...")
+
+        def go():
+            try:
+                with use_trace(trace):
+                    resultados = export_all(content, paths, numero_processo, progress_callback=on_progress)
             except Exception as e:
-                messagebox.showerror("Erro", f"Falha ao salvar arquivo:\n{str(e)}")
                 logger.exception("Erro ao salvar relatório")
+                resultados = {f: f"ERRO: {e}" for f in paths}
+            self._ui.call(self._finish_export, paths, resultados, trace, antes)
+
+        threading.Thread(target=go, daemon=True, name="exportar").start()
+
+    def _finish_export(self, paths: Dict[str, str], resultados: Dict[str, Any], trace: Optional[Trace], antes: int):
+        # Uma nova geração em andamento mantém os botões desabilitados até o novo relatório
+        if self._active_job is None:
+            self.btn_save.configure(state="normal")
+            self.btn_save_all.configure(state="normal")
+
+        salvos = [paths[f] for f in EXPORT_FORMATS if resultados.get(f) is True]
+        erros = [f"{f.upper()}: {resultados[f]}" for f in EXPORT_FORMATS if f in resultados and resultados[f] is not True]
+        self._set_status(f"Relatório salvo: {len(salvos)}/{len(paths)} arquivo(s).")
+
+        if trace is not None:
+            novos = trace.spans[antes:]
+            raizes = {sp["id"] for sp in novos if sp["parent"] is None}
+            etapas = [sp for sp in novos if sp["parent"] is None or sp["parent"] in raizes]
+            if etapas:
+                logger.info("Tempos de exportação: " + " · ".join(f"{sp['name']} {sp['dur']:.2f}s" for sp in etapas))
+                self._export_trace(trace)
+
+        if erros:
+            messagebox.showerror("Erro", ("Salvo em:\n" + "\n".join(salvos) + "\n\n" if salvos else "")
+                                 + "Falha ao gerar:\n" + "\n".join(erros))
+        else:
+            messagebox.showinfo("OK", "Relatório salvo em:\n" + "\n".join(salvos))
 
 # =========================
 # Entry point
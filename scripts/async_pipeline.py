@@ -0,0 +1,293 @@
+# scripts/async_pipeline.py
+# -*- coding: utf-8 -*-
+"""
+Variante assíncrona (asyncio + aiohttp) do fluxo SOAP → parser → LLM.
+Um único event loop mantém dezenas de processos em andamento sem uma thread do
+sistema por requisição; o parser roda em um executor para não bloquear o loop.
+Cancelar a task (task.cancel() / Future.cancel()) aborta as requisições HTTP em curso.
+
+Reaproveita de scripts/pipeline.py o envelope SOAP, o prompt, os caches, o
+pré-filtro e o map-reduce; apenas o transporte HTTP é assíncrono.
+
+Uso:
+    async with AsyncPipeline() as pipe:
+        dados, rel = await pipe.full_flow("0801234-56.2023.8.12.0001", DEFAULT_MODEL)
+
+    loop = BackgroundLoop()               # para a interface Tkinter
+    fut = loop.submit(pipe_coro)          # concurrent.futures.Future (cancelável)
+"""
+
+import ssl
+import time
+import asyncio
+import logging
+import threading
+import contextvars
+from contextlib import asynccontextmanager
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import aiohttp
+
+import config
+from config import TJ_WSDL_URL, OPENROUTER_ENDPOINT, DEFAULT_MODEL, SOAP_CACHE_ENABLED, LLM_CACHE_ENABLED
+from scripts import pipeline
+from scripts.http_client import ssl_verify
+from scripts.tracing import span, annotate
+from scripts.recording import recording_enabled, record_soap, record_llm
+from scripts.pipeline import (
+    logger, validate_config, validate_cnj, format_cnj, build_soap_envelope, store_soap_response,
+    parse_xml_processo, plan_report, build_map_messages, build_reduce_messages, build_diagnostic_messages,
+    estimate_messages_tokens, openrouter_request, get_cached_response, response_text, llm_usage,
+    append_apenso_warning, _SSEAccumulator, _periodo
+)
+
+# Mesma política do Retry síncrono: falhas de conexão em qualquer chamada; a consulta ao
+# TJ-MS (idempotente) repete também conexão derrubada e tempo esgotado sem resposta
+_RETRY_TOTAL = 4
+_RETRY_BACKOFF = 0.6
+_RETRY_CONNECT = (aiohttp.ClientConnectorError,)
+_RETRY_IDEMPOTENT = (aiohttp.ClientConnectorError, aiohttp.ServerDisconnectedError, asyncio.TimeoutError)
+
+
+class AsyncPipeline:
+    """
+    Cliente assíncrono do TJ-MS e do OpenRouter com uma sessão aiohttp compartilhada
+    (pool keep-alive) e limites de concorrência separados para cada serviço.
+    """
+
+    def __init__(self, soap_concurrency: int = 3, llm_concurrency: int = 6,
+                 pool_size: Optional[int] = None, parse_workers: int = 2):
+        self.soap_concurrency = max(1, soap_concurrency)
+        self.llm_concurrency = max(1, llm_concurrency)
+        self.pool_size = pool_size or config.HTTP_POOL_MAXSIZE
+        self._parse_executor = ThreadPoolExecutor(max_workers=max(1, parse_workers), thread_name_prefix="parse")
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._soap_gate: Optional[asyncio.Semaphore] = None
+        self._llm_gate: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncPipeline":
+        await self.open()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def open(self):
+        if self._session is not None:
+            return
+        verify = ssl_verify()
+        ssl_ctx = ssl.create_default_context(cafile=verify) if isinstance(verify, str) else True
+        connector = aiohttp.TCPConnector(limit=self.pool_size * 2, limit_per_host=self.pool_size,
+                                         ssl=ssl_ctx, keepalive_timeout=60)
+        self._session = aiohttp.ClientSession(connector=connector)
+        # Semáforos criados no loop que vai usá-los
+        self._soap_gate = asyncio.Semaphore(self.soap_concurrency)
+        self._llm_gate = asyncio.Semaphore(self.llm_concurrency)
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        self._parse_executor.shutdown(wait=False)
+
+    @asynccontextmanager
+    async def _gate(self, sem: asyncio.Semaphore, nome: str):
+        # A espera pelo semáforo aparece no trace como fila do serviço
+        with span(nome):
+            await sem.acquire()
+        try:
+            yield
+        finally:
+            sem.release()
+
+    async def _post(self, url: str, timeout: float, idempotent: bool = False, **kwargs) -> aiohttp.ClientResponse:
+        # Como o timeout do requests: limite por conexão e por leitura, sem teto para a resposta
+        # inteira (um relatório longo em streaming pode levar mais que `timeout` no total)
+        client_timeout = aiohttp.ClientTimeout(total=None, sock_connect=timeout, sock_read=timeout)
+        for tentativa in range(_RETRY_TOTAL + 1):
+            try:
+                resp = await self._session.post(url, timeout=client_timeout, **kwargs)
+                annotate(retentativas=tentativa)
+                return resp
+            except (_RETRY_IDEMPOTENT if idempotent else _RETRY_CONNECT) as e:
+                if tentativa == _RETRY_TOTAL:
+                    raise
+                espera = _RETRY_BACKOFF * (2 ** tentativa)
+                logger.warning("Falha de conexão com %s (%s); nova tentativa em %.1fs.", url, e, espera)
+                await asyncio.sleep(espera)
+
+    # ---------- TJ-MS ----------
+    async def soap_consultar_processo(self, numero_processo: str, timeout=90,
+                                      movimentos=True, incluir_docs=False, debug=False) -> str:
+        envelope = build_soap_envelope(numero_processo, movimentos, incluir_docs, debug)
+        async with self._gate(self._soap_gate, "fila.soap"):
+            with span("soap_consultar_processo"):
+                inicio = time.perf_counter()
+                resp = await self._post(TJ_WSDL_URL, timeout, idempotent=True, data=envelope.encode("utf-8"),
+                                        headers={"Content-Type": "text/xml; charset=utf-8"})
+                async with resp:
+                    resp.raise_for_status()
+                    xml_text = await resp.text()
+        if recording_enabled():
+            await asyncio.to_thread(record_soap, numero_processo, envelope, xml_text, time.perf_counter() - inicio)
+        return xml_text
+
+    async def consultar_processo(self, numero_processo: str, timeout=90, movimentos=True,
+                                 incluir_docs=False, debug=False, use_cache=True) -> str:
+        use_cache = use_cache and SOAP_CACHE_ENABLED
+        if use_cache:
+            with span("cache.soap") as sp:
+                xml_text = await asyncio.to_thread(pipeline._soap_cache.get, numero_processo, movimentos, incluir_docs)
+                if sp is not None:
+                    sp["hit"] = xml_text is not None
+            if xml_text is not None:
+                logger.info("XML obtido do cache local (%d chars).", len(xml_text))
+                return xml_text
+        xml_text = await self.soap_consultar_processo(numero_processo, timeout, movimentos, incluir_docs, debug)
+        await asyncio.to_thread(store_soap_response, numero_processo, xml_text, movimentos, incluir_docs)
+        return xml_text
+
+    async def parse(self, xml_text: str) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        # run_in_executor não propaga contextvars: leva o trace ativo explicitamente
+        return await loop.run_in_executor(self._parse_executor, contextvars.copy_context().run,
+                                          parse_xml_processo, xml_text)
+
+    # ---------- OpenRouter ----------
+    async def call_openrouter(self, messages: list, model: str = DEFAULT_MODEL, temperature=0.2, timeout=120,
+                              use_cache=True, on_delta: Optional[Callable[[str], None]] = None) -> str:
+        use_cache = use_cache and LLM_CACHE_ENABLED
+        if use_cache:
+            cached = await asyncio.to_thread(get_cached_response, model, temperature, messages)
+            if cached is not None:
+                return cached
+
+        headers, payload = openrouter_request(messages, model, temperature, stream=on_delta is not None)
+        async with self._gate(self._llm_gate, "fila.llm"):
+            with span("call_openrouter", modelo=model):
+                inicio = time.perf_counter()
+                resp = await self._post(OPENROUTER_ENDPOINT, timeout, json=payload, headers=headers)
+                async with resp:
+                    logger.debug("OpenRouter status=%s", resp.status)
+                    resp.raise_for_status()
+                    if on_delta is not None:
+                        acc = _SSEAccumulator(on_delta)
+                        async for raw in resp.content:
+                            if not acc.feed_line(raw.decode("utf-8").rstrip("\r\n")):
+                                break
+                        j = acc.result()
+                    else:
+                        j = await resp.json(content_type=None)
+                annotate(**llm_usage(j, messages))
+        if recording_enabled():
+            await asyncio.to_thread(record_llm, payload, j, time.perf_counter() - inicio)
+        return await asyncio.to_thread(response_text, j, model, temperature, messages)
+
+    async def generate_report(self, numero_cnj_fmt: str, dados: dict, model: str = DEFAULT_MODEL, use_cache=True,
+                              on_delta: Optional[Callable[[str], None]] = None,
+                              token_budget: Optional[int] = None, formato: Optional[str] = None) -> str:
+        """Equivalente assíncrono de pipeline.generate_report (map em paralelo no mesmo loop)."""
+        filtrado, messages, blocos = plan_report(numero_cnj_fmt, dados, token_budget, formato)
+        if not blocos:
+            return await self.call_openrouter(messages, model=model, use_cache=use_cache, on_delta=on_delta)
+
+        async def _map(indice: int, bloco: List[Dict[str, Any]]) -> Dict[str, str]:
+            msgs = build_map_messages(numero_cnj_fmt, filtrado, bloco, indice, len(blocos), formato)
+            resumo = await self.call_openrouter(msgs, model=model, use_cache=use_cache)
+            logger.info("Bloco %d/%d (%s) resumido: %d caracteres.", indice, len(blocos), _periodo(bloco), len(resumo))
+            return {"periodo": _periodo(bloco), "resumo": resumo}
+
+        resumos = await asyncio.gather(*(_map(i, b) for i, b in enumerate(blocos, start=1)))
+        reduce_msgs = build_reduce_messages(numero_cnj_fmt, filtrado, list(resumos), formato)
+        logger.info("Consolidando %d resumos (~%d tokens).", len(resumos), estimate_messages_tokens(reduce_msgs))
+        return await self.call_openrouter(reduce_msgs, model=model, use_cache=use_cache, on_delta=on_delta)
+
+    # ---------- Fluxo completo ----------
+    async def full_flow(self, numero_raw: str, model: str, diagnostic_mode=False,
+                        timings: Optional[Dict[str, float]] = None, use_cache=True,
+                        on_delta: Optional[Callable[[str], None]] = None) -> Tuple[Dict[str, Any], str]:
+        """Equivalente assíncrono de pipeline.full_flow: devolve (dados, relatório)."""
+        if timings is None:
+            timings = {}
+        with span("validate_config"):
+            ok_config, msg_config = validate_config()
+        if not ok_config:
+            raise RuntimeError(f"Falha na configuração: {msg_config}")
+
+        ok_cnj, d, msg_cnj = validate_cnj(numero_raw)
+        if not ok_cnj:
+            raise ValueError(f"CNJ inválido: {msg_cnj}")
+        cnj_fmt = format_cnj(d)
+
+        t0 = time.perf_counter()
+        xml_text = await self.consultar_processo(d, timeout=90, debug=(logger.level == logging.DEBUG),
+                                                 use_cache=use_cache)
+        timings["soap"] = time.perf_counter() - t0
+        logger.info("XML recebido (%d chars) para %s.", len(xml_text), cnj_fmt)
+
+        t0 = time.perf_counter()
+        dados = await self.parse(xml_text)
+        timings["parse"] = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        if diagnostic_mode:
+            rel = await self.call_openrouter(build_diagnostic_messages(dados), model=model,
+                                             use_cache=use_cache, on_delta=on_delta)
+        else:
+            rel = await self.generate_report(cnj_fmt, dados, model=model, use_cache=use_cache, on_delta=on_delta)
+        rel = append_apenso_warning(dados, rel)
+        timings["llm"] = time.perf_counter() - t0
+        logger.info("LLM respondeu com %d caracteres para %s.", len(rel), cnj_fmt)
+        return dados, rel
+
+    async def run_many(self, numeros: List[str], model: str,
+                       worker: Optional[Callable[[str], Awaitable[Any]]] = None,
+                       on_result: Optional[Callable[[str, Any, Optional[BaseException]], None]] = None,
+                       **kwargs) -> List[Tuple[str, Any, Optional[BaseException]]]:
+        """
+        Executa vários processos no mesmo loop (limitados pelos semáforos de cada serviço).
+        `worker(numero)` substitui full_flow se informado; on_result(numero, resultado, erro)
+        é chamado à medida que cada um termina. Cancelar a task cancela todos os pendentes.
+        """
+        worker = worker or (lambda numero: self.full_flow(numero, model, **kwargs))
+
+        async def _one(numero: str):
+            try:
+                resultado, erro = await worker(numero), None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("Falha ao gerar relatório de %s: %s", numero, e)
+                resultado, erro = None, e
+            if on_result:
+                on_result(numero, resultado, erro)
+            return numero, resultado, erro
+
+        return list(await asyncio.gather(*(_one(n) for n in numeros)))
+
+
+class BackgroundLoop:
+    """
+    Event loop em uma thread daemon, para quem não roda asyncio na thread principal
+    (interface Tkinter, lote). submit() devolve um concurrent.futures.Future:
+    future.cancel() cancela a task e aborta as requisições em andamento.
+    """
+
+    def __init__(self):
+        self.loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="asyncio-loop", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.call_soon(self._ready.set)
+        self.loop.run_forever()
+
+    def submit(self, coro: Awaitable[Any]) -> Future:
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
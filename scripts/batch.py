@@ -0,0 +1,261 @@
+# scripts/batch.py
+# -*- coding: utf-8 -*-
+"""
+Processamento em lote do RelatorioTJMS.
+Lê uma lista de números CNJ (CSV/TXT) e gera os relatórios em paralelo, com
+limites de concorrência separados para o webservice do TJ-MS e para o OpenRouter.
+Cada relatório é gravado em disco assim que fica pronto.
+"""
+
+import os
+import re
+import csv
+import time
+import asyncio
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Any, List, Optional
+
+from config import DEFAULT_MODEL
+
+from scripts.pipeline import (
+    logger, make_session, validate_config, validate_cnj, format_cnj,
+    consultar_processo, parse_xml_processo, generate_report, append_apenso_warning
+)
+from scripts.tracing import Trace, use_trace, span
+from scripts.metrics import record_run
+
+# Limites padrão: o TJ-MS é mais sensível a carga que o OpenRouter
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_SOAP_CONCURRENCY = 3
+DEFAULT_LLM_CONCURRENCY = 6
+
+# Aceita CNJ com ou sem pontuação (NNNNNNN-DD.AAAA.J.TR.OOOO)
+_CNJ_RE = re.compile(r"\d{7}-?\d{2}\.?\d{4}\.?\d\.?\d{2}\.?\d{4}")
+
+SUMMARY_FILENAME = "resumo_lote.csv"
+
+
+def extract_cnj_numbers(content: str) -> List[str]:
+    """
+    Extrai números CNJ (somente dígitos) de um texto livre.
+    Remove duplicatas preservando a ordem original.
+    """
+    numeros: List[str] = []
+    vistos = set()
+    for match in _CNJ_RE.findall(content):
+        ok, digits, _ = validate_cnj(match)
+        if ok and digits not in vistos:
+            vistos.add(digits)
+            numeros.append(digits)
+    return numeros
+
+
+def read_cnj_list(path: str) -> List[str]:
+    """Lê números CNJ de um arquivo CSV ou TXT (um ou mais por linha, em qualquer coluna)."""
+    with open(path, "r", encoding="utf-8-sig") as f:
+        return extract_cnj_numbers(f.read())
+
+
+def report_filename(cnj_digits: str) -> str:
+    """Nome padrão do arquivo de relatório de um processo (mesmo padrão do botão Salvar)."""
+    numero_limpo = re.sub(r'[^\w\-]', '_', format_cnj(cnj_digits))
+    return f"relatório_AJG_{numero_limpo}.md"
+
+
+class BatchRunner:
+    """
+    Executa o pipeline SOAP → parser → LLM para vários processos em um pool de threads.
+    As chamadas ao TJ-MS e ao OpenRouter são limitadas por semáforos independentes,
+    para que o pool possa ser maior que o número de consultas simultâneas a cada serviço.
+    Com use_async=True (requer aiohttp), todos os processos rodam em um único event loop
+    (scripts/async_pipeline.py), com os mesmos limites por serviço.
+    """
+
+    def __init__(self, output_dir: str, model: str = DEFAULT_MODEL,
+                 max_workers: int = DEFAULT_MAX_WORKERS,
+                 soap_concurrency: int = DEFAULT_SOAP_CONCURRENCY,
+                 llm_concurrency: int = DEFAULT_LLM_CONCURRENCY,
+                 progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 use_cache: bool = True, use_async: bool = False):
+        self.output_dir = output_dir
+        self.model = model
+        self.use_cache = use_cache
+        self.use_async = use_async
+        self.soap_concurrency = max(1, soap_concurrency)
+        self.llm_concurrency = max(1, llm_concurrency)
+        self.max_workers = max(1, max_workers)
+        self.progress_callback = progress_callback
+
+        self._soap_gate = threading.BoundedSemaphore(max(1, soap_concurrency))
+        self._llm_gate = threading.BoundedSemaphore(max(1, llm_concurrency))
+        self._summary_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def stop(self):
+        """Solicita interrupção: itens ainda não iniciados são marcados como cancelados."""
+        self._stop.set()
+
+    def _session(self):
+        # Sessão compartilhada do processo: o pool do urllib3 (AJG_HTTP_POOL_MAXSIZE)
+        # atende as threads do lote reaproveitando conexões já abertas
+        return make_session()
+
+    def _record_metrics(self, trace: Trace, item: Dict[str, Any], erro: Optional[BaseException]):
+        if item["status"] != "CANCELADO":
+            record_run(trace, "lote", self.model, ok=item["status"] == "OK", erro=erro)
+
+    def _process_one(self, numero: str) -> Dict[str, Any]:
+        inicio = time.perf_counter()
+        item: Dict[str, Any] = {"numero": numero, "status": "ERRO", "arquivo": "", "mensagem": ""}
+
+        if self._stop.is_set():
+            item["status"] = "CANCELADO"
+            return item
+
+        trace = Trace("relatorio", processo=numero)
+        erro: Optional[BaseException] = None
+        try:
+            with use_trace(trace), span("full_flow"):
+                self._run_item(item, numero)
+        except Exception as e:
+            logger.exception("Falha no lote para o processo %s", numero)
+            item["mensagem"] = f"{type(e).__name__}: {e}"
+            erro = e
+        finally:
+            item["segundos"] = round(time.perf_counter() - inicio, 2)
+        self._record_metrics(trace, item, erro)
+        return item
+
+    def _run_item(self, item: Dict[str, Any], numero: str):
+        ok_cnj, d, msg_cnj = validate_cnj(numero)
+        if not ok_cnj:
+            raise ValueError(f"CNJ inválido: {msg_cnj}")
+        item["numero"] = format_cnj(d)
+
+        with self._soap_gate:
+            xml_text = consultar_processo(self._session(), d, timeout=90, movimentos=True,
+                                          incluir_docs=False, use_cache=self.use_cache)
+
+        dados = parse_xml_processo(xml_text)
+
+        if self._stop.is_set():
+            item["status"] = "CANCELADO"
+            return
+
+        # Cada chamada ao OpenRouter (inclusive os blocos do map-reduce) ocupa uma vaga de _llm_gate
+        rel = generate_report(item["numero"], dados, model=self.model, use_cache=self.use_cache, gate=self._llm_gate)
+        self._save_report(item, d, dados, rel)
+
+    def _save_report(self, item: Dict[str, Any], cnj_digits: str, dados: Dict[str, Any], rel: str):
+        rel = append_apenso_warning(dados, rel)
+        path = os.path.join(self.output_dir, report_filename(cnj_digits))
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(rel)
+        item.update(status="OK", arquivo=path, decisoes=len(dados["decisoes"]))
+
+    async def _process_one_async(self, pipe, numero: str) -> Dict[str, Any]:
+        """Equivalente de _process_one no event loop (AsyncPipeline)."""
+        inicio = time.perf_counter()
+        item: Dict[str, Any] = {"numero": numero, "status": "ERRO", "arquivo": "", "mensagem": ""}
+
+        if self._stop.is_set():
+            item["status"] = "CANCELADO"
+            return item
+
+        trace = Trace("relatorio", processo=numero)
+        erro: Optional[BaseException] = None
+        try:
+            with use_trace(trace), span("full_flow"):
+                await self._run_item_async(pipe, item, numero)
+        except Exception as e:
+            logger.exception("Falha no lote para o processo %s", numero)
+            item["mensagem"] = f"{type(e).__name__}: {e}"
+            erro = e
+        finally:
+            item["segundos"] = round(time.perf_counter() - inicio, 2)
+        await asyncio.to_thread(self._record_metrics, trace, item, erro)
+        return item
+
+    async def _run_item_async(self, pipe, item: Dict[str, Any], numero: str):
+        ok_cnj, d, msg_cnj = validate_cnj(numero)
+        if not ok_cnj:
+            raise ValueError(f"CNJ inválido: {msg_cnj}")
+        item["numero"] = format_cnj(d)
+
+        xml_text = await pipe.consultar_processo(d, timeout=90, use_cache=self.use_cache)
+        dados = await pipe.parse(xml_text)
+
+        if self._stop.is_set():
+            item["status"] = "CANCELADO"
+            return
+
+        rel = await pipe.generate_report(item["numero"], dados, model=self.model, use_cache=self.use_cache)
+        await asyncio.to_thread(self._save_report, item, d, dados, rel)
+
+    async def _run_async(self, numeros: List[str], on_item: Callable[[Dict[str, Any]], None]):
+        from scripts.async_pipeline import AsyncPipeline
+
+        async with AsyncPipeline(soap_concurrency=self.soap_concurrency,
+                                 llm_concurrency=self.llm_concurrency) as pipe:
+            async def _one(numero: str):
+                on_item(await self._process_one_async(pipe, numero))
+            await asyncio.gather(*(_one(n) for n in numeros))
+
+    def _append_summary(self, item: Dict[str, Any]):
+        path = os.path.join(self.output_dir, SUMMARY_FILENAME)
+        with self._summary_lock:
+            novo = not os.path.exists(path)
+            with open(path, "a", encoding="utf-8", newline="") as f:
+                w = csv.writer(f, delimiter=";")
+                if novo:
+                    w.writerow(["data_hora", "processo", "status", "segundos", "arquivo", "mensagem"])
+                w.writerow([datetime.now().strftime("%Y-%m-%d %H:%M:%S"), item["numero"], item["status"],
+                            item.get("segundos", ""), item["arquivo"], item["mensagem"]])
+
+    def run(self, numeros: List[str]) -> List[Dict[str, Any]]:
+        """
+        Processa todos os números e retorna a lista de resultados (um dict por processo).
+        O progresso é reportado via progress_callback a cada item concluído.
+        """
+        ok_config, msg_config = validate_config()
+        if not ok_config:
+            raise RuntimeError(f"Falha na configuração: {msg_config}")
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        total = len(numeros)
+        resultados: List[Dict[str, Any]] = []
+        erros = 0
+        logger.info("Lote iniciado: %d processos (workers=%d).", total, self.max_workers)
+
+        def on_item(item: Dict[str, Any]):
+            nonlocal erros
+            resultados.append(item)
+            if item["status"] != "OK":
+                erros += 1
+            self._append_summary(item)
+            logger.info("[%d/%d] %s: %s (%.1fs) %s", len(resultados), total, item["numero"],
+                        item["status"], item.get("segundos", 0), item["mensagem"])
+            if self.progress_callback:
+                try:
+                    self.progress_callback({"concluidos": len(resultados), "total": total,
+                                            "erros": erros, "item": item})
+                except Exception:
+                    logger.debug("Falha no callback de progresso do lote", exc_info=True)
+
+        if self.use_async:
+            asyncio.run(self._run_async(numeros, on_item))
+        else:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="lote") as pool:
+                futures = [pool.submit(self._process_one, n) for n in numeros]
+                for fut in as_completed(futures):
+                    on_item(fut.result())
+
+        logger.info("Lote finalizado: %d OK, %d com erro/cancelados.", total - erros, erros)
+        return resultados
+
+
+def run_batch(numeros: List[str], output_dir: str, **kwargs) -> List[Dict[str, Any]]:
+    """Atalho para BatchRunner(output_dir, **kwargs).run(numeros)."""
+    return BatchRunner(output_dir, **kwargs).run(numeros)
@@ -4,6 +4,14 @@
 Script unificado para compilar o executável AJG.
 Atualizado para coletar explicitamente a stack HTTP (requests, urllib3, certifi, etc.)
 mitigando erros de ModuleNotFoundError em ambientes limpos.
+
+Uso:
+    python scripts/build.py [--with-key]            # dist/AJG.exe (arquivo único)
+    python scripts/build.py --onedir [--with-key]   # dist/AJG/ (pasta, abre mais rápido)
+
+O arquivo único extrai todas as bibliotecas para uma pasta temporária a cada
+execução; a variante em pasta já vem extraída (e sem UPX, que também precisa
+descomprimir as DLLs na abertura), por isso a janela aparece bem antes.
 """
 
 import os
@@ -96,7 +104,65 @@ def restore_config():
         print("OK - Config original restaurado")
 
 
-def create_spec_file():
+# Arquivo único: tudo dentro do AJG.exe (extraído para %TEMP% a cada execução)
+_EXE_ONEFILE = '''
+exe = EXE(
+    pyz,
+    a.scripts,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    [],
+    name='AJG',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=True,
+    upx_exclude=[],
+    runtime_tmpdir=None,
+    console=False,
+    disable_windowed_traceback=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon=None,
+)
+'''
+
+# Pasta: AJG.exe + bibliotecas já extraídas ao lado (COLLECT), sem UPX
+_EXE_ONEDIR = '''
+exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='AJG',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon=None,
+)
+
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.zipfiles,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='AJG',
+)
+'''
+
+
+def create_spec_file(onedir=False):
     """Cria arquivo .spec personalizado para PyInstaller"""
     spec_content = f'''# -*- mode: python ; coding: utf-8 -*-
 
@@ -149,6 +215,22 @@ hiddenimports = [
     # Custom modules
     'scripts.updater',
     'scripts.key_manager',
+    'scripts.pipeline',
+    'scripts.batch',
+    'scripts.cli',
+    'scripts.soap_cache',
+    'scripts.llm_cache',
+    'scripts.prefilter',
+    'scripts.evidence_format',
+    'scripts.http_client',
+    'scripts.async_pipeline',
+    'scripts.tracing',
+    'scripts.metrics',
+    'scripts.recording',
+    'scripts.markdown_ast',
+    'scripts.logfile',
+    'scripts.feedback',
+    'sqlite3',
 ]
 
 http_submodule_targets = {HTTP_SUBMODULE_TARGETS!r}
@@ -197,29 +279,7 @@ a = Analysis(
 )
 
 pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
-
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
-    [],
-    name='AJG',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,
-    disable_windowed_traceback=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-    icon=None,
-)
-'''
+''' + (_EXE_ONEDIR if onedir else _EXE_ONEFILE)
 
     with open('AJG.spec', 'w', encoding='utf-8') as f:
         f.write(spec_content)
@@ -227,7 +287,7 @@ exe = EXE(
     print("OK - Arquivo AJG.spec criado")
 
 
-def build_executable():
+def build_executable(onedir=False):
     """Compila o executável usando PyInstaller"""
     print("Iniciando compilação do executável...")
 
@@ -241,7 +301,7 @@ def build_executable():
     try:
         result = subprocess.run(cmd, check=True, capture_output=True, text=True)
         print("OK - Compilação concluída com sucesso!")
-        print("Executável criado em: dist/AJG.exe")
+        print(f"Executável criado em: {'dist/AJG/AJG.exe' if onedir else 'dist/AJG.exe'}")
         return True
     except subprocess.CalledProcessError as e:
         print("ERRO na compilação:")
@@ -265,6 +325,7 @@ def main():
         return False
 
     use_key = "--with-key" in sys.argv
+    onedir = "--onedir" in sys.argv
 
     api_key = None
     if use_key:
@@ -289,19 +350,22 @@ def main():
         print("OK - Configurações verificadas")
 
         install_pyinstaller()
-        create_spec_file()
-        success = build_executable()
+        create_spec_file(onedir)
+        success = build_executable(onedir)
 
         if success:
             print()
             print("Build concluído com sucesso!")
             print("Arquivos gerados:")
-            print("   - dist/AJG.exe (executável principal)")
+            if onedir:
+                print("   - dist/AJG/ (pasta completa: distribua a pasta inteira, ex.: compactada em .zip)")
+            else:
+                print("   - dist/AJG.exe (executável principal)")
             print("   - build/ (arquivos temporários - pode deletar)")
             print()
             print("Para testar:")
-            print("   1. Copie o executável para outro computador")
-            print("   2. Execute: dist/AJG.exe")
+            print("   1. Copie o " + ("conteúdo de dist/AJG/" if onedir else "executável") + " para outro computador")
+            print("   2. Execute: " + ("dist/AJG/AJG.exe" if onedir else "dist/AJG.exe"))
             print("   3. Teste todas as funcionalidades")
 
         return success
@@ -0,0 +1,197 @@
+# scripts/cli.py
+# -*- coding: utf-8 -*-
+"""
+Entrada de linha de comando (sem interface gráfica) do RelatorioTJMS.
+Reutiliza full_flow e grava uma linha JSON por processo (JSONL) na saída padrão,
+para uso em servidores e pipelines. Não importa tkinter, reportlab nem python-docx.
+
+Uso:
+    python -m scripts.cli 0801234-56.2023.8.12.0001 [outros CNJs...]
+    type lista.txt | python -m scripts.cli -
+    python -m scripts.cli --workers 4 -o saida.jsonl < lista.txt
+    python -m scripts.cli --async --workers 20 < lista.txt   # asyncio/aiohttp, um único loop
+"""
+
+import sys
+import json
+import time
+import logging
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from contextlib import contextmanager
+from typing import Callable, Dict, Any, List, Optional
+
+# Permite executar também como "python scripts/cli.py"
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import config  # noqa: E402
+from config import DEFAULT_MODEL  # noqa: E402
+from scripts.pipeline import logger, full_flow, validate_config, format_cnj  # noqa: E402
+from scripts.batch import extract_cnj_numbers  # noqa: E402
+from scripts.tracing import Trace, use_trace, span, export_trace  # noqa: E402
+from scripts.metrics import record_run  # noqa: E402
+from scripts.logfile import start_file_logging  # noqa: E402
+
+
+def _record(numero: str, model: str, timings: Dict[str, float], inicio: float,
+            resultado: Optional[tuple] = None, erro: Optional[Exception] = None) -> Dict[str, Any]:
+    registro: Dict[str, Any] = {"processo": format_cnj(numero), "modelo": model}
+    if erro is None:
+        dados, rel = resultado
+        registro.update(ok=True, dados=dados, relatorio=rel)
+    else:
+        logger.error("Falha ao gerar relatório de %s: %s", numero, erro)
+        registro.update(ok=False, erro=f"{type(erro).__name__}: {erro}")
+    timings["total"] = time.perf_counter() - inicio
+    registro["tempos"] = {k: round(v, 3) for k, v in timings.items()}
+    return registro
+
+
+@contextmanager
+def _traced_run(numero: str, model: str, trace_dir: Optional[str]):
+    """
+    Registra os spans do processo e grava as métricas ao final (mesmo em caso de erro);
+    com --trace, também grava o arquivo de trace.
+    """
+    trace = Trace("relatorio", processo=format_cnj(numero))
+    erro: Optional[BaseException] = None
+    try:
+        with use_trace(trace), span("full_flow"):
+            yield
+    except BaseException as e:
+        erro = e
+        raise
+    finally:
+        record_run(trace, "cli", model, ok=erro is None, erro=erro)
+        if trace_dir:
+            logger.info(trace.summary())
+            logger.info("Trace gravado em %s", export_trace(trace, trace_dir))
+
+
+def process_one(numero: str, model: str, diagnostic_mode: bool = False, use_cache: bool = True,
+                trace_dir: Optional[str] = None) -> Dict[str, Any]:
+    """Gera o relatório de um processo e devolve o registro JSON correspondente."""
+    timings: Dict[str, float] = {}
+    inicio = time.perf_counter()
+    try:
+        with _traced_run(numero, model, trace_dir):
+            resultado = full_flow(numero, model, diagnostic_mode=diagnostic_mode, timings=timings,
+                                  use_cache=use_cache)
+    except Exception as e:
+        return _record(numero, model, timings, inicio, erro=e)
+    return _record(numero, model, timings, inicio, resultado)
+
+
+async def _run_async(numeros: List[str], model: str, workers: int, diagnostic_mode: bool, use_cache: bool,
+                     emit: Callable[[Dict[str, Any]], None], trace_dir: Optional[str] = None) -> int:
+    """Processa todos os números em um único event loop (ver scripts/async_pipeline.py)."""
+    from scripts.async_pipeline import AsyncPipeline
+
+    falhas = 0
+
+    async def worker(numero: str) -> Dict[str, Any]:
+        nonlocal falhas
+        timings: Dict[str, float] = {}
+        inicio = time.perf_counter()
+        try:
+            with _traced_run(numero, model, trace_dir):
+                resultado = await pipe.full_flow(numero, model, diagnostic_mode=diagnostic_mode, timings=timings,
+                                                 use_cache=use_cache)
+            registro = _record(numero, model, timings, inicio, resultado)
+        except Exception as e:
+            registro = _record(numero, model, timings, inicio, erro=e)
+            falhas += 1
+        emit(registro)
+        return registro
+
+    # --workers limita as consultas ao TJ-MS; o OpenRouter aceita o dobro em paralelo
+    async with AsyncPipeline(soap_concurrency=workers, llm_concurrency=workers * 2) as pipe:
+        await pipe.run_many(numeros, model, worker=worker)
+    return falhas
+
+
+def _collect_numbers(args_numeros: List[str]) -> List[str]:
+    """Números vindos dos argumentos; '-' ou nenhum argumento lê da entrada padrão."""
+    if not args_numeros or args_numeros == ["-"]:
+        return extract_cnj_numbers(sys.stdin.read())
+    return extract_cnj_numbers("\n".join(args_numeros))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m scripts.cli",
+        description="Gera relatórios AJG sem interface gráfica (saída JSONL)."
+    )
+    parser.add_argument("numeros", nargs="*",
+                        help="Números CNJ (com ou sem pontuação). Use '-' ou omita para ler da entrada padrão.")
+    parser.add_argument("-m", "--model", default=DEFAULT_MODEL, help=f"Modelo OpenRouter (padrão: {DEFAULT_MODEL})")
+    parser.add_argument("-o", "--output", help="Arquivo JSONL de saída (padrão: saída padrão)")
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Processos em paralelo (padrão: 1)")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Usa o pipeline assíncrono (asyncio + aiohttp) em vez de threads")
+    parser.add_argument("--diagnostic", action="store_true", help="Modo diagnóstico (prompt de sanidade)")
+    parser.add_argument("--no-cache", action="store_true", help="Ignora os caches locais e consulta os serviços novamente")
+    parser.add_argument("--trace", metavar="PASTA",
+                        help="Grava um trace por processo (formato Chrome Trace Event) nesta pasta")
+    parser.add_argument("--debug", action="store_true", help="Log detalhado (DEBUG) na saída de erro")
+    args = parser.parse_args(argv)
+
+    logger.setLevel(logging.DEBUG if args.debug else logging.INFO)
+    if config.LOG_DIR:
+        # Mesmo arquivo da interface (AJG_LOG_DIR); encerrado no atexit
+        start_file_logging(logger, config.LOG_DIR, int(config.LOG_FILE_MAX_MB * 1024 * 1024), config.LOG_FILE_BACKUPS)
+
+    ok_config, msg_config = validate_config()
+    if not ok_config:
+        logger.error("Falha na configuração: %s", msg_config)
+        return 2
+
+    numeros = _collect_numbers(args.numeros)
+    if not numeros:
+        logger.error("Nenhum número CNJ válido informado.")
+        return 2
+
+    out = open(args.output, "a", encoding="utf-8") if args.output else sys.stdout
+    write_lock = threading.Lock()
+    falhas = 0
+
+    def emit(registro: Dict[str, Any]):
+        with write_lock:
+            out.write(json.dumps(registro, ensure_ascii=False) + "\n")
+            out.flush()
+
+    try:
+        if args.use_async:
+            try:
+                import aiohttp  # noqa: F401
+            except ImportError:
+                logger.error("--async requer o pacote aiohttp (pip install aiohttp).")
+                return 2
+            falhas = asyncio.run(_run_async(numeros, args.model, max(1, args.workers), args.diagnostic,
+                                            not args.no_cache, emit, args.trace))
+        elif args.workers <= 1:
+            for numero in numeros:
+                registro = process_one(numero, args.model, args.diagnostic, not args.no_cache, args.trace)
+                falhas += 0 if registro["ok"] else 1
+                emit(registro)
+        else:
+            with ThreadPoolExecutor(max_workers=args.workers, thread_name_prefix="cli") as pool:
+                futures = [pool.submit(process_one, n, args.model, args.diagnostic, not args.no_cache, args.trace)
+                           for n in numeros]
+                for fut in as_completed(futures):
+                    registro = fut.result()
+                    falhas += 0 if registro["ok"] else 1
+                    emit(registro)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    logger.info("Concluído: %d processos, %d com falha.", len(numeros), falhas)
+    return 1 if falhas else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# scripts/evidence_format.py
+# -*- coding: utf-8 -*-
+"""
+Serialização dos dados evidenciais enviados à LLM.
+- "json": formato original (json.dumps com indentação)
+- "compacto": layout em linhas com legenda de uma linha, campos vazios omitidos e
+  complementos idênticos repetidos substituídos por referência (#n) a uma lista única.
+Em processos com centenas de decisões, espaços e chaves repetidas (codigoPaiNacional,
+descricao, dataHora, complemento) representam boa parte dos tokens do prompt.
+"""
+
+import json
+from collections import Counter
+from typing import Dict, Any, List, Optional, Set
+
+FORMATOS = ("json", "compacto")
+
+# Complementos curtos não compensam a referência
+_MIN_CHARS_DEDUP = 40
+
+_POLOS = (("AT", "Polo ativo"), ("PA", "Polo passivo"))
+
+
+def _one_line(text: str) -> str:
+    # O separador de campos é "|"; quebras de linha viram espaço
+    return " ".join(str(text).split()).replace("|", "/")
+
+
+def _sim_nao(valor) -> str:
+    return "sim" if valor else "não"
+
+
+def _complementos(dec: Dict[str, Any]) -> List[str]:
+    # Cada complemento pode reunir vários textos (separados por "---" no parser)
+    return [_one_line(t) for t in (dec.get("complemento") or "").split("\n---\n") if t.strip()]
+
+
+def _decision_line(dec: Dict[str, Any], complemento: str) -> str:
+    campos = [dec.get("dataHora") or "", dec.get("codigoPaiNacional") or "", _one_line(dec.get("descricao") or "")]
+    if complemento:
+        campos.append(complemento)
+    while campos and not campos[-1]:
+        campos.pop()
+    return "|".join(campos)
+
+
+def encode_compact(dados: Dict[str, Any]) -> str:
+    linhas: List[str] = [
+        "LEGENDA: decisões em linhas data|código|descrição|complemento; "
+        "complemento #n = texto repetido listado em TEXTOS REPETIDOS; campos vazios omitidos no fim da linha; "
+        "gratuidade = assistência judiciária registrada no sistema do TJ-MS"
+    ]
+
+    processo = []
+    if dados.get("classeProcessual"):
+        processo.append(f"classe={dados['classeProcessual']}")
+    if "cumprimento" in dados:
+        processo.append(f"cumprimento de sentença={_sim_nao(dados['cumprimento'])}")
+    if "possivel_apenso" in dados:
+        processo.append(f"indício de apenso={_sim_nao(dados['possivel_apenso'])}")
+    if processo:
+        linhas.append("PROCESSO: " + "; ".join(processo))
+
+    partes = dados.get("partes") or {}
+    for polo, rotulo in _POLOS:
+        nomes = partes.get(polo) or []
+        if nomes:
+            linhas.append(f"{rotulo.upper()}:")
+            for p in nomes:
+                linhas.append(f"{_one_line(p.get('nome') or '')}|gratuidade={_sim_nao(p.get('assistenciaJudiciaria'))}")
+
+    decisoes = dados.get("decisoes") or []
+    complementos = [_complementos(d) for d in decisoes]
+    contagem = Counter(t for textos in complementos for t in textos if len(t) >= _MIN_CHARS_DEDUP)
+    refs: Dict[str, int] = {}
+    for textos in complementos:
+        for t in textos:
+            if contagem.get(t, 0) > 1 and t not in refs:
+                refs[t] = len(refs) + 1
+
+    if decisoes:
+        linhas.append("DECISÕES:")
+        for dec, textos in zip(decisoes, complementos):
+            linhas.append(_decision_line(dec, " --- ".join(f"#{refs[t]}" if t in refs else t for t in textos)))
+
+    if refs:
+        linhas.append("TEXTOS REPETIDOS:")
+        for texto, n in refs.items():
+            linhas.append(f"#{n}: {texto}")
+
+    for resumo in dados.get("resumos_por_periodo") or []:
+        linhas.append(f"RESUMO DO PERÍODO {resumo.get('periodo')}:")
+        linhas.append(resumo.get("resumo") or "")
+
+    # Qualquer outra chave é preservada em JSON de uma linha
+    conhecidas = {"classeProcessual", "cumprimento", "possivel_apenso", "partes", "decisoes", "resumos_por_periodo"}
+    for chave, valor in dados.items():
+        if chave not in conhecidas and valor not in (None, "", [], {}):
+            linhas.append(f"{chave}: {json.dumps(valor, ensure_ascii=False, separators=(',', ':'))}")
+
+    return "\n".join(linhas)
+
+
+def format_evidence(dados: Dict[str, Any], formato: str = "json") -> str:
+    if formato == "compacto":
+        return encode_compact(dados)
+    if formato != "json":
+        raise ValueError(f"Formato de evidências desconhecido: {formato!r} (use {', '.join(FORMATOS)})")
+    return json.dumps(dados, ensure_ascii=False, indent=2)
+
+
+def format_decision(dec: Dict[str, Any], formato: str = "json", vistos: Optional[Set[str]] = None) -> str:
+    """
+    Uma decisão como aparece no bloco de evidências, para estimar o tamanho dos blocos
+    do map-reduce. No compacto, complementos longos já presentes em `vistos` (os do
+    mesmo bloco) viram a referência #n, como em encode_compact; os novos são adicionados.
+    """
+    if formato != "compacto":
+        return format_evidence(dec, formato)
+    textos = []
+    for t in _complementos(dec):
+        if vistos is not None and len(t) >= _MIN_CHARS_DEDUP:
+            if t in vistos:
+                t = "#0"
+            else:
+                vistos.add(t)
+        textos.append(t)
+    return _decision_line(dec, " --- ".join(textos))
+
+
+def evidence_label(formato: str = "json") -> str:
+    """Rótulo do bloco de evidências no prompt."""
+    return "DADOS EVIDENCIAIS (formato compacto, ver LEGENDA)" if formato == "compacto" else "DADOS EVIDENCIAIS (JSON)"
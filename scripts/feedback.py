@@ -0,0 +1,229 @@
+# scripts/feedback.py
+# -*- coding: utf-8 -*-
+"""
+Envio do feedback dos relatórios ao Google Forms em segundo plano.
+Cada feedback é gravado primeiro em uma caixa de saída local (SQLite) e só então
+enviado por uma thread própria: fechar a janela ou iniciar um novo relatório
+nunca espera pela rede. Os pendentes são enviados em lotes pela mesma sessão
+keep-alive; falhas de rede, 429 e 5xx são repetidas com espera exponencial, e o
+que não saiu até o fechamento é enviado na próxima abertura do aplicativo.
+A entrega é "ao menos uma vez": um envio interrompido no fechamento pode se repetir.
+"""
+
+import os
+import json
+import time
+import random
+import sqlite3
+import logging
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger("RelatorioTJMS")
+
+FORM_URL = "https://docs.google.com/forms/d/e/1FAIpQLSdnbKWxgHAzaQC-RhnsSG7ojfIXz25UkaWv0xKRhMwkT0qz7A/formResponse"
+_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36',
+    'Content-Type': 'application/x-www-form-urlencoded',
+    'Origin': 'https://docs.google.com',
+    'Referer': 'https://docs.google.com/forms/d/e/1FAIpQLSdnbKWxgHAzaQC-RhnsSG7ojfIXz25UkaWv0xKRhMwkT0qz7A/viewform'
+}
+
+# Espera entre tentativas: 30 s, 60 s, 120 s... até 1 h (±20%, para não sincronizar várias máquinas)
+BACKOFF_BASE_S = 30.0
+BACKOFF_MAX_S = 3600.0
+# Pendentes enviados por vez; o restante fica para a próxima rodada
+BATCH_SIZE = 20
+
+
+def form_data(tipo: str, descricao: str, processo: str, modelo: str) -> Dict[str, str]:
+    """Campos do formulário; a data é a do registro do feedback, não a do envio."""
+    return {
+        "entry.1930801017_sentinel": "",
+        "entry.1930801017": tipo,
+        "entry.811378283": descricao,
+        "entry.77871712": processo,
+        "entry.72495185": modelo,
+        "entry.864187237": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def post_feedback(data: Dict[str, str], timeout: float) -> int:
+    """Envia um feedback e devolve o status HTTP (exceções de rede sobem para quem chamou)."""
+    from scripts.http_client import get_session
+    return get_session(FORM_URL).post(FORM_URL, data=data, headers=_HEADERS, timeout=timeout).status_code
+
+
+def backoff_seconds(tentativas: int) -> float:
+    espera = min(BACKOFF_MAX_S, BACKOFF_BASE_S * (2 ** max(0, tentativas - 1)))
+    return espera * random.uniform(0.8, 1.2)
+
+
+class FeedbackOutbox:
+    """Caixa de saída persistente: um feedback só sai daqui depois de aceito pelo formulário."""
+
+    def __init__(self, db_path: str, max_age_seconds: float = 30 * 24 * 3600):
+        self.db_path = db_path
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        # Conexão curta por operação, como no cache da LLM: usada pela UI e pela thread de envio
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._initialized:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pendentes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    criado_em REAL NOT NULL,
+                    dados TEXT NOT NULL,
+                    tentativas INTEGER NOT NULL DEFAULT 0,
+                    proxima_tentativa REAL NOT NULL DEFAULT 0,
+                    ultimo_erro TEXT NOT NULL DEFAULT ''
+                )
+            """)
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def _execute(self, sql: str, params: Tuple = ()) -> List[Tuple]:
+        with self._lock:
+            conn = self._connect()
+            try:
+                rows = conn.execute(sql, params).fetchall()
+                conn.commit()
+                return rows
+            finally:
+                conn.close()
+
+    def add(self, data: Dict[str, str]):
+        self._execute("INSERT INTO pendentes (criado_em, dados) VALUES (?, ?)",
+                      (time.time(), json.dumps(data, ensure_ascii=False)))
+
+    def due(self, limit: int, now: Optional[float] = None) -> List[Tuple[int, Dict[str, str], int]]:
+        """(id, dados, tentativas) dos pendentes cuja próxima tentativa já chegou, mais antigos primeiro."""
+        rows = self._execute("SELECT id, dados, tentativas FROM pendentes WHERE proxima_tentativa <= ? "
+                             "ORDER BY id LIMIT ?", (now if now is not None else time.time(), limit))
+        return [(i, json.loads(dados), tentativas) for i, dados, tentativas in rows]
+
+    def next_attempt(self) -> Optional[float]:
+        row = self._execute("SELECT MIN(proxima_tentativa) FROM pendentes")
+        return row[0][0] if row else None
+
+    def count(self) -> int:
+        return self._execute("SELECT COUNT(*) FROM pendentes")[0][0]
+
+    def delete(self, item_id: int):
+        self._execute("DELETE FROM pendentes WHERE id = ?", (item_id,))
+
+    def reschedule(self, item_id: int, tentativas: int, erro: str):
+        self._execute("UPDATE pendentes SET tentativas = ?, proxima_tentativa = ?, ultimo_erro = ? WHERE id = ?",
+                      (tentativas, time.time() + backoff_seconds(tentativas), erro[:500], item_id))
+
+    def release_all(self):
+        """Torna todos os pendentes elegíveis agora (abertura do aplicativo: a rede pode ter voltado)."""
+        self._execute("UPDATE pendentes SET proxima_tentativa = 0")
+
+    def purge_expired(self) -> int:
+        if self.max_age_seconds <= 0:
+            return 0
+        limite = time.time() - self.max_age_seconds
+        antigos = self._execute("SELECT COUNT(*) FROM pendentes WHERE criado_em < ?", (limite,))[0][0]
+        if antigos:
+            self._execute("DELETE FROM pendentes WHERE criado_em < ?", (limite,))
+        return antigos
+
+
+class FeedbackSender:
+    """Thread de envio da caixa de saída; enqueue() só grava localmente e acorda a thread."""
+
+    def __init__(self, outbox: FeedbackOutbox, timeout: float = 15.0):
+        self.outbox = outbox
+        self.timeout = timeout
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def enqueue(self, tipo: str, descricao: str, processo: str, modelo: str):
+        """Registra o feedback na caixa de saída (levanta sqlite3.Error/OSError se não for possível gravar)."""
+        self.outbox.add(form_data(tipo, descricao, processo, modelo))
+        self._wake.set()
+
+    def start(self):
+        """Inicia a thread de envio (uma vez); o que ficou pendente da sessão anterior sai primeiro."""
+        with self._start_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="feedback", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Não espera pela rede: o envio em curso é abandonado e o feedback continua na caixa de saída."""
+        self._stop.set()
+        self._wake.set()
+
+    def _run(self):
+        try:
+            expirados = self.outbox.purge_expired()
+            if expirados:
+                logger.warning(f"{expirados} feedback(s) pendente(s) descartado(s) por idade")
+            self.outbox.release_all()
+        except (sqlite3.Error, OSError) as e:
+            logger.warning(f"Caixa de saída de feedback indisponível: {e}")
+            return
+        while not self._stop.is_set():
+            try:
+                self._send_due()
+                proxima = self.outbox.next_attempt()
+            except (sqlite3.Error, OSError) as e:
+                logger.warning(f"Falha na caixa de saída de feedback: {e}")
+                proxima = time.time() + BACKOFF_BASE_S
+            espera = None if proxima is None else max(0.0, proxima - time.time())
+            self._wake.wait(espera)
+            self._wake.clear()
+
+    def _send_due(self):
+        while not self._stop.is_set():
+            lote = self.outbox.due(BATCH_SIZE)
+            if not lote:
+                return
+            for posicao, (item_id, dados, tentativas) in enumerate(lote):
+                if self._stop.is_set():
+                    return
+                try:
+                    status = post_feedback(dados, self.timeout)
+                except Exception as e:
+                    # Sem rede, o resto do lote falharia igual: adia todos
+                    erro = f"{type(e).__name__}: {e}"
+                    for pendente_id, _, pendente_tentativas in lote[posicao:]:
+                        self.outbox.reschedule(pendente_id, pendente_tentativas + 1, erro)
+                    logger.debug(f"Envio de feedback adiado ({erro}); {self.outbox.count()} pendente(s)")
+                    return
+                if status == 200:
+                    self.outbox.delete(item_id)
+                    logger.debug(f"Feedback {dados.get('entry.1930801017', '')} enviado ao Google Forms")
+                elif status in (408, 429) or status >= 500:
+                    self.outbox.reschedule(item_id, tentativas + 1, f"HTTP {status}")
+                else:
+                    # Rejeitado pelo formulário (ex.: campo inválido): repetir não resolve
+                    self.outbox.delete(item_id)
+                    logger.warning(f"Feedback descartado: o Google Forms respondeu HTTP {status}")
+
+
+_sender: Optional[FeedbackSender] = None
+_sender_lock = threading.Lock()
+
+
+def get_sender() -> FeedbackSender:
+    global _sender
+    with _sender_lock:
+        if _sender is None:
+            import config
+            _sender = FeedbackSender(FeedbackOutbox(config.FEEDBACK_OUTBOX_DB,
+                                                    max_age_seconds=config.FEEDBACK_MAX_AGE_DAYS * 86400),
+                                     timeout=config.FEEDBACK_TIMEOUT)
+        return _sender
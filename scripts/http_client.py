@@ -0,0 +1,118 @@
+# scripts/http_client.py
+# -*- coding: utf-8 -*-
+"""
+Camada HTTP compartilhada do processo.
+Uma requests.Session de longa duração por host (TJ-MS, OpenRouter, Google Forms),
+com pool de conexões keep-alive dimensionado para o lote, a política de Retry e os
+certificados do executável PyInstaller. Cada relatório reaproveita as conexões
+TCP/TLS já abertas em vez de refazer o handshake.
+
+HTTP/2: requests/urllib3 falam HTTP/1.1. Com AJG_HTTP2=1 e urllib3 >= 2.3 + h2
+instalados, o suporte experimental do urllib3 é ativado; caso contrário, segue HTTP/1.1.
+"""
+
+import os
+import sys
+import logging
+import threading
+from typing import Dict, Optional, Union
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter, Retry
+
+import config
+
+logger = logging.getLogger("RelatorioTJMS")
+
+_sessions: Dict[str, requests.Session] = {}
+_lock = threading.Lock()
+_verify: Optional[Union[str, bool]] = None
+_http2_checked = False
+
+
+def _make_retry() -> Retry:
+    return Retry(total=4, backoff_factor=0.6, status_forcelist=[429, 500, 502, 503, 504])
+
+
+def retry_count(r: requests.Response) -> int:
+    """Quantas novas tentativas o Retry do urllib3 fez até obter a resposta `r`."""
+    retries = getattr(r.raw, "retries", None)
+    return len(retries.history) if retries is not None else 0
+
+
+def ssl_verify() -> Union[str, bool]:
+    """Caminho do cacert.pem a usar no executável PyInstaller; True (padrão do requests) fora dele."""
+    global _verify
+    if _verify is not None:
+        return _verify
+    if getattr(sys, 'frozen', False):
+        # Executável empacotado - usar cacert.pem incluído
+        cacert_path = os.path.join(sys._MEIPASS, 'certifi', 'cacert.pem')
+        if os.path.exists(cacert_path):
+            _verify = cacert_path
+            logger.info(f"Usando certificados SSL de: {cacert_path}")
+        else:
+            # Fallback: usar certifi padrão
+            import certifi
+            _verify = certifi.where()
+            logger.info(f"Fallback: usando certificados SSL de: {certifi.where()}")
+    else:
+        _verify = True
+    return _verify
+
+
+def _enable_http2():
+    global _http2_checked
+    if _http2_checked:
+        return
+    _http2_checked = True
+    if not config.HTTP2_ENABLED:
+        return
+    try:
+        import urllib3.http2
+        urllib3.http2.inject_into_urllib3()
+        logger.info("HTTP/2 experimental do urllib3 ativado.")
+    except Exception as e:
+        logger.info("HTTP/2 indisponível (%s); usando HTTP/1.1 com keep-alive.", e)
+
+
+def new_session(pool_maxsize: Optional[int] = None) -> requests.Session:
+    """Cria uma sessão nova com Retry, pool de conexões e certificados configurados."""
+    _enable_http2()
+    pool_maxsize = pool_maxsize or config.HTTP_POOL_MAXSIZE
+    s = requests.Session()
+    for prefix in ("http://", "https://"):
+        s.mount(prefix, HTTPAdapter(max_retries=_make_retry(), pool_connections=config.HTTP_POOL_CONNECTIONS,
+                                    pool_maxsize=pool_maxsize, pool_block=False))
+    verify = ssl_verify()
+    if verify is not True:
+        s.verify = verify
+    return s
+
+
+def get_session(url: str) -> requests.Session:
+    """
+    Sessão compartilhada (process-wide) para o host de `url`.
+    As sessões não são alteradas após criadas; o pool do urllib3 é thread-safe,
+    então a mesma sessão atende a UI, a linha de comando e as threads do lote.
+    """
+    host = urlsplit(url).netloc.lower()
+    s = _sessions.get(host)
+    if s is not None:
+        return s
+    with _lock:
+        s = _sessions.get(host)
+        if s is None:
+            s = new_session()
+            _sessions[host] = s
+            logger.debug("Sessão HTTP compartilhada criada para %s.", host)
+        return s
+
+
+def close_all():
+    """Fecha as sessões compartilhadas (encerramento do aplicativo)."""
+    with _lock:
+        for s in _sessions.values():
+            s.close()
+        _sessions.clear()
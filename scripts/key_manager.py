@@ -9,8 +9,6 @@ import os
 import sys
 import json
 import base64
-import tkinter as tk
-from tkinter import messagebox, simpledialog
 from pathlib import Path
 from typing import Optional
 
@@ -130,6 +128,9 @@ class KeySetupDialog:
 
     def show_setup_dialog(self) -> Optional[str]:
         """Mostra dialog para configurar chave API"""
+        # Import tardio: o KeyManager também é usado por config.py em modo sem interface (CLI)
+        import tkinter as tk  # pylint: disable=import-outside-toplevel
+
         root = self.parent or tk.Tk()
 
         if not self.parent:
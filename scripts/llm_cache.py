@@ -0,0 +1,122 @@
+# scripts/llm_cache.py
+# -*- coding: utf-8 -*-
+"""
+Cache local (SQLite) das respostas do OpenRouter.
+A chave é o hash de modelo + temperatura + mensagens: um prompt byte a byte
+idêntico para um processo sem movimentações novas devolve o relatório anterior
+sem nova chamada à API. Entradas expiram por idade e o banco é limitado em
+tamanho, descartando primeiro as menos usadas.
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+logger = logging.getLogger("RelatorioTJMS")
+
+
+class LLMCache:
+    def __init__(self, db_path: str, max_age_seconds: int = 30 * 24 * 3600, max_bytes: int = 50 * 1024 * 1024):
+        self.db_path = db_path
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    @staticmethod
+    def make_key(model: str, temperature: float, messages: list) -> str:
+        payload = json.dumps({"model": model, "temperature": temperature, "messages": messages},
+                             ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Conexão curta por operação: o cache é usado por várias threads (UI, lote)
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._initialized:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS respostas (
+                    chave TEXT PRIMARY KEY,
+                    modelo TEXT NOT NULL,
+                    criado_em REAL NOT NULL,
+                    acessado_em REAL NOT NULL,
+                    tamanho INTEGER NOT NULL,
+                    resposta TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_respostas_acesso ON respostas(acessado_em)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def get(self, model: str, temperature: float, messages: list) -> Optional[str]:
+        key = self.make_key(model, temperature, messages)
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._connect()
+                try:
+                    row = conn.execute("SELECT criado_em, resposta FROM respostas WHERE chave = ?", (key,)).fetchone()
+                    if row is None:
+                        return None
+                    if self.max_age_seconds > 0 and now - row[0] > self.max_age_seconds:
+                        conn.execute("DELETE FROM respostas WHERE chave = ?", (key,))
+                        conn.commit()
+                        return None
+                    conn.execute("UPDATE respostas SET acessado_em = ? WHERE chave = ?", (now, key))
+                    conn.commit()
+                    return row[1]
+                finally:
+                    conn.close()
+        except sqlite3.Error as e:
+            logger.warning("Falha ao ler cache de respostas da LLM: %s", e)
+            return None
+
+    def put(self, model: str, temperature: float, messages: list, response: str):
+        key = self.make_key(model, temperature, messages)
+        now = time.time()
+        size = len(response.encode("utf-8"))
+        try:
+            with self._lock:
+                conn = self._connect()
+                try:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO respostas (chave, modelo, criado_em, acessado_em, tamanho, resposta) "
+                        "VALUES (?, ?, ?, ?, ?, ?)", (key, model, now, now, size, response))
+                    self._evict(conn, now)
+                    conn.commit()
+                finally:
+                    conn.close()
+        except sqlite3.Error as e:
+            logger.warning("Falha ao gravar cache de respostas da LLM: %s", e)
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        if self.max_age_seconds > 0:
+            conn.execute("DELETE FROM respostas WHERE criado_em < ?", (now - self.max_age_seconds,))
+        total = conn.execute("SELECT COALESCE(SUM(tamanho), 0) FROM respostas").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excedente = total - self.max_bytes
+        removidas = []
+        for chave, tamanho in conn.execute("SELECT chave, tamanho FROM respostas ORDER BY acessado_em"):
+            if excedente <= 0:
+                break
+            removidas.append((chave,))
+            excedente -= tamanho
+        conn.executemany("DELETE FROM respostas WHERE chave = ?", removidas)
+        logger.debug("Cache de respostas da LLM: %d entradas descartadas por tamanho.", len(removidas))
+
+    def clear(self):
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("DELETE FROM respostas")
+                conn.commit()
+            finally:
+                conn.close()
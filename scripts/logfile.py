@@ -0,0 +1,251 @@
+# scripts/logfile.py
+# -*- coding: utf-8 -*-
+"""
+Log estruturado em arquivo (JSON lines), com rotação por tamanho.
+As threads do pipeline só enfileiram o registro (QueueHandler, fila sem limite);
+uma thread própria (QueueListener) formata e grava em disco, de modo que a escrita
+nunca bloqueia a consulta ao TJ-MS, a chamada ao OpenRouter ou a interface.
+Cada linha leva o identificador do relatório (Trace.id, scripts/tracing.py) e o
+número do processo ativos no contexto do registro, inclusive em threads de
+trabalho e tasks asyncio que recebem o trace via use_trace.
+
+Uso (consulta offline):
+    python -m scripts.logfile                              # últimas 50 linhas
+    python -m scripts.logfile --nivel WARNING --processo 0801234
+    python -m scripts.logfile --relatorio 3f9a1c --json    # linhas de um relatório, em JSON
+    python -m scripts.logfile --texto "timeout|429" --desde 2025-10-01
+    python -m scripts.logfile --resumo                     # contagens por nível, processo e mensagem
+"""
+
+import os
+import re
+import sys
+import copy
+import json
+import queue
+import atexit
+import logging
+import logging.handlers
+import argparse
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from scripts.tracing import current_trace
+
+ARQUIVO_LOG = "relatorio.jsonl"
+
+_NIVEIS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class CorrelationFilter(logging.Filter):
+    """Anota o registro com o relatório e o processo do trace ativo (roda na thread que registrou)."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        trace = current_trace()
+        record.relatorio = trace.id if trace is not None else ""
+        record.processo = str(trace.attrs.get("processo", "")) if trace is not None else ""
+        return True
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """Um objeto JSON por linha: ts, nivel, thread, relatorio, processo, msg e, se houver, exc."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        linha: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "thread": record.threadName,
+            "relatorio": getattr(record, "relatorio", ""),
+            "processo": getattr(record, "processo", ""),
+            "msg": record.getMessage(),
+        }
+        if record.exc_text:
+            linha["exc"] = record.exc_text
+        return json.dumps(linha, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """Resolve a mensagem e o traceback na thread de origem, mas mantém a exceção fora de msg."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+def start_file_logging(target: logging.Logger, log_dir: str, max_bytes: int, backups: int) -> Optional[str]:
+    """
+    Liga o log em arquivo de `target` (uma vez por processo). Devolve o caminho do
+    arquivo, ou None se a pasta não puder ser criada (o aplicativo segue sem o arquivo).
+    """
+    global _listener
+    caminho = os.path.join(log_dir, ARQUIVO_LOG)
+    if _listener is not None:
+        return caminho
+    try:
+        os.makedirs(log_dir, exist_ok=True)
+        file_handler = logging.handlers.RotatingFileHandler(caminho, encoding="utf-8", maxBytes=max_bytes,
+                                                            backupCount=backups, delay=True)
+    except OSError as e:
+        target.warning(f"Arquivo de log indisponível em {log_dir}: {e}")
+        return None
+    file_handler.setFormatter(JsonLinesFormatter())
+
+    fila: "queue.Queue[logging.LogRecord]" = queue.Queue()  # sem limite: put nunca bloqueia
+    queue_handler = _QueueHandler(fila)
+    queue_handler.addFilter(CorrelationFilter())
+    _listener = logging.handlers.QueueListener(fila, file_handler)
+    _listener.start()
+    target.addHandler(queue_handler)
+    atexit.register(stop_file_logging)
+    return caminho
+
+
+def stop_file_logging():
+    """Grava o que ainda está na fila e encerra a thread de escrita (pode ser chamado mais de uma vez)."""
+    global _listener
+    if _listener is not None:
+        listener, _listener = _listener, None
+        listener.stop()
+        for handler in listener.handlers:
+            handler.close()
+
+
+# =========================
+# Consulta offline
+# =========================
+def log_files(log_dir: str) -> List[str]:
+    """Arquivo atual e rotacionados, do mais antigo para o mais recente."""
+    base = os.path.join(log_dir, ARQUIVO_LOG)
+    rotacionados = []
+    for nome in os.listdir(log_dir) if os.path.isdir(log_dir) else []:
+        m = re.fullmatch(re.escape(ARQUIVO_LOG) + r"\.(\d+)", nome)
+        if m:
+            rotacionados.append((int(m.group(1)), os.path.join(log_dir, nome)))
+    arquivos = [caminho for _, caminho in sorted(rotacionados, reverse=True)]
+    if os.path.exists(base):
+        arquivos.append(base)
+    return arquivos
+
+
+def read_entries(arquivos: List[str]) -> Iterator[Dict[str, Any]]:
+    for caminho in arquivos:
+        with open(caminho, "r", encoding="utf-8", errors="replace") as f:
+            for linha in f:
+                try:
+                    yield json.loads(linha)
+                except ValueError:
+                    continue  # linha truncada (queda durante a escrita)
+
+
+def filter_entries(entradas: Iterator[Dict[str, Any]], nivel: Optional[str] = None, processo: Optional[str] = None,
+                   relatorio: Optional[str] = None, texto: Optional[str] = None,
+                   desde: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    minimo = logging.getLevelName(nivel) if nivel else logging.NOTSET
+    padrao = re.compile(texto, re.IGNORECASE) if texto else None
+    digitos = re.sub(r"\D", "", processo) if processo else ""
+    for e in entradas:
+        if logging.getLevelName(e.get("nivel", "INFO")) < minimo:
+            continue
+        if desde and e.get("ts", "") < desde:
+            continue
+        if relatorio and not e.get("relatorio", "").startswith(relatorio):
+            continue
+        if digitos and digitos not in re.sub(r"\D", "", e.get("processo", "")):
+            continue
+        if padrao and not (padrao.search(e.get("msg", "")) or padrao.search(e.get("exc", ""))):
+            continue
+        yield e
+
+
+def format_entry(e: Dict[str, Any]) -> str:
+    rotulo = f" [{e['relatorio']} {e.get('processo', '')}]" if e.get("relatorio") else ""
+    linha = f"{e.get('ts', '')} [{e.get('nivel', '')}]{rotulo} {e.get('msg', '')}"
+    return linha + ("\n" + e["exc"] if e.get("exc") else "")
+
+
+def summarize(entradas: Iterator[Dict[str, Any]], top: int = 15) -> str:
+    """Contagem por nível, relatórios com avisos/erros por processo e mensagens de aviso/erro mais frequentes."""
+    por_nivel: Counter = Counter()
+    relatorios: Dict[str, Dict[str, Any]] = {}
+    mensagens: Counter = Counter()
+    primeiro = ultimo = ""
+    for e in entradas:
+        nivel = e.get("nivel", "")
+        por_nivel[nivel] += 1
+        primeiro = primeiro or e.get("ts", "")
+        ultimo = e.get("ts", "") or ultimo
+        if e.get("relatorio"):
+            r = relatorios.setdefault(e["relatorio"], {"processo": e.get("processo", ""), "problemas": 0})
+            r["problemas"] += nivel in ("WARNING", "ERROR", "CRITICAL")
+        if nivel in ("WARNING", "ERROR", "CRITICAL"):
+            # Números (processos, tempos, códigos HTTP) variam; a mensagem agrupada não
+            mensagens[(nivel, re.sub(r"\d+", "#", e.get("msg", ""))[:120])] += 1
+
+    total = sum(por_nivel.values())
+    linhas = [f"{total} linhas ({primeiro or '-'} a {ultimo or '-'}), {len(relatorios)} relatório(s)"]
+    linhas.append("Por nível: " + ", ".join(f"{n} {por_nivel[n]}" for n in _NIVEIS if por_nivel[n]))
+    por_processo: Counter = Counter()
+    for r in relatorios.values():
+        if r["problemas"]:
+            por_processo[r["processo"] or "?"] += 1
+    if por_processo:
+        linhas.append("\nRelatórios com avisos/erros por processo:")
+        linhas += [f"  {processo:<28} {n:>5}" for processo, n in por_processo.most_common(top)]
+    if mensagens:
+        linhas.append("\nAvisos/erros mais frequentes:")
+        linhas += [f"  {n:>5}  [{nivel}] {msg}" for (nivel, msg), n in mensagens.most_common(top)]
+    return "\n".join(linhas)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m scripts.logfile",
+                                     description="Busca e resumo do log estruturado (inclui os arquivos rotacionados).")
+    parser.add_argument("--pasta", help="Pasta dos logs (padrão: AJG_LOG_DIR)")
+    parser.add_argument("--nivel", type=str.upper, choices=_NIVEIS, help="Nível mínimo")
+    parser.add_argument("--processo", help="Número do processo (com ou sem pontuação)")
+    parser.add_argument("--relatorio", help="Identificador (ou prefixo) do relatório")
+    parser.add_argument("--texto", help="Expressão regular procurada na mensagem e no traceback")
+    parser.add_argument("--desde", help="Data/hora ISO inicial (ex.: 2025-10-01 ou 2025-10-01T14:00)")
+    parser.add_argument("--ultimas", type=int, default=50, help="Linhas exibidas (0 = todas; padrão: 50)")
+    parser.add_argument("--json", action="store_true", help="Saída em JSON lines")
+    parser.add_argument("--resumo", action="store_true", help="Contagens em vez das linhas")
+    args = parser.parse_args(argv)
+
+    if args.pasta:
+        pasta = args.pasta
+    else:
+        import config
+        pasta = config.LOG_DIR
+    arquivos = log_files(pasta) if pasta else []
+    if not arquivos:
+        print(f"Nenhum log em {pasta or '(AJG_LOG_DIR vazio)'}.")
+        return 1
+    try:
+        entradas = filter_entries(read_entries(arquivos), args.nivel, args.processo, args.relatorio,
+                                  args.texto, args.desde)
+        if args.resumo:
+            print(summarize(entradas))
+            return 0
+        selecionadas = list(entradas)
+    except re.error as e:
+        print(f"Expressão regular inválida em --texto: {e}")
+        return 1
+    if args.ultimas > 0:
+        selecionadas = selecionadas[-args.ultimas:]
+    for e in selecionadas:
+        print(json.dumps(e, ensure_ascii=False) if args.json else format_entry(e))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,204 @@
+# scripts/markdown_ast.py
+# -*- coding: utf-8 -*-
+"""
+Árvore única do markdown dos relatórios, compartilhada pelo painel Tk e pelas
+exportações (DOCX, RTF, PDF via reportlab e HTML/weasyprint).
+O relatório é tokenizado uma vez (parse_markdown, com cache por texto) em uma
+tupla de blocos; cada saída só percorre os blocos e traduz os estilos.
+
+Blocos (Bloco.tipo): "h1", "h2", "h3", "list" (marcador -, * ou •), "quote"
+(linha iniciada por "> "), "normal" e "empty" (linha em branco).
+Trechos (texto, estilo): estilo "" (texto do bloco), "bold" (**negrito**),
+"italic" (*itálico*) ou "quote" ("citação", com as aspas no texto).
+Sem dependência de Tk, python-docx ou reportlab.
+"""
+
+import re
+import struct
+from functools import lru_cache
+from html import escape as _html_escape
+from typing import Dict, NamedTuple, Tuple
+
+Trecho = Tuple[str, str]
+
+_HEADINGS = (("### ", "h3"), ("## ", "h2"), ("# ", "h1"))
+_LIST_MARKER_RE = re.compile(r'[-*•]\s+')
+
+
+class Bloco(NamedTuple):
+    tipo: str
+    trechos: Tuple[Trecho, ...]
+
+
+def _find_or_end(line: str, marker: str, start: int) -> int:
+    i = line.find(marker, start)
+    return len(line) if i < 0 else i
+
+
+def _lone_star(line: str, start: int, pos: int) -> int:
+    """Próximo '*' sem outro '*' ao lado a partir de start (o vizinho à esquerda de pos já foi consumido)."""
+    n = len(line)
+    i = line.find('*', start)
+    while i >= 0:
+        if (i == pos or line[i - 1] != '*') and (i + 1 >= n or line[i + 1] != '*'):
+            return i
+        i = line.find('*', i + 1)
+    return n
+
+
+def _closing_star(line: str, start: int) -> int:
+    """Próximo '*' não seguido de outro '*' (fechamento do itálico)."""
+    n = len(line)
+    i = line.find('*', start)
+    while 0 <= i < n - 1 and line[i + 1] == '*':
+        i = line.find('*', i + 1)
+    return n if i < 0 else i
+
+
+def tokenize_inline(line: str) -> Tuple[Trecho, ...]:
+    """
+    Divide uma linha em trechos (texto, estilo) em uma única passada: **negrito**,
+    *itálico* e "citações" (as aspas são mantidas); marcadores sem fechamento ficam
+    como texto. A posição de cada marcador só é procurada de novo quando a leitura
+    passa dela.
+    """
+    runs = []
+    n = len(line)
+    pos = 0
+    bold = italic = quote = -1
+    while pos < n:
+        if bold < pos:
+            bold = _find_or_end(line, '**', pos)
+        if quote < pos:
+            quote = _find_or_end(line, '"', pos)
+        if italic < pos:
+            italic = _lone_star(line, pos, pos)
+        elif line[pos] == '*' and (pos + 1 >= n or line[pos + 1] != '*'):
+            # No início do trecho restante o '*' não tem mais vizinho à esquerda
+            italic = pos
+
+        nxt = min(bold, italic, quote)
+        if nxt == n:
+            runs.append((line[pos:], ""))
+            break
+        if nxt > pos:
+            runs.append((line[pos:nxt], ""))
+
+        if nxt == bold:
+            end = line.find('**', nxt + 2)
+            if end > nxt + 2:
+                runs.append((line[nxt + 2:end], "bold"))
+                pos = end + 2
+            else:
+                runs.append(('**', ""))
+                pos = nxt + 2
+        elif nxt == italic:
+            end = _closing_star(line, nxt + 1)
+            content = line[nxt + 1:end]
+            if end < n and content and not content.isspace():
+                runs.append((content, "italic"))
+                pos = end + 1
+            else:
+                runs.append(('*', ""))
+                pos = nxt + 1
+        else:
+            end = line.find('"', nxt + 1)
+            if end >= 0:
+                runs.append((line[nxt:end + 1], "quote"))
+                pos = end + 1
+            else:
+                runs.append(('"', ""))
+                pos = nxt + 1
+    return tuple(runs)
+
+
+def parse_line(line: str) -> Bloco:
+    """Classifica uma linha (sem a quebra) e tokeniza o texto sem o marcador de bloco."""
+    s = line.strip()
+    if not s:
+        return Bloco("empty", ())
+    for prefixo, tipo in _HEADINGS:
+        if s.startswith(prefixo):
+            return Bloco(tipo, tokenize_inline(s[len(prefixo):].strip()))
+    m = _LIST_MARKER_RE.match(s)
+    if m:
+        return Bloco("list", tokenize_inline(s[m.end():]))
+    if s.startswith('> '):
+        return Bloco("quote", tokenize_inline(s[2:]))
+    return Bloco("normal", tokenize_inline(s))
+
+
+@lru_cache(maxsize=8)
+def parse_markdown(markdown_text: str) -> Tuple[Bloco, ...]:
+    """Blocos do relatório; salvar em vários formatos ou renderizar de novo reaproveita a mesma árvore."""
+    return tuple(parse_line(line) for line in markdown_text.split('\n'))
+
+
+# =========================
+# Saídas em texto (RTF, reportlab, HTML)
+# =========================
+class _RtfEscapes(dict):
+    """Tabela para str.translate: \\, { e } escapados; fora do ASCII, \\'xx (cp1252) ou \\uN?."""
+
+    def __init__(self):
+        super().__init__({i: chr(i) for i in range(128)})
+        self.update({ord('\\'): '\\\\', ord('{'): '\\{', ord('}'): '\\}'})
+
+    def __missing__(self, codigo: int) -> str:
+        ch = chr(codigo)
+        try:
+            valor = "\\'%02x" % ch.encode("cp1252")[0]
+        except UnicodeEncodeError:
+            # \uN usa inteiros de 16 bits com sinal; fora do BMP, um par substituto
+            utf16 = ch.encode("utf-16-le")
+            unidades = struct.unpack(f"<{len(utf16) // 2}h", utf16)
+            valor = "".join(f"\\u{u}?" for u in unidades)
+        self[codigo] = valor
+        return valor
+
+
+_RTF_ESCAPES = _RtfEscapes()
+
+
+def rtf_escape(text: str) -> str:
+    return text.translate(_RTF_ESCAPES)
+
+
+def _join(trechos: Tuple[Trecho, ...], escape, formatos: Dict[str, Tuple[str, str]]) -> str:
+    partes = []
+    for texto, estilo in trechos:
+        if estilo:
+            abre, fecha = formatos[estilo]
+            partes += [abre, escape(texto), fecha]
+        else:
+            partes.append(escape(texto))
+    return "".join(partes)
+
+
+def _xml_escape(text: str) -> str:
+    return _html_escape(text, quote=False)
+
+
+_RTF = {"bold": (r"{\b ", "}"), "italic": (r"{\i ", "}"), "quote": (r"{\i\cf3 ", r"\cf0\i0}")}
+_RTF_SIMPLE = {"bold": (r"\b ", r"\b0 "), "italic": (r"\i ", r"\i0 "), "quote": (r"\i ", r"\i0 ")}
+_REPORTLAB = {"bold": ("<b>", "</b>"), "italic": ("<i>", "</i>"), "quote": ('<i><font color="#666666">', "</font></i>")}
+_HTML = {"bold": ("<strong>", "</strong>"), "italic": ("<em>", "</em>"), "quote": ("<em>", "</em>")}
+
+
+def to_rtf(trechos: Tuple[Trecho, ...]) -> str:
+    """RTF em grupos ({\\b ...}), usado no documento RTF completo."""
+    return _join(trechos, rtf_escape, _RTF)
+
+
+def to_rtf_simple(trechos: Tuple[Trecho, ...]) -> str:
+    """RTF com liga/desliga (\\b ... \\b0), usado dentro do template RTF."""
+    return _join(trechos, rtf_escape, _RTF_SIMPLE)
+
+
+def to_reportlab(trechos: Tuple[Trecho, ...]) -> str:
+    """Marcação de Paragraph do reportlab."""
+    return _join(trechos, _xml_escape, _REPORTLAB)
+
+
+def to_html(trechos: Tuple[Trecho, ...]) -> str:
+    return _join(trechos, _xml_escape, _HTML)
@@ -0,0 +1,305 @@
+# scripts/metrics.py
+# -*- coding: utf-8 -*-
+"""
+Histórico local de desempenho da geração de relatórios (SQLite).
+Cada execução (interface, lote ou linha de comando) grava uma linha com os tempos
+por etapa do trace (scripts/tracing.py), tamanho do XML, número de movimentos,
+tokens de entrada/saída, modelo, versão do prompt e retentativas HTTP.
+O resumo mostra percentis (p50/p95) por etapa, por modelo/versão do prompt e a
+tendência por dia ou semana, para identificar regressões após trocas de modelo
+ou de template.
+
+Uso:
+    python -m scripts.metrics                    # últimos 30 dias
+    python -m scripts.metrics --dias 7 --por dia
+    python -m scripts.metrics --modelo google/gemini-2.5-flash --csv metricas.csv
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("RelatorioTJMS")
+
+# Atributos numéricos dos spans somados por execução (ver annotate() no pipeline)
+_SOMADOS = ("xml_chars", "movimentos", "decisoes", "prompt_tokens", "completion_tokens", "retentativas")
+
+COLUNAS = ["id", "criado_em", "processo", "origem", "modelo", "prompt_versao", "ok", "erro", "etapa_erro",
+           "total_s", "xml_chars", "movimentos", "decisoes", "prompt_tokens", "completion_tokens",
+           "tokens_estimados", "chamadas_llm", "retentativas", "cache_soap", "cache_llm", "etapas"]
+
+
+def metrics_from_trace(trace, origem: str, modelo: str, ok: bool, erro: Optional[BaseException] = None) -> Dict[str, Any]:
+    """Converte o trace de um relatório em uma linha de métricas."""
+    spans = trace.spans
+    m: Dict[str, Any] = {k: 0 for k in _SOMADOS}
+    m.update(criado_em=time.time(), processo=str(trace.attrs.get("processo", "")), origem=origem,
+             modelo=modelo, prompt_versao="", ok=ok, erro=f"{type(erro).__name__}: {erro}" if erro else "",
+             etapa_erro="", total_s=trace.duration(), tokens_estimados=False, chamadas_llm=0,
+             cache_soap=False, cache_llm=0)
+    ultimo_erro = None
+    for sp in spans:
+        attrs = sp["attrs"]
+        for k in _SOMADOS:
+            if isinstance(attrs.get(k), (int, float)):
+                m[k] += attrs[k]
+        if attrs.get("prompt_versao"):
+            m["prompt_versao"] = attrs["prompt_versao"]
+        if attrs.get("tokens_estimados"):
+            m["tokens_estimados"] = True
+        if sp["name"] == "call_openrouter" and "prompt_tokens" in attrs:
+            # Só as chamadas que chegaram ao OpenRouter (respostas do cache não contam)
+            m["chamadas_llm"] += 1
+        elif sp["name"] == "cache.soap" and attrs.get("hit"):
+            m["cache_soap"] = True
+        elif sp["name"] == "cache.llm" and attrs.get("hit"):
+            m["cache_llm"] += 1
+        # O span com erro que começou por último é o mais interno (onde a falha ocorreu)
+        if "erro" in attrs and (ultimo_erro is None or sp["start"] >= ultimo_erro["start"]):
+            ultimo_erro = sp
+    if ultimo_erro is not None and not ok:
+        m["etapa_erro"] = ultimo_erro["name"]
+    m["etapas"] = {nome: round(t["segundos"], 4) for nome, t in trace.totals().items()}
+    return m
+
+
+class MetricsStore:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self) -> sqlite3.Connection:
+        # Conexão curta por operação, como no cache da LLM: gravada por várias threads
+        if not self._initialized:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=10)
+        if not self._initialized:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS execucoes (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    criado_em REAL NOT NULL,
+                    processo TEXT NOT NULL,
+                    origem TEXT NOT NULL,
+                    modelo TEXT NOT NULL,
+                    prompt_versao TEXT NOT NULL,
+                    ok INTEGER NOT NULL,
+                    erro TEXT NOT NULL,
+                    etapa_erro TEXT NOT NULL,
+                    total_s REAL NOT NULL,
+                    xml_chars INTEGER NOT NULL,
+                    movimentos INTEGER NOT NULL,
+                    decisoes INTEGER NOT NULL,
+                    prompt_tokens INTEGER NOT NULL,
+                    completion_tokens INTEGER NOT NULL,
+                    tokens_estimados INTEGER NOT NULL,
+                    chamadas_llm INTEGER NOT NULL,
+                    retentativas INTEGER NOT NULL,
+                    cache_soap INTEGER NOT NULL,
+                    cache_llm INTEGER NOT NULL,
+                    etapas TEXT NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_execucoes_data ON execucoes(criado_em)")
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def record(self, m: Dict[str, Any]):
+        valores = [json.dumps(m[c], ensure_ascii=False) if c == "etapas" else m[c] for c in COLUNAS[1:]]
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute(f"INSERT INTO execucoes ({', '.join(COLUNAS[1:])}) "
+                             f"VALUES ({', '.join('?' * len(valores))})", valores)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def rows(self, desde: Optional[float] = None, modelo: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Execuções (mais antigas primeiro), opcionalmente a partir de `desde` (epoch) e de um modelo."""
+        sql = f"SELECT {', '.join(COLUNAS)} FROM execucoes WHERE 1=1"
+        params: List[Any] = []
+        if desde is not None:
+            sql += " AND criado_em >= ?"
+            params.append(desde)
+        if modelo:
+            sql += " AND modelo = ?"
+            params.append(modelo)
+        sql += " ORDER BY criado_em"
+        if not os.path.exists(self.db_path):
+            return []
+        with self._lock:
+            conn = self._connect()
+            try:
+                resultado = [dict(zip(COLUNAS, row)) for row in conn.execute(sql, params)]
+            finally:
+                conn.close()
+        for r in resultado:
+            r["etapas"] = json.loads(r["etapas"] or "{}")
+        return resultado
+
+
+def export_csv(rows: Iterable[Dict[str, Any]], path: str):
+    """Grava as execuções em CSV (;), com uma coluna por etapa do trace."""
+    rows = list(rows)
+    etapas = sorted({nome for r in rows for nome in r["etapas"]})
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        w = csv.writer(f, delimiter=";")
+        w.writerow(COLUNAS[:-1] + [f"etapa_{e}_s" for e in etapas])
+        for r in rows:
+            linha = [r[c] for c in COLUNAS[:-1]]
+            linha[1] = datetime.fromtimestamp(r["criado_em"]).strftime("%Y-%m-%d %H:%M:%S")
+            w.writerow(linha + [r["etapas"].get(e, "") for e in etapas])
+
+
+def percentile(valores: List[float], p: float) -> float:
+    """Percentil com interpolação linear (p entre 0 e 100)."""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    pos = (len(ordenados) - 1) * p / 100
+    base = int(pos)
+    if base + 1 >= len(ordenados):
+        return ordenados[-1]
+    return ordenados[base] + (ordenados[base + 1] - ordenados[base]) * (pos - base)
+
+
+def _linha_percentis(rotulo: str, valores: List[float], fmt: str = "{:.2f}") -> str:
+    return (f"  {rotulo:<28} n={len(valores):<5} p50={fmt.format(percentile(valores, 50)):>9} "
+            f"p95={fmt.format(percentile(valores, 95)):>9} máx={fmt.format(max(valores)):>9}")
+
+
+def _periodo(ts: float, por: str) -> str:
+    d = datetime.fromtimestamp(ts)
+    if por == "dia":
+        return d.strftime("%Y-%m-%d")
+    ano, semana, _ = d.isocalendar()
+    return f"{ano}-S{semana:02d}"
+
+
+def format_summary(rows: List[Dict[str, Any]], por: str = "semana") -> str:
+    """Resumo em texto (percentis por etapa, por modelo/prompt e tendência por período)."""
+    if not rows:
+        return "Nenhuma execução registrada no período."
+    ok = [r for r in rows if r["ok"]]
+    falhas = [r for r in rows if not r["ok"]]
+    inicio = datetime.fromtimestamp(rows[0]["criado_em"]).strftime("%d/%m/%Y")
+    fim = datetime.fromtimestamp(rows[-1]["criado_em"]).strftime("%d/%m/%Y")
+    out = [f"Execuções: {len(rows)} ({inicio} a {fim}) — {len(ok)} OK, {len(falhas)} com falha "
+           f"({100 * len(falhas) / len(rows):.1f}%)"]
+
+    if falhas:
+        por_etapa: Dict[str, int] = {}
+        for r in falhas:
+            chave = r["etapa_erro"] or "(fora das etapas)"
+            por_etapa[chave] = por_etapa.get(chave, 0) + 1
+        out.append("Falhas por etapa: " + ", ".join(f"{k} {v}" for k, v in
+                                                     sorted(por_etapa.items(), key=lambda kv: -kv[1])))
+    retentativas = sum(r["retentativas"] for r in rows)
+    out.append(f"Retentativas HTTP: {retentativas} (em {sum(1 for r in rows if r['retentativas'])} execuções); "
+               f"cache TJ-MS: {sum(1 for r in rows if r['cache_soap'])}, cache LLM: "
+               f"{sum(1 for r in rows if r['cache_llm'])}")
+
+    if ok:
+        out.append("")
+        out.append("Tempos por etapa (s, execuções OK):")
+        out.append(_linha_percentis("total", [r["total_s"] for r in ok]))
+        etapas: Dict[str, List[float]] = {}
+        for r in ok:
+            for nome, seg in r["etapas"].items():
+                etapas.setdefault(nome, []).append(seg)
+        for nome, valores in etapas.items():
+            if nome != "full_flow":
+                out.append(_linha_percentis(nome, valores))
+
+        out.append("")
+        out.append("Volume (execuções OK):")
+        for campo, rotulo in (("xml_chars", "XML (caracteres)"), ("movimentos", "movimentos")):
+            out.append(_linha_percentis(rotulo, [r[campo] for r in ok], "{:.0f}"))
+        # Tokens só das execuções que chamaram a LLM (respostas do cache não consomem tokens)
+        com_llm = [r for r in ok if r["chamadas_llm"]]
+        if com_llm:
+            out.append(_linha_percentis("tokens de entrada", [r["prompt_tokens"] for r in com_llm], "{:.0f}"))
+            out.append(_linha_percentis("tokens de saída", [r["completion_tokens"] for r in com_llm], "{:.0f}"))
+        if any(r["tokens_estimados"] for r in com_llm):
+            out.append("  (tokens estimados por caracteres quando o provedor não informou o uso)")
+
+        out.append("")
+        out.append("Por modelo / versão do prompt:")
+        grupos: Dict[tuple, List[Dict[str, Any]]] = {}
+        for r in rows:
+            grupos.setdefault((r["modelo"], r["prompt_versao"] or "-"), []).append(r)
+        for (modelo, versao), rs in grupos.items():
+            tot = [r["total_s"] for r in rs if r["ok"]] or [0.0]
+            out.append(f"  {modelo} [{versao}]: n={len(rs)} p50={percentile(tot, 50):.2f}s "
+                       f"p95={percentile(tot, 95):.2f}s falhas={sum(1 for r in rs if not r['ok'])} "
+                       f"tokens saída p50={percentile([r['completion_tokens'] for r in rs if r['chamadas_llm']] or [0], 50):.0f}")
+
+    out.append("")
+    out.append(f"Tendência por {por}:")
+    periodos: Dict[str, List[Dict[str, Any]]] = {}
+    for r in rows:
+        periodos.setdefault(_periodo(r["criado_em"], por), []).append(r)
+    for periodo, rs in periodos.items():
+        tot = [r["total_s"] for r in rs if r["ok"]] or [0.0]
+        falhas_p = sum(1 for r in rs if not r["ok"])
+        out.append(f"  {periodo}: n={len(rs):<4} p50={percentile(tot, 50):6.2f}s p95={percentile(tot, 95):6.2f}s "
+                   f"falhas={100 * falhas_p / len(rs):5.1f}%")
+    return "\n".join(out)
+
+
+_store: Optional[MetricsStore] = None
+
+
+def get_store() -> MetricsStore:
+    global _store
+    if _store is None:
+        import config
+        _store = MetricsStore(config.METRICS_DB)
+    return _store
+
+
+def record_run(trace, origem: str, modelo: str, ok: bool, erro: Optional[BaseException] = None):
+    """Grava as métricas de um relatório (AJG_METRICS=0 desativa). Falhas aqui nunca interrompem a geração."""
+    import config
+    if not config.METRICS_ENABLED or trace is None:
+        return
+    try:
+        get_store().record(metrics_from_trace(trace, origem, modelo, ok, erro))
+    except Exception as e:
+        logger.warning("Falha ao gravar métricas de desempenho: %s", e)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m scripts.metrics",
+                                     description="Resumo do histórico local de desempenho (percentis e tendência).")
+    parser.add_argument("--dias", type=int, default=30, help="Janela em dias (0 = tudo; padrão: 30)")
+    parser.add_argument("--modelo", help="Filtra por modelo")
+    parser.add_argument("--por", choices=("dia", "semana"), default="semana", help="Agrupamento da tendência")
+    parser.add_argument("--csv", metavar="ARQUIVO", help="Exporta as execuções da janela em CSV")
+    parser.add_argument("--db", help="Banco de métricas (padrão: AJG_METRICS_DB)")
+    args = parser.parse_args(argv)
+
+    store = MetricsStore(args.db) if args.db else get_store()
+    desde = time.time() - args.dias * 86400 if args.dias > 0 else None
+    rows = store.rows(desde=desde, modelo=args.modelo)
+    print(format_summary(rows, por=args.por))
+    if args.csv:
+        export_csv(rows, args.csv)
+        print(f"\n{len(rows)} execuções exportadas para {args.csv}")
+    return 0
+
+
+if __name__ == "__main__":
+    # Permite executar também como "python scripts/metrics.py"
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    sys.exit(main())
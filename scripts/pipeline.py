@@ -0,0 +1,1130 @@
+# scripts/pipeline.py
+# -*- coding: utf-8 -*-
+"""
+Núcleo do pipeline do RelatorioTJMS (sem dependência de interface gráfica):
+validação do CNJ, consulta SOAP ao TJ-MS, parser do XML, montagem do prompt
+e cliente OpenRouter. Usado pela UI (main_exe.py) e pelo processamento em lote.
+"""
+
+import os
+import re
+import json
+import html
+import hashlib
+import time
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Tuple, List, Dict, Any, Optional, Callable, Iterator
+
+import requests
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+
+import config
+from config import (
+    TJ_WSDL_URL, TJ_WS_USER, TJ_WS_PASS,
+    OPENROUTER_ENDPOINT, DEFAULT_MODEL,
+    STRICT_CNJ_CHECK, CLASSES_CUMPRIMENTO, NS,
+    CACHE_DIR, SOAP_CACHE_ENABLED, SOAP_CACHE_TTL_SECONDS, SOAP_CACHE_MAX_MB,
+    LLM_CACHE_ENABLED, LLM_CACHE_MAX_AGE_SECONDS, LLM_CACHE_MAX_MB,
+    PREFILTER_ENABLED, PREFILTER_COMPLEMENTO_MAX_CHARS
+)
+from scripts.soap_cache import SoapCache
+from scripts.llm_cache import LLMCache
+from scripts.http_client import get_session, retry_count
+from scripts.prefilter import prefilter_dados
+from scripts.evidence_format import format_evidence, format_decision, evidence_label
+from scripts.tracing import span, traced, annotate
+from scripts.recording import recording_enabled, record_soap, record_llm
+
+# =========================
+# Logging (terminal)
+# =========================
+logger = logging.getLogger("RelatorioTJMS")
+# A interface importa este módulo depois de abrir a janela: não desfazer o nível já escolhido
+if logger.level == logging.NOTSET:
+    logger.setLevel(logging.INFO)
+_ch = logging.StreamHandler()
+_ch.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
+logger.addHandler(_ch)
+
+# =========================
+# Utilitários gerais
+# =========================
+def make_session() -> requests.Session:
+    """Sessão compartilhada (pool keep-alive) para o web service do TJ-MS."""
+    return get_session(TJ_WSDL_URL)
+
+def only_digits(s: str) -> str:
+    return re.sub(r"\D", "", s or "")
+
+def format_cnj(num: str) -> str:
+    d = only_digits(num)
+    if len(d) != 20:
+        return num
+    return f"{d[0:7]}-{d[7:9]}.{d[9:13]}.{d[13:14]}.{d[14:16]}.{d[16:20]}"
+
+def cnj_checksum_ok(d: str) -> bool:
+    # Checagem simplificada (se quiser, troque pelo algoritmo 97-10 completo)
+    if len(d) != 20 or not d.isdigit():
+        return False
+    ano = int(d[9:13])
+    return 1900 <= ano <= datetime.now().year + 1
+
+def validate_config() -> Tuple[bool, str]:
+    miss = []
+    if not TJ_WSDL_URL: miss.append("TJ_WSDL_URL")
+    if not TJ_WS_USER:  miss.append("TJ_WS_USER")
+    if not TJ_WS_PASS:  miss.append("TJ_WS_PASS")
+    # Permite placeholder durante build/desenvolvimento
+    # Lida do módulo config para refletir chaves reconfiguradas em tempo de execução
+    if not config.OPENROUTER_API_KEY or config.OPENROUTER_API_KEY == "SUA_CHAVE_AQUI":
+        miss.append("OPENROUTER_API_KEY")
+    if miss:
+        return False, "Variáveis ausentes no config.py: " + ", ".join(miss)
+    return True, "OK"
+
+def validate_cnj(num: str) -> Tuple[bool, str, str]:
+    d = only_digits(num)
+    if len(d) != 20:
+        return False, d, "Número CNJ deve conter 20 dígitos (com ou sem pontuação)."
+    if STRICT_CNJ_CHECK and not cnj_checksum_ok(d):
+        return False, d, "Dígito/verificação do CNJ inválido (STRICT_CNJ_CHECK=True)."
+    return True, d, "OK"
+
+def build_soap_envelope(numero_processo: str, movimentos=True, incluir_docs=False, debug=False) -> str:
+    """Envelope SOAP consultarProcesso (compartilhado pelos clientes síncrono e assíncrono)."""
+    envelope = f"""
+    <soapenv:Envelope xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/"
+                      xmlns:ser="http://www.cnj.jus.br/servico-intercomunicacao-2.2.2/"
+                      xmlns:tip="http://www.cnj.jus.br/tipos-servico-intercomunicacao-2.2.2">
+        <soapenv:Header/>
+        <soapenv:Body>
+            <ser:consultarProcesso>
+                <tip:idConsultante>{html.escape(TJ_WS_USER)}</tip:idConsultante>
+                <tip:senhaConsultante>{html.escape(TJ_WS_PASS)}</tip:senhaConsultante>
+                <tip:numeroProcesso>{html.escape(numero_processo)}</tip:numeroProcesso>
+                <tip:movimentos>{"true" if movimentos else "false"}</tip:movimentos>
+                <tip:incluirDocumentos>{"true" if incluir_docs else "false"}</tip:incluirDocumentos>
+            </ser:consultarProcesso>
+        </soapenv:Body>
+    </soapenv:Envelope>
+    """.strip()
+    if debug:
+        # Mascarar credenciais no log para segurança
+        envelope_log = envelope.replace(TJ_WS_USER, "***USER***").replace(TJ_WS_PASS, "***PASS***")
+        logger.debug("SOAP request: %s", envelope_log)
+    return envelope
+
+@traced("soap_consultar_processo")
+def soap_consultar_processo(session: requests.Session, numero_processo: str, timeout=90,
+                            movimentos=True, incluir_docs=False, debug=False) -> str:
+    """
+    Chama o serviço SOAP consultarProcesso e retorna o XML (texto).
+    """
+    envelope = build_soap_envelope(numero_processo, movimentos, incluir_docs, debug)
+    inicio = time.perf_counter()
+    r = session.post(TJ_WSDL_URL, data=envelope, timeout=timeout)
+    annotate(retentativas=retry_count(r))
+    r.raise_for_status()
+    if recording_enabled():
+        record_soap(numero_processo, envelope, r.text, time.perf_counter() - inicio)
+    return r.text
+
+_soap_cache = SoapCache(os.path.join(CACHE_DIR, "soap"), ttl_seconds=SOAP_CACHE_TTL_SECONDS,
+                        max_bytes=SOAP_CACHE_MAX_MB * 1024 * 1024)
+
+def consultar_processo(session: requests.Session, numero_processo: str, timeout=90,
+                       movimentos=True, incluir_docs=False, debug=False, use_cache=True) -> str:
+    """
+    soap_consultar_processo com cache local em disco (ver scripts/soap_cache.py).
+    use_cache=False força nova consulta ao TJ-MS (e atualiza o cache).
+    """
+    use_cache = use_cache and SOAP_CACHE_ENABLED
+    if use_cache:
+        with span("cache.soap") as sp:
+            xml_text = _soap_cache.get(numero_processo, movimentos, incluir_docs)
+            if sp is not None:
+                sp["hit"] = xml_text is not None
+        if xml_text is not None:
+            logger.info("XML obtido do cache local (%d chars).", len(xml_text))
+            return xml_text
+
+    xml_text = soap_consultar_processo(session, numero_processo, timeout=timeout, movimentos=movimentos,
+                                       incluir_docs=incluir_docs, debug=debug)
+    store_soap_response(numero_processo, xml_text, movimentos, incluir_docs)
+    return xml_text
+
+def store_soap_response(numero_processo: str, xml_text: str, movimentos=True, incluir_docs=False):
+    # Só guarda respostas com dados do processo (não guarda falhas/processo inexistente)
+    if SOAP_CACHE_ENABLED and "dadosBasicos" in xml_text:
+        _soap_cache.put(numero_processo, xml_text, movimentos, incluir_docs)
+
+def _text_of(elem: ET.Element) -> str:
+    return (elem.text or "").strip() if elem is not None and elem.text else ""
+
+def _pretty_esaj_dt(esaj_dt_str: str) -> str:
+    if not esaj_dt_str:
+        return esaj_dt_str
+    m = re.match(r"^(\d{4})(\d{2})(\d{2})(\d{2})(\d{2})(\d{2})$", esaj_dt_str)
+    if m:
+        try:
+            dt = datetime(*map(int, m.groups()))
+            return dt.strftime("%Y-%m-%d %H:%M:%S")
+        except Exception:
+            pass
+    return esaj_dt_str
+
+_APENSO_HINTS = (" apenso", " apensad", " apensamento")
+
+def has_apenso_hint(xml_text: str) -> bool:
+    t = xml_text.casefold()
+    return (" apenso" in t) or (" apensad" in t) or (" apensamento" in t)
+
+class _ApensoHintScanner:
+    """Equivalente incremental de has_apenso_hint: procura os indícios bloco a bloco."""
+
+    _OVERLAP = max(len(h) for h in _APENSO_HINTS) - 1
+
+    def __init__(self):
+        self.found = False
+        self._carry = ""
+
+    def feed(self, chunk: str):
+        if self.found:
+            return
+        t = self._carry + chunk.casefold()
+        if any(h in t for h in _APENSO_HINTS):
+            self.found = True
+            return
+        # Mantém o final do bloco para indícios que cruzem a fronteira entre blocos
+        self._carry = t[-self._OVERLAP:]
+
+# ========= helpers do parser robusto (ignorando namespaces quando útil) =========
+def _tagname(e: ET.Element) -> str:
+    return e.tag.split('}')[-1] if isinstance(e.tag, str) else str(e)
+
+def _iter_desc_elems(elem: ET.Element, name_endswith: str):
+    """Itera descendentes cujo tag (sem ns) termina com name_endswith (case-insensitive)."""
+    t = name_endswith.lower()
+    for e in elem.iter():
+        if _tagname(e).lower().endswith(t):
+            yield e
+
+def _all_texts(elem: ET.Element, name_endswith: str) -> List[str]:
+    """Coleta todos os textos de nós cujo tag termina com name_endswith."""
+    out: List[str] = []
+    for e in _iter_desc_elems(elem, name_endswith):
+        if e.text and e.text.strip():
+            out.append(e.text.strip())
+    return out
+
+# =========================
+# Parser do XML (robusto)
+# =========================
+# Acima deste tamanho (caracteres) parse_xml_processo usa o parser incremental
+STREAM_PARSE_MIN_CHARS = 1_000_000
+
+_NS2 = "{%s}" % NS["ns2"]
+_TAG_DADOS_BASICOS = _NS2 + "dadosBasicos"
+_TAG_POLO = _NS2 + "polo"
+_TAG_MOVIMENTO = _NS2 + "movimento"
+
+def _new_dados() -> Dict[str, Any]:
+    return {
+        "classeProcessual": None,
+        "cumprimento": False,
+        "possivel_apenso": False,
+        "partes": {"AT": [], "PA": []},
+        "decisoes": []
+    }
+
+def _extract_dados_basicos(dados_basicos: ET.Element, data: Dict[str, Any]):
+    cls = dados_basicos.attrib.get("classeProcessual")
+    data["classeProcessual"] = cls
+    data["cumprimento"] = (cls in CLASSES_CUMPRIMENTO)
+
+def _extract_polo(polo_node: ET.Element, data: Dict[str, Any]):
+    polo = polo_node.attrib.get("polo")
+    if polo not in ("AT", "PA"):
+        return
+    for parte in polo_node.findall("ns2:parte", NS):
+        ajg = (parte.attrib.get("assistenciaJudiciaria", "").lower() == "true")
+        pessoa = parte.find("ns2:pessoa", NS)
+        if pessoa is not None:
+            nome = pessoa.attrib.get("nome")
+            if nome:
+                data["partes"][polo].append({"nome": nome, "assistenciaJudiciaria": ajg})
+
+_TAG_MOVIMENTO_LOCAL = _NS2 + "movimentoLocal"
+_TAG_MOVIMENTO_LOCAL_PAI = _NS2 + "movimentoLocalPai"
+
+# Classificação por tag (sem namespace, minúscula) calculada uma vez por nome de tag:
+# tag -> (é descrição, é complemento), mesmas regras de _all_texts(..., "descricao"/"complemento")
+_TAG_KIND_CACHE: Dict[str, Tuple[bool, bool]] = {}
+
+def _tag_kind(tag) -> Tuple[bool, bool]:
+    kind = _TAG_KIND_CACHE.get(tag)
+    if kind is None:
+        if isinstance(tag, str):
+            local = tag.rsplit('}', 1)[-1].lower()
+            kind = (local.endswith("descricao"), local.endswith("complemento"))
+        else:
+            kind = (False, False)
+        _TAG_KIND_CACHE[tag] = kind
+    return kind
+
+def _extract_movimento(mov: ET.Element, stats: Dict[str, int]) -> Optional[Dict[str, Any]]:
+    """
+    Extrai um movimento; retorna None se não tiver descrição. Atualiza os contadores em stats.
+    Percorre a subárvore do movimento uma única vez (códigos de fallback, descrições e
+    complementos na mesma passada), com os nomes de tag classificados via cache.
+    """
+    # Códigos e descrições podem aparecer em movimentoLocal e/ou movimentoLocalPai (filhos diretos)
+    cods: List[str] = []
+    descrs: List[str] = []
+
+    for ml in mov:
+        if ml.tag != _TAG_MOVIMENTO_LOCAL:
+            continue
+        c = ml.get("codigoPaiNacional")
+        if c:
+            cods.append(c)
+        dsc = ml.get("descricao")
+        if dsc:
+            descrs.append(dsc)
+
+        for mlp in ml:
+            if mlp.tag != _TAG_MOVIMENTO_LOCAL_PAI:
+                continue
+            cp = mlp.get("codigoPaiNacional")
+            if cp:
+                cods.append(cp)
+            dp = mlp.get("descricao")
+            if dp:
+                descrs.append(dp)
+
+    # Passada única pela subárvore
+    any_cods: List[str] = []
+    desc_texts: List[str] = []
+    complementos: List[str] = []
+    kind_cache = _TAG_KIND_CACHE
+    for node in mov.iter():
+        cp = node.get("codigoPaiNacional")
+        if cp is not None:
+            any_cods.append(cp)
+        kind = kind_cache.get(node.tag) or _tag_kind(node.tag)
+        is_desc, is_compl = kind
+        if is_desc or is_compl:
+            text = node.text
+            if text and text.strip():
+                text = text.strip()
+                if is_desc:
+                    desc_texts.append(text)
+                if is_compl:
+                    complementos.append(text)
+
+    # Fallback: qualquer nó com atributo codigoPaiNacional
+    if not cods:
+        cods = any_cods
+
+    if cods:
+        stats["com_codigo"] += 1
+
+    # MUDANÇA: Agora coleta TODOS os movimentos que tenham descrição
+    # Prioriza códigos 3 (decisão) e 11009 (despacho), mas inclui todos
+    # A filtragem para perícia será feita no prompt LLM
+    if not descrs:
+        descrs = desc_texts
+
+    # Só adiciona se tiver descrição (para não poluir com movimentos vazios)
+    if not descrs:
+        return None
+
+    stats["com_descricao"] += 1
+
+    return {
+        "codigoPaiNacional": cods[0] if cods else None,
+        "descricao": descrs[0],
+        "dataHora": _pretty_esaj_dt(mov.get("dataHora")),
+        "complemento": "\n---\n".join(complementos) if complementos else ""
+    }
+
+@traced("parse_xml_processo")
+def parse_xml_processo(xml_text: str) -> Dict[str, Any]:
+    """
+    Extrai:
+      - classeProcessual (+ flag cumprimento)
+      - partes AT/PA (nome + assistenciaJudiciaria)
+      - decisões / despachos: codigoPaiNacional = 3 (decisão) ou 11009 (despacho)
+          * aceita código em movimentoLocal e/ou movimentoLocalPai
+          * coleta TODOS os <...:complemento> desse movimento
+      - possivel_apenso: heurística textual
+    XMLs grandes são delegados a parse_xml_processo_stream (mesmo resultado).
+    """
+    annotate(xml_chars=len(xml_text))
+    if len(xml_text) >= STREAM_PARSE_MIN_CHARS:
+        return parse_xml_processo_stream(xml_text)
+
+    root = ET.fromstring(xml_text)
+    data = _new_dados()
+    data["possivel_apenso"] = has_apenso_hint(xml_text)
+
+    # Classe processual
+    dados_basicos = root.find(".//ns2:dadosBasicos", NS)
+    if dados_basicos is not None:
+        _extract_dados_basicos(dados_basicos, data)
+
+    # Partes por polo
+    for polo_node in root.findall(".//ns2:polo", NS):
+        _extract_polo(polo_node, data)
+
+    # Movimentos - AGORA COLETA TODOS OS MOVIMENTOS COM DESCRIÇÃO
+    movimentos = root.findall(".//ns2:movimento", NS)
+    logger.debug("Total de movimentos no XML: %d", len(movimentos))
+
+    stats = {"com_codigo": 0, "com_descricao": 0}
+    for mov in movimentos:
+        decisao = _extract_movimento(mov, stats)
+        if decisao is not None:
+            data["decisoes"].append(decisao)
+
+    annotate(movimentos=len(movimentos), decisoes=len(data["decisoes"]))
+    logger.info("Movimentos com algum codigoPaiNacional: %d", stats["com_codigo"])
+    logger.info("Movimentos com descrição coletados: %d", stats["com_descricao"])
+    return data
+
+def parse_xml_processo_stream(source, chunk_size: int = 1 << 16) -> Dict[str, Any]:
+    """
+    Versão incremental de parse_xml_processo (mesmo dict de saída), para históricos grandes.
+    `source` pode ser o XML (str/bytes) ou um iterável de blocos (ex.: resposta HTTP em stream).
+    Faz uma única passada: polos e movimentos são extraídos no evento de fechamento e
+    descartados em seguida, os demais nós são limpos assim que fecham e o indício de
+    apenso é procurado bloco a bloco, sem árvore completa nem cópia casefold do XML.
+    """
+    if isinstance(source, (str, bytes)):
+        chunks = (source[i:i + chunk_size] for i in range(0, len(source), chunk_size))
+    else:
+        chunks = source
+
+    data = _new_dados()
+    scanner = _ApensoHintScanner()
+    stats = {"com_codigo": 0, "com_descricao": 0}
+    total_movimentos = 0
+    seen_dados_basicos = False
+
+    parser = ET.XMLPullParser(events=("start", "end"))
+    stack: List[ET.Element] = []
+    keep_depth = 0  # quantos polos/movimentos abertos: seus descendentes não podem ser limpos ainda
+
+    def drain():
+        nonlocal keep_depth, total_movimentos, seen_dados_basicos
+        for event, elem in parser.read_events():
+            tag = elem.tag
+            if event == "start":
+                stack.append(elem)
+                if tag == _TAG_POLO or tag == _TAG_MOVIMENTO:
+                    keep_depth += 1
+                elif tag == _TAG_DADOS_BASICOS and not seen_dados_basicos:
+                    # Os atributos já estão disponíveis no evento de abertura
+                    seen_dados_basicos = True
+                    _extract_dados_basicos(elem, data)
+                continue
+
+            stack.pop()
+            if tag == _TAG_POLO or tag == _TAG_MOVIMENTO:
+                keep_depth -= 1
+                if tag == _TAG_POLO:
+                    _extract_polo(elem, data)
+                else:
+                    total_movimentos += 1
+                    decisao = _extract_movimento(elem, stats)
+                    if decisao is not None:
+                        data["decisoes"].append(decisao)
+                elem.clear()
+                if stack:
+                    stack[-1].remove(elem)
+            elif keep_depth == 0:
+                elem.clear()
+
+    for chunk in chunks:
+        if isinstance(chunk, bytes):
+            # O indício é textual; bytes UTF-8 inválidos no meio de um caractere são ignorados
+            scanner.feed(chunk.decode("utf-8", errors="ignore"))
+        else:
+            scanner.feed(chunk)
+        parser.feed(chunk)
+        drain()
+    parser.close()
+    drain()
+
+    data["possivel_apenso"] = scanner.found
+    annotate(movimentos=total_movimentos, decisoes=len(data["decisoes"]))
+    logger.debug("Total de movimentos no XML: %d", total_movimentos)
+    logger.info("Movimentos com algum codigoPaiNacional: %d", stats["com_codigo"])
+    logger.info("Movimentos com descrição coletados: %d", stats["com_descricao"])
+    return data
+
+# =========================
+# Prompt atualizado para LLM
+# =========================
+@traced("build_messages_for_llm")
+def build_messages_for_llm(numero_cnj_fmt: str, dados: dict, formato: Optional[str] = None) -> list:
+    formato = formato or config.PROMPT_EVIDENCE_FORMAT
+    resumo_json = format_evidence(dados, formato)
+
+    sys = (
+        "Você é um assistente especializado em análise processual. "
+        "Produza um RELATÓRIO claro, objetivo e formal, em linguagem própria da prática forense. "
+        "IMPORTANTE: Responda SEMPRE em português brasileiro, utilizando a norma culta da língua portuguesa. "
+
+        "REGRA CRÍTICA: Todo nome de pessoa/parte deve ter **asteriscos duplos** em volta. "
+        "Evite termos técnicos de programação (como true/false, AT/PA). "
+        "Use expressões jurídicas completas, como 'polo ativo' e 'polo passivo'. "
+        "Ao tratar de prazos, indique se o pagamento é imediato ou ao final do processo. "
+        "Não escreva Tribunal de Justiça por extenso, apenas TJ-MS."
+    )
+
+    user = f"""
+<contexto>
+Processo: {numero_cnj_fmt}
+
+{evidence_label(formato)}:
+{resumo_json}
+</contexto>
+
+<tarefas>
+
+1. **Identificação das Partes**
+   - Apresente as partes separadas por polo processual, utilizando "polo ativo" e "polo passivo".
+   - OBRIGATÓRIO: Para cada parte, coloque o nome entre **asteriscos duplos** seguido de dois pontos.
+   - Indique, em linguagem natural, se cada parte consta no sistema do TJ-MS como beneficiária da justiça gratuita.
+   - Formato obrigatório: **Nome da Parte**: Consta no sistema como beneficiária da justiça gratuita.
+   - Exemplo EXATO: **Maria da Silva**: Consta no sistema do TJ-MS como beneficiária da justiça gratuita.
+   - Exemplo EXATO: **João Santos**: Não consta no sistema do TJ-MS como beneficiário da justiça gratuita.
+
+2. **Confirmação da Gratuidade da Justiça**
+   - Esclareça, para cada parte, se o sistema do TJ-MS indica a gratuidade da justiça.
+   - Verifique se há decisão nos autos que conceda a gratuidade e transcreva o trecho relevante entre aspas.
+   - **IMPORTANTE - IDENTIFICAÇÃO DO BENEFICIÁRIO:**
+     * Analise CUIDADOSAMENTE a descrição de cada decisão/despacho para identificar QUEM é o beneficiário da justiça gratuita.
+     * Procure por nomes específicos, termos como "parte autora", "requerente", "autor", "réu", "executado", etc.
+     * Se a decisão mencionar nome específico de uma parte (ex: "Defiro a gratuidade a João da Silva"), associe ao nome correspondente no polo processual.
+     * Se a decisão usar termo genérico mas houver apenas UMA parte naquele polo (ex: "Defiro ao autor" e só há um autor), associe àquela parte específica.
+     * Se a decisão usar termo genérico e houver MÚLTIPLAS partes no polo (ex: "Defiro aos autores" e há 3 autores), considere que TODAS as partes daquele polo foram beneficiadas.
+     * Se houver DÚVIDA sobre quem é o beneficiário, indique explicitamente no relatório: "⚠️ REVISÃO NECESSÁRIA: Não foi possível identificar com certeza qual parte foi beneficiada por esta decisão. Verificar manualmente."
+   - Diferencie expressamente:
+     (a) quando o sistema aponta gratuidade mas não há decisão confirmatória;
+     (b) quando existe decisão judicial concedendo a gratuidade com beneficiário claramente identificado;
+     (c) quando existe decisão judicial mas o beneficiário é ambíguo ou incerto;
+     (d) quando não se identificam elementos.
+   - Para cada parte, use o formato: **Nome da Parte**: [informação sobre gratuidade do sistema] + [informação sobre decisão judicial com identificação do beneficiário].
+   - Exemplos de saída esperada:
+     * "**João da Silva**: Consta no sistema como beneficiário. Decisão confirmatória identificou especificamente esta parte como beneficiária: 'Defiro a gratuidade ao autor João da Silva' (Despacho, 01/01/2023)."
+     * "**Maria Santos**: Consta no sistema como beneficiária. Decisão deferindo gratuidade, mas ⚠️ REVISÃO NECESSÁRIA: o texto não especifica qual dos autores foi beneficiado."
+     * "**Pedro Oliveira**: Não consta no sistema. Há decisão deferindo gratuidade 'aos autores', mas há 3 autores no processo. ⚠️ REVISÃO NECESSÁRIA: confirmar se esta parte específica foi beneficiada."
+
+3. **Análise das Decisões sobre Perícia**
+   - Analise EXCLUSIVAMENTE as decisões e despachos que tratam de perícia, incluindo designação, nomeação de peritos, arbitramento de honorários periciais, ou determinações relacionadas à prova pericial.
+   - Se não houver nenhuma decisão ou despacho tratando de perícia, informe claramente: "Não há decisões ou despachos tratando de perícia nos autos analisados."
+   - Para cada decisão pericial encontrada, indique:
+     * Se houve designação de perícia (Sim/Não)
+     * O valor arbitrado para honorários periciais, quando existente (ex: R$ 500,00)
+     * Quem deve arcar com o pagamento dos honorários (autor, réu, Estado ou outra forma)
+     * O momento do pagamento: se imediato ou ao final do processo
+     * Transcreva o trecho relevante da decisão entre aspas
+   - Realize a análise de conformidade com a TABELA de honorários periciais transcrita abaixo:
+     - Considere que o juiz pode ultrapassar o limite em até 5 vezes, desde que fundamentado.
+     - Classifique o valor como:
+       (a) dentro da tabela;
+       (b) acima da tabela, mas dentro do limite de 5 vezes com fundamentação;
+       (c) acima do limite permitido;
+       (d) não identificado.
+     - Ao concluir, escreva obrigatoriamente:
+       "Análise realizada com base na Resolução CNJ n. 232/2016, conforme redação dada pelas Resoluções n. 326/2020, n. 545/2024 e n. 599/2024."
+
+4. **Apenso em cumprimento de sentença**
+   - Se o processo não for de cumprimento de sentença, mas houve indicação de apensamento, indique isso no relatório.
+   - Caso o processo seja de cumprimento de sentença e haja indícios de apensamento, finalize o relatório com a advertência:
+     "Aviso: Processo de cumprimento possivelmente apensado. Recomenda-se consulta ao processo originário para confirmar a concessão da justiça gratuita."
+</tarefas>
+
+<tabela_resolucao_232>
+Use a seguinte TABELA DE HONORÁRIOS como referência (valores máximos):
+
+1. Ciências Econômicas/Contábeis
+- Laudo em demanda de servidor(es) contra União/Estado/Município: R$ 300,00
+- Laudo revisional envolvendo negócios bancários até 4 contratos: R$ 370,00
+- Laudo revisional envolvendo negócios bancários acima de 4 contratos: R$ 630,00
+- Laudo em dissolução/liquidação de sociedades civis e mercantis: R$ 830,00
+- Outras: R$ 370,00
+
+2. Engenharia/Arquitetura
+- Avaliação de imóvel urbano (ABNT): R$ 430,00
+- Avaliação de imóvel rural (ABNT): R$ 530,00
+- Laudo estrutural/segurança de imóvel (ABNT): R$ 370,00
+- Avaliação de bens fungíveis/rural/urbano (ABNT): R$ 700,00
+- Ação Demarcatória: R$ 870,00
+- Laudo de insalubridade/periculosidade: R$ 370,00
+- Outras: R$ 370,00
+
+3. Medicina/Odontologia
+- Interdição/DNA: R$ 370,00
+- Danos físicos/estéticos: R$ 370,00
+- Outras: R$ 370,00
+
+4. Psicologia: R$ 300,00
+5. Serviço Social – Estudo social: R$ 300,00
+
+6. Outras especialidades
+- Avaliação comercial de bens imóveis: R$ 170,00
+- Avaliação comercial por corretor: R$ 330,00
+- Outras: R$ 300,00
+
+**Regra especial (§4º do art. 2º):** O juiz pode ultrapassar o limite fixado em até 5 vezes, desde que fundamentado.
+</tabela_resolucao_232>
+
+<instruções_de_formatação>
+- Estruture o relatório em seções numeradas.  
+- Utilize linguagem formal, como se fosse redigido por um assistente jurídico.  
+- Prefira construções como "consta no sistema", "há decisão judicial que defere", "não identificado nos autos".  
+- Evite linguagem técnica de programação.  
+</instruções_de_formatação>
+
+<formato_de_saida>
+A resposta deve ser redigida em **Markdown**, no formato de relatório jurídico estruturado em seções numeradas:
+
+# Relatório - Processo XXXXXXX-XX.XXXX.X.XX.XXXX
+
+## 1. Partes, Polos Processuais e Gratuidade da Justiça
+- Apresente as partes separadas por polo processual ("polo ativo" e "polo passivo").
+- Para cada parte, coloque o nome entre **asteriscos duplos** seguido de dois pontos.
+- Informe, em linguagem natural:
+  (a) se consta no sistema do TJ-MS como beneficiária da justiça gratuita;
+  (b) se há decisão judicial confirmatória, transcrevendo o trecho relevante entre aspas E identificando SE POSSÍVEL qual parte específica foi beneficiada;
+  (c) se há dúvida sobre qual parte foi beneficiada, use o marcador "⚠️ REVISÃO NECESSÁRIA";
+  (d) se não há qualquer indicação.
+- **REGRA CRÍTICA DE IDENTIFICAÇÃO:**
+  * Se a decisão menciona nome específico, associe àquela parte.
+  * Se termo genérico com UMA parte no polo, associe àquela parte.
+  * Se termo genérico com MÚLTIPLAS partes no polo, considere todas beneficiadas.
+  * Se AMBÍGUO ou INCERTO, marque com "⚠️ REVISÃO NECESSÁRIA".
+
+**Formato obrigatório:**
+**Nome da Parte**: [informação do sistema do TJ-MS] + [informação sobre decisão judicial com identificação clara do beneficiário].
+
+**Exemplos de saída:**
+
+**Polo ativo:**
+- **Maria da Silva**: Consta no sistema do TJ-MS como beneficiária da justiça gratuita. Decisão confirmatória identificou especificamente esta parte: *"Defiro a gratuidade de justiça à autora Maria da Silva."* (Despacho, 01/01/2023).
+- **João Santos**: Consta no sistema como beneficiário da justiça gratuita. Há decisão deferindo gratuidade aos autores de forma genérica (há 2 autores). Considera-se que ambos foram beneficiados: *"Defiro aos autores."* (Despacho, 01/01/2023).
+- **Pedro Costa**: Consta no sistema como beneficiário. Há decisão deferindo gratuidade, mas ⚠️ REVISÃO NECESSÁRIA: o texto não especifica qual dos 3 autores foi beneficiado: *"Defiro ao primeiro requerente."* (Despacho, 05/01/2023).
+
+**Polo passivo:**
+- **Banco X S.A.**: Não consta no sistema nem há decisão sobre o tema.  
+
+## 2. Análise das Decisões sobre Perícia
+- Listar APENAS decisões e despachos relacionados à perícia em subtópicos (por data).
+- Se não houver decisões sobre perícia, informar: "Não há decisões ou despachos tratando de perícia nos autos analisados."
+- Para cada decisão pericial, informar:
+  - Designação de perícia (Sim/Não).
+  - Valor arbitrado para honorários periciais (em reais).
+  - Responsável pelo pagamento dos honorários (Estado/autor/réu).
+  - Momento do pagamento (imediato/ao final do processo).
+  - Trecho relevante da decisão entre aspas.
+
+**Exemplo de saída:**
+
+### Decisão de 01/01/2023
+- **Designação de perícia:** Sim.  
+- **Valor arbitrado:** R$ 1.500,00.  
+- **Responsável pelo pagamento:** Autor.  
+- **Momento do pagamento:** Ao final do processo.  
+- **Trecho da decisão:** *“Defiro a produção de prova pericial, a ser custeada ao final.”*  
+
+### Decisão de 10/02/2023
+- **Designação de perícia:** Não (indeferimento).
+- **Valor arbitrado:** —
+- **Responsável pelo pagamento:** —
+- **Momento do pagamento:** —
+- **Trecho da decisão:** *"Indefiro o pedido de prova pericial por considerar desnecessária."*  
+
+## 3. Processos Apensados
+- Caso aplicável, incluir o aviso sobre possível apensamento. 
+
+</formato_de_saida>
+
+"""
+    # Versão do template (hash das instruções): separa as métricas antes/depois de mudanças no prompt
+    annotate(prompt_versao=hashlib.sha1(sys.encode("utf-8")).hexdigest()[:8])
+    return [
+        {"role": "system", "content": sys},
+        {"role": "user", "content": user},
+    ]
+
+def estimate_tokens(text: str) -> int:
+    """Estimativa grosseira de tokens (~4 caracteres por token em português)."""
+    return (len(text) + 3) // 4
+
+@traced("prefilter")
+def apply_prefilter(dados: dict, prefilter: bool = PREFILTER_ENABLED, formato: Optional[str] = None) -> dict:
+    """
+    Aplica o pré-filtro de relevância aos movimentos e devolve os dados a enviar à LLM.
+    `dados` não é alterado; o filtro afeta apenas o que é enviado à LLM. A economia
+    logada é medida no mesmo formato de evidências usado no prompt.
+    """
+    if not prefilter:
+        return dados
+
+    formato = formato or config.PROMPT_EVIDENCE_FORMAT
+    filtrado, stats = prefilter_dados(dados, complemento_max_chars=PREFILTER_COMPLEMENTO_MAX_CHARS)
+    tokens_antes = estimate_tokens(format_evidence(dados, formato))
+    tokens_depois = estimate_tokens(format_evidence(filtrado, formato))
+    logger.info("Pré-filtro: %d de %d movimentos mantidos (%d completos, %d truncados, %d descartados); "
+                "~%d tokens economizados (%d -> %d).",
+                stats["completos"] + stats["truncados"], stats["total"], stats["completos"],
+                stats["truncados"], stats["descartados"], tokens_antes - tokens_depois,
+                tokens_antes, tokens_depois)
+    return filtrado
+
+def prepare_messages_for_llm(numero_cnj_fmt: str, dados: dict, prefilter: bool = PREFILTER_ENABLED,
+                             formato: Optional[str] = None) -> list:
+    """Aplica o pré-filtro de relevância aos movimentos e monta o prompt."""
+    return build_messages_for_llm(numero_cnj_fmt, apply_prefilter(dados, prefilter, formato), formato)
+
+def estimate_messages_tokens(messages: list) -> int:
+    """Estimativa de tokens de um prompt completo (conteúdo + overhead por mensagem)."""
+    return sum(estimate_tokens(m.get("content") or "") + 4 for m in messages)
+
+# =========================
+# Cliente OpenRouter (com fallback e logs)
+# =========================
+_llm_cache = LLMCache(os.path.join(CACHE_DIR, "llm_respostas.sqlite3"), max_age_seconds=LLM_CACHE_MAX_AGE_SECONDS,
+                      max_bytes=LLM_CACHE_MAX_MB * 1024 * 1024)
+
+class IncompleteStreamError(ConnectionError):
+    """O stream SSE terminou sem [DONE] (conexão encerrada no meio); a geração pode ser repetida."""
+
+class _SSEAccumulator:
+    """
+    Acumula os eventos SSE do OpenRouter linha a linha, repassando cada trecho de
+    'content' a on_delta; result() devolve um dict no formato da resposta sem stream
+    e levanta IncompleteStreamError se o [DONE] não chegou.
+    """
+
+    def __init__(self, on_delta: Callable[[str], None]):
+        self.on_delta = on_delta
+        self.content_parts: List[str] = []
+        self.reasoning_parts: List[str] = []
+        self.refusal_parts: List[str] = []
+        self.usage: Optional[Dict[str, Any]] = None
+        self.finish_reason: Optional[str] = None
+        self.done = False
+
+    def feed_line(self, line: str) -> bool:
+        """Processa uma linha; devolve False ao receber [DONE]."""
+        # Linhas vazias separam eventos; linhas ":" são comentários (keep-alive do OpenRouter)
+        if not line or line.startswith(":") or not line.startswith("data:"):
+            return True
+        data = line[5:].strip()
+        if data == "[DONE]":
+            self.done = True
+            return False
+        try:
+            chunk = json.loads(data)
+        except ValueError:
+            logger.debug("Evento SSE ignorado (JSON inválido): %s", data[:200])
+            return True
+        if chunk.get("error"):
+            raise RuntimeError(f"OpenRouter interrompeu a geração: {chunk['error']}")
+        if chunk.get("usage"):
+            # Contagem de tokens vem no último evento (payload "usage": {"include": true})
+            self.usage = chunk["usage"]
+        for choice in chunk.get("choices") or []:
+            delta = choice.get("delta") or {}
+            if delta.get("content"):
+                self.content_parts.append(delta["content"])
+                self.on_delta(delta["content"])
+            if delta.get("reasoning"):
+                self.reasoning_parts.append(delta["reasoning"])
+            if delta.get("refusal"):
+                self.refusal_parts.append(delta["refusal"])
+            if choice.get("finish_reason"):
+                self.finish_reason = choice["finish_reason"]
+        return True
+
+    def result(self) -> Dict[str, Any]:
+        if not self.done:
+            raise IncompleteStreamError(
+                f"Stream do OpenRouter encerrado antes do fim ({len(''.join(self.content_parts))} caracteres recebidos)")
+        message = {"content": "".join(self.content_parts), "reasoning": "".join(self.reasoning_parts)}
+        if self.refusal_parts:
+            message["refusal"] = "".join(self.refusal_parts)
+        j = {"choices": [{"message": message, "finish_reason": self.finish_reason}], "stream": True}
+        if self.usage:
+            j["usage"] = self.usage
+        return j
+
+def _read_sse_stream(r: requests.Response, on_delta: Callable[[str], None]) -> Dict[str, Any]:
+    """
+    Consome a resposta SSE (stream=True) do OpenRouter, repassando cada trecho de
+    'content' a on_delta, e devolve um dict no mesmo formato da resposta sem stream.
+    """
+    acc = _SSEAccumulator(on_delta)
+    # text/event-stream sem charset faria o requests assumir ISO-8859-1
+    r.encoding = "utf-8"
+    for line in r.iter_lines(decode_unicode=True):
+        if not acc.feed_line(line):
+            break
+    return acc.result()
+
+def openrouter_request(messages: list, model: str, temperature: float, stream: bool) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """Cabeçalhos e payload da chamada ao OpenRouter (compartilhados pelos clientes síncrono e assíncrono)."""
+    headers = {
+        "Authorization": f"Bearer {config.OPENROUTER_API_KEY}",
+        "Content-Type": "application/json",
+        "HTTP-Referer": "https://pge-ms.lab",
+        "X-Title": "Relatório TJMS",
+    }
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": 20000,
+    }
+    if stream:
+        payload["stream"] = True
+        payload["usage"] = {"include": True}
+    return headers, payload
+
+def llm_usage(j: Dict[str, Any], messages: list) -> Dict[str, Any]:
+    """
+    Tokens de entrada/saída de uma resposta do OpenRouter (campo usage), para as métricas.
+    Sem usage na resposta, estima por caracteres (tokens_estimados=True).
+    """
+    usage = j.get("usage") or {}
+    if usage.get("prompt_tokens") is not None:
+        return {"prompt_tokens": int(usage["prompt_tokens"]),
+                "completion_tokens": int(usage.get("completion_tokens") or 0)}
+    try:
+        message = j["choices"][0]["message"]
+        saida = (message.get("content") or "") + (message.get("reasoning") or "")
+    except (KeyError, IndexError, TypeError):
+        saida = ""
+    return {"prompt_tokens": estimate_messages_tokens(messages), "completion_tokens": estimate_tokens(saida),
+            "tokens_estimados": True}
+
+def get_cached_response(model: str, temperature: float, messages: list) -> Optional[str]:
+    with span("cache.llm") as sp:
+        cached = _llm_cache.get(model, temperature, messages)
+        if sp is not None:
+            sp["hit"] = cached is not None
+    if cached is not None:
+        logger.info("Resposta da LLM obtida do cache local (prompt idêntico).")
+    return cached
+
+@contextmanager
+def _gated(gate: Optional[threading.Semaphore], nome: str) -> Iterator[None]:
+    """Ocupa uma vaga de `gate` (se houver) enquanto o bloco roda; a espera aparece no trace como fila."""
+    if gate is None:
+        yield
+        return
+    with span(nome):
+        gate.acquire()
+    try:
+        yield
+    finally:
+        gate.release()
+
+@traced("call_openrouter")
+def call_openrouter(messages: list, model: str = DEFAULT_MODEL, temperature=0.2, timeout=120, use_cache=True,
+                    on_delta: Optional[Callable[[str], None]] = None,
+                    gate: Optional[threading.Semaphore] = None) -> str:
+    """
+    Envia as mensagens ao OpenRouter e devolve o texto da resposta.
+    Com use_cache=True, um prompt idêntico (mesmo modelo/temperatura) já respondido
+    é devolvido do cache local; use_cache=False força nova geração.
+    Se on_delta for informado, a resposta é pedida em streaming (SSE) e cada trecho
+    de texto é repassado a on_delta assim que chega; o texto final passa pelos
+    mesmos fallbacks da resposta completa.
+    `gate` limita as chamadas simultâneas ao OpenRouter (lote); respostas do cache não esperam por ele.
+    """
+    use_cache = use_cache and LLM_CACHE_ENABLED
+    if use_cache:
+        cached = get_cached_response(model, temperature, messages)
+        if cached is not None:
+            return cached
+
+    headers, payload = openrouter_request(messages, model, temperature, stream=on_delta is not None)
+    # "with" devolve a conexão ao pool mesmo em erro ou streaming interrompido
+    with _gated(gate, "fila.llm"):
+        inicio = time.perf_counter()
+        with get_session(OPENROUTER_ENDPOINT).post(OPENROUTER_ENDPOINT, headers=headers, json=payload,
+                                                   timeout=timeout, stream=on_delta is not None) as r:
+            logger.debug("OpenRouter status=%s", r.status_code)
+            logger.debug("OpenRouter headers=%s", dict(r.headers))
+            annotate(modelo=model, retentativas=retry_count(r))
+            r.raise_for_status()
+            if on_delta is not None:
+                j = _read_sse_stream(r, on_delta)
+            else:
+                j = r.json()
+    annotate(**llm_usage(j, messages))
+    if recording_enabled():
+        record_llm(payload, j, time.perf_counter() - inicio)
+    return response_text(j, model, temperature, messages)
+
+def response_text(j: Dict[str, Any], model: str, temperature: float, messages: list) -> str:
+    """Extrai o texto da resposta do OpenRouter (com fallbacks) e grava no cache."""
+    # Loga só um pedaço para não poluir
+    logger.debug("OpenRouter body (primeiros 600 chars): %s", json.dumps(j, ensure_ascii=False)[:600])
+
+    # Fallbacks defensivos
+    try:
+        message = j["choices"][0]["message"]
+        content = message.get("content", "")
+        # Geração cortada (ex.: "length" ao atingir max_tokens) não vai para o cache
+        finish_reason = j["choices"][0].get("finish_reason")
+        cacheable = LLM_CACHE_ENABLED and finish_reason in (None, "stop")
+        if finish_reason not in (None, "stop"):
+            logger.warning("OpenRouter encerrou a geração com finish_reason=%r: resposta possivelmente "
+                           "incompleta, não gravada no cache.", finish_reason)
+
+        # Se tem content válido, retorna
+        if content and content.strip():
+            if cacheable:
+                _llm_cache.put(model, temperature, messages, content)
+            return content
+
+        # Se não tem content, verifica se tem reasoning
+        reasoning = message.get("reasoning", "")
+        if reasoning and reasoning.strip():
+            logger.warning("Resposta sem 'content' mas com 'reasoning'. Usando reasoning como resposta.")
+            if cacheable:
+                _llm_cache.put(model, temperature, messages, reasoning)
+            return reasoning
+
+        # Se não tem nem content nem reasoning, tenta outros campos
+        alt_content = message.get("refusal") or message.get("tool_calls") or ""
+        if alt_content:
+            logger.warning("Usando campo alternativo da resposta.")
+            return str(alt_content)
+
+        logger.warning("Resposta completamente vazia. Retornando mensagem de erro.")
+        return "Erro: A API retornou uma resposta vazia. Tente novamente com um modelo diferente."
+
+    except Exception:
+        logger.exception("Falha ao interpretar resposta da LLM")
+        return f"Erro ao processar resposta da API:\n{json.dumps(j, ensure_ascii=False, indent=2)}"
+
+# =========================
+# Prompts grandes: divisão cronológica + map-reduce
+# =========================
+def split_decisoes_chronological(decisoes: List[Dict[str, Any]], max_tokens: int,
+                                 formato: Optional[str] = None) -> List[List[Dict[str, Any]]]:
+    """
+    Ordena as decisões por data (formato AAAA-MM-DD HH:MM:SS, ordenável como texto)
+    e as agrupa em blocos consecutivos de no máximo ~max_tokens cada, medidos no
+    formato de evidências do prompt de map.
+    """
+    formato = formato or config.PROMPT_EVIDENCE_FORMAT
+    ordenadas = sorted(decisoes, key=lambda dec: dec.get("dataHora") or "")
+    blocos: List[List[Dict[str, Any]]] = []
+    atual: List[Dict[str, Any]] = []
+    tokens_atual = 0
+    vistos: set = set()  # complementos já no bloco (no compacto, repetições viram referência #n)
+    for dec in ordenadas:
+        t = estimate_tokens(format_decision(dec, formato, vistos))
+        if atual and tokens_atual + t > max_tokens:
+            blocos.append(atual)
+            atual, tokens_atual, vistos = [], 0, set()
+            t = estimate_tokens(format_decision(dec, formato, vistos))
+        atual.append(dec)
+        tokens_atual += t
+    if atual:
+        blocos.append(atual)
+    return blocos
+
+def _periodo(bloco: List[Dict[str, Any]]) -> str:
+    inicio = (bloco[0].get("dataHora") or "?")[:10]
+    fim = (bloco[-1].get("dataHora") or "?")[:10]
+    return inicio if inicio == fim else f"{inicio} a {fim}"
+
+def build_map_messages(numero_cnj_fmt: str, dados: dict, bloco: List[Dict[str, Any]], indice: int, total: int,
+                       formato: Optional[str] = None) -> list:
+    """Prompt da etapa "map": extrai de um bloco de decisões só o que o relatório final usa."""
+    formato = formato or config.PROMPT_EVIDENCE_FORMAT
+    contexto = {"partes": dados.get("partes"), "decisoes": bloco}
+    sys = (
+        "Você é um assistente especializado em análise processual. "
+        "Responda SEMPRE em português brasileiro. Seja fiel ao texto: transcreva trechos literalmente, sem inventar."
+    )
+    user = f"""
+<contexto>
+Processo: {numero_cnj_fmt}
+Parte {indice} de {total} do histórico de movimentações (período {_periodo(bloco)}).
+
+{evidence_label(formato)}:
+{format_evidence(contexto, formato)}
+</contexto>
+
+<tarefa>
+Liste, em ordem cronológica, APENAS as decisões e despachos deste trecho que tratam de:
+- gratuidade da justiça / assistência judiciária (indique a quem foi concedida ou negada, com nomes quando houver);
+- perícia (designação, nomeação de perito, honorários periciais com valor, responsável e momento do pagamento).
+
+Para cada item, em Markdown: data, descrição do movimento, tema (gratuidade/perícia) e o trecho relevante entre aspas, transcrito literalmente.
+Se não houver nenhum item relevante, responda apenas: "Nenhuma decisão relevante neste período."
+</tarefa>
+"""
+    return [
+        {"role": "system", "content": sys},
+        {"role": "user", "content": user},
+    ]
+
+def build_reduce_messages(numero_cnj_fmt: str, dados: dict, resumos: List[Dict[str, str]],
+                          formato: Optional[str] = None) -> list:
+    """Prompt da etapa "reduce": mesmo prompt do relatório, com as decisões substituídas pelos resumos por período."""
+    reduzido = dict(dados)
+    reduzido["decisoes"] = []
+    reduzido["resumos_por_periodo"] = resumos
+    messages = build_messages_for_llm(numero_cnj_fmt, reduzido, formato)
+    messages[1]["content"] += (
+        "\n<observacao>\n"
+        "O histórico deste processo é extenso e foi analisado por períodos. As decisões e despachos relevantes "
+        "constam nos resumos por período (com trechos transcritos literalmente), e não na lista de decisões. "
+        "Utilize esses resumos como fonte das decisões para elaborar o relatório no formato acima.\n"
+        "</observacao>\n"
+    )
+    return messages
+
+def plan_report(numero_cnj_fmt: str, dados: dict, token_budget: Optional[int] = None,
+                formato: Optional[str] = None) -> Tuple[dict, list, List[List[Dict[str, Any]]]]:
+    """
+    Devolve (dados filtrados, prompt único, blocos). `blocos` vazio = uma única chamada;
+    caso contrário, o prompt excede o orçamento e os blocos seguem para o map-reduce.
+    """
+    if token_budget is None:
+        token_budget = config.LLM_PROMPT_TOKEN_BUDGET
+    filtrado = apply_prefilter(dados, formato=formato)
+    messages = build_messages_for_llm(numero_cnj_fmt, filtrado, formato)
+    estimativa = estimate_messages_tokens(messages)
+    if token_budget <= 0 or estimativa <= token_budget or len(filtrado["decisoes"]) < 2:
+        logger.info("Prompt estimado em ~%d tokens (orçamento %d).", estimativa, token_budget)
+        return filtrado, messages, []
+
+    blocos = split_decisoes_chronological(filtrado["decisoes"], config.LLM_CHUNK_TOKENS, formato)
+    logger.info("Prompt estimado em ~%d tokens excede o orçamento (%d): dividindo %d decisões em %d blocos.",
+                estimativa, token_budget, len(filtrado["decisoes"]), len(blocos))
+    return filtrado, messages, blocos
+
+def generate_report(numero_cnj_fmt: str, dados: dict, model: str = DEFAULT_MODEL, use_cache=True,
+                    on_delta: Optional[Callable[[str], None]] = None,
+                    token_budget: Optional[int] = None, formato: Optional[str] = None,
+                    checkpoint: Optional[Callable[[], None]] = None,
+                    gate: Optional[threading.Semaphore] = None) -> str:
+    """
+    Gera o relatório (sem o aviso de apenso). Se o prompt estimado exceder o orçamento
+    de tokens, as decisões são divididas em blocos cronológicos resumidos em paralelo
+    (map) e consolidadas em uma chamada final (reduce) no formato padrão.
+    checkpoint, se informado, é chamado antes de cada chamada à LLM (ver full_flow);
+    `gate` limita cada chamada (map e reduce) individualmente, como no pipeline assíncrono.
+    """
+    checkpoint = checkpoint or (lambda: None)
+    filtrado, messages, blocos = plan_report(numero_cnj_fmt, dados, token_budget, formato)
+    if not blocos:
+        checkpoint()
+        return call_openrouter(messages, model=model, use_cache=use_cache, on_delta=on_delta, gate=gate)
+
+    def _map(args):
+        indice, bloco = args
+        checkpoint()
+        msgs = build_map_messages(numero_cnj_fmt, filtrado, bloco, indice, len(blocos), formato)
+        resumo = call_openrouter(msgs, model=model, use_cache=use_cache, gate=gate)
+        logger.info("Bloco %d/%d (%s) resumido: %d caracteres.", indice, len(blocos), _periodo(bloco), len(resumo))
+        return {"periodo": _periodo(bloco), "resumo": resumo}
+
+    workers = max(1, min(config.LLM_MAP_CONCURRENCY, len(blocos)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="llm-map") as pool:
+        # Cada bloco roda com uma cópia do contexto (trace ativo) da thread que o submeteu
+        futures = [pool.submit(contextvars.copy_context().run, _map, args) for args in enumerate(blocos, start=1)]
+        resumos = [f.result() for f in futures]
+
+    reduce_msgs = build_reduce_messages(numero_cnj_fmt, filtrado, resumos, formato)
+    logger.info("Consolidando %d resumos (~%d tokens).", len(resumos), estimate_messages_tokens(reduce_msgs))
+    checkpoint()
+    return call_openrouter(reduce_msgs, model=model, use_cache=use_cache, on_delta=on_delta, gate=gate)
+
+# =========================
+# Pipeline alto nível
+# =========================
+def append_apenso_warning(dados: Dict[str, Any], rel: str) -> str:
+    """Reforça o aviso no relatório se for cumprimento + apenso."""
+    if dados.get("cumprimento") and dados.get("possivel_apenso"):
+        rel += "\n\nAviso: Processo de cumprimento possivelmente apensado. Talvez seja necessário consultar o processo originário para confirmar a AJG."
+    return rel
+
+def build_diagnostic_messages(dados: Dict[str, Any]) -> list:
+    """Prompt de sanidade do modo diagnóstico."""
+    return [
+        {"role": "system", "content": "Você é um analisador de sanidade. Responda sucintamente."},
+        {"role": "user", "content": f"Teste: recebi JSON com AT={len(dados['partes']['AT'])}, "
+                                     f"PA={len(dados['partes']['PA'])}, decs={len(dados['decisoes'])}. Diga 'OK' e ecoe os números."}
+    ]
+
+def full_flow(numero_raw: str, model: str, diagnostic_mode=False,
+              timings: Optional[Dict[str, float]] = None, use_cache=True,
+              on_delta: Optional[Callable[[str], None]] = None,
+              checkpoint: Optional[Callable[[], None]] = None) -> Tuple[Dict[str, Any], str]:
+    """
+    Executa o fluxo completo para um processo e retorna (dados, relatório).
+    Se `timings` for informado, é preenchido com a duração (s) de cada etapa.
+    use_cache=False ignora os caches locais e consulta os serviços novamente.
+    on_delta recebe os trechos do relatório durante a geração (streaming).
+    checkpoint é chamado entre as etapas e pode levantar uma exceção para interromper
+    o fluxo (cancelamento na interface); a requisição HTTP em curso não é abortada.
+    """
+    if timings is None:
+        timings = {}
+    checkpoint = checkpoint or (lambda: None)
+    with span("validate_config"):
+        ok_config, msg_config = validate_config()
+    if not ok_config:
+        raise RuntimeError(f"Falha na configuração: {msg_config}")
+    logger.info("Configuração validada.")
+
+    ok_cnj, d, msg_cnj = validate_cnj(numero_raw)
+    if not ok_cnj:
+        raise ValueError(f"CNJ inválido: {msg_cnj}")
+    cnj_fmt = format_cnj(d)
+    logger.info("CNJ normalizado: %s", cnj_fmt)
+
+    session = make_session()
+    t0 = time.perf_counter()
+    xml_text = consultar_processo(session, d, timeout=90, movimentos=True, incluir_docs=False,
+                                  debug=(logger.level==logging.DEBUG), use_cache=use_cache)
+    timings["soap"] = time.perf_counter() - t0
+    logger.info("XML recebido (%d chars).", len(xml_text))
+    checkpoint()
+
+    t0 = time.perf_counter()
+    dados = parse_xml_processo(xml_text)
+    timings["parse"] = time.perf_counter() - t0
+    logger.info("Dados extraídos: partes AT=%d, PA=%d; decisões=%d; classe=%s; cumprimento=%s; apenso? %s",
+                len(dados["partes"]["AT"]), len(dados["partes"]["PA"]), len(dados["decisoes"]),
+                dados["classeProcessual"], dados["cumprimento"], dados["possivel_apenso"])
+
+    t0 = time.perf_counter()
+    if diagnostic_mode:
+        checkpoint()
+        rel = call_openrouter(build_diagnostic_messages(dados), model=model, use_cache=use_cache, on_delta=on_delta)
+    else:
+        rel = generate_report(cnj_fmt, dados, model=model, use_cache=use_cache, on_delta=on_delta,
+                              checkpoint=checkpoint)
+    rel = append_apenso_warning(dados, rel)
+    timings["llm"] = time.perf_counter() - t0
+    logger.info("LLM respondeu com %d caracteres.", len(rel))
+    return dados, rel
@@ -0,0 +1,74 @@
+# scripts/prefilter.py
+# -*- coding: utf-8 -*-
+"""
+Pré-filtro local de relevância dos movimentos antes do prompt da LLM.
+O relatório só analisa gratuidade da justiça e perícia: movimentos são pontuados
+por regras de palavras-chave/regex e códigos (3 = decisão, 11009 = despacho).
+Movimentos relevantes seguem completos, decisões/despachos sem palavras-chave
+seguem com o complemento truncado e os demais são descartados do prompt.
+"""
+
+import re
+import copy
+import unicodedata
+from typing import Dict, Any, Tuple
+
+# Regras: (nome, regex sobre texto minúsculo e sem acentos, peso)
+RULES = [
+    ("gratuidade", re.compile(r"gratuidad|justica gratuita|assistencia judiciaria|\bajg\b|hipossuficien|isencao de custas"), 3),
+    ("pericia", re.compile(r"pericia|pericial|periciais|\bperit[oa]s?\b|\blaudo"), 3),
+    ("honorarios", re.compile(r"honorario"), 1),
+]
+CODIGOS_DECISAO = {"3", "11009"}
+PESO_CODIGO = 1
+
+# Pontuação mínima para manter o movimento com o complemento completo
+SCORE_RELEVANTE = 3
+# Complemento máximo (caracteres) para movimentos pouco relevantes mantidos no prompt
+COMPLEMENTO_MAX_CHARS = 300
+
+
+def _normalize(text: str) -> str:
+    decomposed = unicodedata.normalize("NFKD", text or "")
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def score_movimento(decisao: Dict[str, Any]) -> int:
+    """Pontua um movimento extraído por parse_xml_processo (descrição + complemento + código)."""
+    texto = _normalize(f"{decisao.get('descricao') or ''}\n{decisao.get('complemento') or ''}")
+    score = sum(peso for _, regex, peso in RULES if regex.search(texto))
+    if decisao.get("codigoPaiNacional") in CODIGOS_DECISAO:
+        score += PESO_CODIGO
+    return score
+
+
+def _truncate(text: str, limit: int) -> str:
+    if len(text) <= limit:
+        return text
+    return text[:limit].rstrip() + " [...]"
+
+
+def prefilter_dados(dados: Dict[str, Any], complemento_max_chars: int = COMPLEMENTO_MAX_CHARS) -> Tuple[Dict[str, Any], Dict[str, int]]:
+    """
+    Retorna (cópia de dados com as decisões filtradas, estatísticas).
+    O dict original não é alterado (continua disponível como "dados brutos").
+    """
+    filtrado = copy.copy(dados)
+    decisoes = []
+    stats = {"total": len(dados.get("decisoes", [])), "completos": 0, "truncados": 0, "descartados": 0}
+
+    for dec in dados.get("decisoes", []):
+        score = score_movimento(dec)
+        if score >= SCORE_RELEVANTE:
+            decisoes.append(dec)
+            stats["completos"] += 1
+        elif score > 0:
+            item = dict(dec)
+            item["complemento"] = _truncate(item.get("complemento") or "", complemento_max_chars)
+            decisoes.append(item)
+            stats["truncados"] += 1
+        else:
+            stats["descartados"] += 1
+
+    filtrado["decisoes"] = decisoes
+    return filtrado, stats
@@ -0,0 +1,78 @@
+# scripts/recording.py
+# -*- coding: utf-8 -*-
+"""
+Gravação das trocas com o TJ-MS (consultarProcesso) e o OpenRouter para reprodução offline.
+Com AJG_RECORD_DIR definido, cada resposta bem-sucedida vira um arquivo JSON
+("cassete") nessa pasta, com as credenciais mascaradas. O servidor local
+benchmarks/stub_server.py reproduz esses cassetes com latência e falhas
+configuráveis, permitindo medir lote, retentativas e a interface sem acessar
+os serviços reais.
+
+Cassetes:
+- soap_<numero>.json: envelope (mascarado), XML de resposta e latência original
+- llm_<chave>.json: payload (mensagens), resposta no formato sem stream e latência;
+  a chave é a mesma do cache da LLM (modelo + temperatura + mensagens)
+"""
+
+import os
+import html
+import json
+import time
+import logging
+import tempfile
+from typing import Any, Dict
+
+import config
+from scripts.llm_cache import LLMCache
+
+logger = logging.getLogger("RelatorioTJMS")
+
+
+def recording_enabled() -> bool:
+    return bool(config.RECORD_DIR)
+
+
+def mask_credentials(text: str) -> str:
+    """Remove do texto o usuário/senha do TJ-MS e a chave do OpenRouter."""
+    segredos = [("***USER***", config.TJ_WS_USER), ("***PASS***", config.TJ_WS_PASS),
+                ("***OPENROUTER_API_KEY***", config.OPENROUTER_API_KEY)]
+    for mascara, valor in segredos:
+        if valor:
+            text = text.replace(html.escape(valor), mascara).replace(valor, mascara)
+    return text
+
+
+def _write(nome: str, registro: Dict[str, Any]):
+    os.makedirs(config.RECORD_DIR, exist_ok=True)
+    registro["gravado_em"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+    conteudo = mask_credentials(json.dumps(registro, ensure_ascii=False, indent=1))
+    # Escrita atômica: o servidor de reprodução pode estar lendo a mesma pasta
+    fd, tmp = tempfile.mkstemp(dir=config.RECORD_DIR, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(conteudo)
+        os.replace(tmp, os.path.join(config.RECORD_DIR, nome))
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def record_soap(numero_processo: str, envelope: str, xml_text: str, segundos: float):
+    """Grava uma resposta consultarProcesso (falhas de gravação só geram aviso no log)."""
+    try:
+        _write(f"soap_{numero_processo}.json", {"tipo": "soap", "numero": numero_processo, "envelope": envelope,
+                                                "latencia": round(segundos, 3), "resposta": xml_text})
+    except OSError as e:
+        logger.warning("Falha ao gravar cassete SOAP de %s: %s", numero_processo, e)
+
+
+def record_llm(payload: Dict[str, Any], j: Dict[str, Any], segundos: float):
+    """Grava uma resposta do OpenRouter (em streaming, a resposta já montada)."""
+    chave = LLMCache.make_key(payload["model"], payload["temperature"], payload["messages"])
+    try:
+        _write(f"llm_{chave[:16]}.json", {"tipo": "llm", "chave": chave, "modelo": payload["model"],
+                                          "stream": bool(payload.get("stream")), "latencia": round(segundos, 3),
+                                          "messages": payload["messages"], "resposta": j})
+    except OSError as e:
+        logger.warning("Falha ao gravar cassete da LLM: %s", e)
@@ -0,0 +1,170 @@
+# scripts/soap_cache.py
+# -*- coding: utf-8 -*-
+"""
+Cache em disco das respostas SOAP consultarProcesso do TJ-MS.
+O XML bruto é gravado comprimido (gzip) em um arquivo cujo nome é o hash da
+chave (CNJ + flags movimentos/incluir_docs). Entradas expiram pelo TTL e o
+diretório é limitado em tamanho, descartando primeiro as menos usadas (LRU).
+O tamanho total é mantido em memória a cada gravação/remoção; a varredura do
+diretório só acontece na primeira gravação, quando o total passa do limite ou
+a cada SWEEP_INTERVAL (expirados nunca lidos, outros processos no mesmo diretório).
+"""
+
+import os
+import gzip
+import time
+import hashlib
+import logging
+import threading
+from typing import Optional
+
+logger = logging.getLogger("RelatorioTJMS")
+
+
+class SoapCache:
+    """
+    Cache LRU com TTL em disco.
+    - mtime do arquivo = momento da consulta ao TJ-MS (usado no TTL)
+    - atime do arquivo = último acesso (atualizado explicitamente, usado na evicção)
+    """
+
+    SUFFIX = ".xml.gz"
+    SWEEP_INTERVAL = 3600.0
+
+    def __init__(self, cache_dir: str, ttl_seconds: int = 6 * 3600, max_bytes: int = 200 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # Bytes em disco segundo este processo; None = ainda não varrido
+        self._total: Optional[int] = None
+        self._last_sweep = 0.0
+
+    @staticmethod
+    def make_key(numero_processo: str, movimentos: bool, incluir_docs: bool) -> str:
+        raw = f"{numero_processo}|movimentos={int(bool(movimentos))}|docs={int(bool(incluir_docs))}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], key + self.SUFFIX)
+
+    def get(self, numero_processo: str, movimentos: bool = True, incluir_docs: bool = False) -> Optional[str]:
+        """Retorna o XML em cache ou None se ausente/expirado."""
+        path = self._path(self.make_key(numero_processo, movimentos, incluir_docs))
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            return None
+
+        now = time.time()
+        if self.ttl_seconds > 0 and now - st.st_mtime > self.ttl_seconds:
+            self._discard(path)
+            return None
+
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                xml_text = f.read()
+        except (OSError, EOFError) as e:
+            logger.warning("Entrada de cache SOAP corrompida (%s); descartando.", e)
+            self._discard(path)
+            return None
+
+        # Marca o acesso para a política LRU sem alterar o momento da consulta
+        try:
+            os.utime(path, (now, st.st_mtime))
+        except OSError:
+            pass
+        return xml_text
+
+    def put(self, numero_processo: str, xml_text: str, movimentos: bool = True, incluir_docs: bool = False):
+        """Grava o XML no cache (escrita atômica) e aplica o limite de tamanho."""
+        path = self._path(self.make_key(numero_processo, movimentos, incluir_docs))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with gzip.open(tmp_path, "wt", encoding="utf-8", compresslevel=6) as f:
+                f.write(xml_text)
+            size = os.path.getsize(tmp_path)
+            with self._lock:
+                previous = self._size(path)
+                os.replace(tmp_path, path)
+                if self._total is not None:
+                    self._total += size - previous
+                sweep = (self._total is None or self._total > self.max_bytes
+                         or time.time() - self._last_sweep > self.SWEEP_INTERVAL)
+        except OSError as e:
+            logger.warning("Falha ao gravar cache SOAP: %s", e)
+            self._remove(tmp_path)
+            return
+        if sweep:
+            self.evict()
+
+    def invalidate(self, numero_processo: str, movimentos: bool = True, incluir_docs: bool = False):
+        self._discard(self._path(self.make_key(numero_processo, movimentos, incluir_docs)))
+
+    def evict(self):
+        """
+        Varre o diretório: remove entradas expiradas e, acima de max_bytes, as menos
+        usadas até 90% do limite; recalcula o total mantido em memória.
+        """
+        with self._lock:
+            self._last_sweep = time.time()
+            entries = []
+            total = 0
+            now = time.time()
+            for dirpath, _, filenames in os.walk(self.cache_dir):
+                for name in filenames:
+                    if not name.endswith(self.SUFFIX):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    if self.ttl_seconds > 0 and now - st.st_mtime > self.ttl_seconds:
+                        self._remove(path)
+                        continue
+                    entries.append((st.st_atime, st.st_size, path))
+                    total += st.st_size
+
+            if total > self.max_bytes:
+                # Desce até 90% do limite: com o cache cheio, a próxima varredura não vem na gravação seguinte
+                alvo = int(self.max_bytes * 0.9)
+                entries.sort()  # menos usado primeiro
+                for _, size, path in entries:
+                    if total <= alvo:
+                        break
+                    self._remove(path)
+                    total -= size
+                logger.debug("Cache SOAP reduzido para %d bytes.", total)
+            self._total = total
+
+    def clear(self):
+        for dirpath, _, filenames in os.walk(self.cache_dir):
+            for name in filenames:
+                if name.endswith(self.SUFFIX):
+                    self._remove(os.path.join(dirpath, name))
+        with self._lock:
+            self._total = None
+
+    def _discard(self, path: str):
+        """Remove uma entrada descontando-a do total em memória."""
+        with self._lock:
+            size = self._size(path)
+            self._remove(path)
+            if self._total is not None:
+                self._total = max(0, self._total - size)
+
+    @staticmethod
+    def _size(path: str) -> int:
+        try:
+            return os.path.getsize(path)
+        except OSError:
+            return 0
+
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,178 @@
+# scripts/tracing.py
+# -*- coding: utf-8 -*-
+"""
+Rastreamento leve por etapa (spans) de cada relatório.
+Um Trace agrupa os spans de um relatório: consulta ao TJ-MS, parser, montagem do
+prompt, chamada ao OpenRouter, renderização no Tk e exportações. O trace ativo é
+propagado por contextvars (threads de trabalho e tasks asyncio recebem o trace via
+use_trace); sem trace ativo, span() não registra nada e custa quase zero.
+
+Saídas:
+- Trace.summary(): resumo de uma linha para o painel de log
+- Trace.to_chrome() / export_trace(): arquivo JSON no formato Chrome Trace Event
+  (abrir em chrome://tracing ou https://ui.perfetto.dev)
+"""
+
+import os
+import re
+import json
+import sys
+import time
+import uuid
+import threading
+import functools
+import contextvars
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("ajg_trace", default=None)
+_current_span: contextvars.ContextVar[Optional[Dict[str, Any]]] = contextvars.ContextVar("ajg_span", default=None)
+
+
+def _lane() -> str:
+    """Faixa do span no trace: a task asyncio em execução ou a thread atual."""
+    # Sem asyncio importado não há task em execução (e o import custaria ~30 ms na abertura da interface)
+    asyncio = sys.modules.get("asyncio")
+    try:
+        task = asyncio.current_task() if asyncio is not None else None
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return f"task {task.get_name()}"
+    return threading.current_thread().name
+
+
+class Trace:
+    def __init__(self, name: str, **attrs: Any):
+        self.name = name
+        self.attrs = attrs
+        # Identificador do relatório nas linhas do log em arquivo (scripts/logfile.py)
+        self.id = uuid.uuid4().hex[:12]
+        self.started_at = datetime.now()
+        self._t0 = time.perf_counter()
+        self._spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._next_id = 0
+
+    def _start(self, name: str, attrs: Dict[str, Any]) -> Dict[str, Any]:
+        with self._lock:
+            self._next_id += 1
+            pai = _current_span.get()
+            sp = {"id": self._next_id, "parent": pai["id"] if pai else None, "name": name, "lane": _lane(),
+                  "start": time.perf_counter() - self._t0, "dur": None, "attrs": dict(attrs)}
+            self._spans.append(sp)
+        return sp
+
+    @property
+    def spans(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [dict(sp) for sp in self._spans if sp["dur"] is not None]
+
+    def duration(self) -> float:
+        spans = self.spans
+        if not spans:
+            return 0.0
+        return max(sp["start"] + sp["dur"] for sp in spans) - min(sp["start"] for sp in spans)
+
+    def totals(self) -> Dict[str, Dict[str, float]]:
+        """Duração somada e número de ocorrências por nome de span (ordem da primeira ocorrência)."""
+        totais: Dict[str, Dict[str, float]] = {}
+        for sp in sorted(self.spans, key=lambda s: s["start"]):
+            t = totais.setdefault(sp["name"], {"segundos": 0.0, "vezes": 0})
+            t["segundos"] += sp["dur"]
+            t["vezes"] += 1
+        return totais
+
+    def summary(self) -> str:
+        partes = []
+        for nome, t in self.totals().items():
+            vezes = f" ×{int(t['vezes'])}" if t["vezes"] > 1 else ""
+            partes.append(f"{nome} {t['segundos']:.2f}s{vezes}")
+        rotulo = self.attrs.get("processo") or self.name
+        return f"Tempos ({rotulo}): " + " · ".join(partes) + f" | total {self.duration():.2f}s"
+
+    def to_chrome(self) -> Dict[str, Any]:
+        """Eventos completos ("ph": "X") do formato Chrome Trace Event, em microssegundos."""
+        lanes: Dict[str, int] = {}
+        eventos = []
+        for sp in sorted(self.spans, key=lambda s: s["start"]):
+            tid = lanes.setdefault(sp["lane"], len(lanes) + 1)
+            eventos.append({"name": sp["name"], "cat": "ajg", "ph": "X", "pid": 1, "tid": tid,
+                            "ts": round(sp["start"] * 1e6), "dur": round(sp["dur"] * 1e6),
+                            "args": {k: v if isinstance(v, (int, float, bool, str)) else str(v)
+                                     for k, v in sp["attrs"].items()}})
+        for lane, tid in lanes.items():
+            eventos.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": lane}})
+        eventos.append({"name": "process_name", "ph": "M", "pid": 1, "tid": 0,
+                        "args": {"name": f"{self.name} {self.attrs.get('processo', '')}".strip()}})
+        return {"traceEvents": eventos, "displayTimeUnit": "ms",
+                "otherData": {"inicio": self.started_at.isoformat(timespec="seconds"), "relatorio": self.id,
+                              **{k: str(v) for k, v in self.attrs.items()}}}
+
+
+@contextmanager
+def use_trace(trace: Optional[Trace]) -> Iterator[Optional[Trace]]:
+    """Torna `trace` o trace ativo no contexto atual (thread ou task)."""
+    token = _current_trace.set(trace)
+    span_token = _current_span.set(None)
+    try:
+        yield trace
+    finally:
+        _current_span.reset(span_token)
+        _current_trace.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[Optional[Dict[str, Any]]]:
+    """
+    Mede o bloco como um span do trace ativo. Devolve o dict de atributos do span
+    (ou None sem trace ativo), para acrescentar dados descobertos durante a etapa.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+    sp = trace._start(name, attrs)
+    token = _current_span.set(sp)
+    inicio = time.perf_counter()
+    try:
+        yield sp["attrs"]
+    except BaseException as e:
+        sp["attrs"]["erro"] = type(e).__name__
+        raise
+    finally:
+        sp["dur"] = time.perf_counter() - inicio
+        _current_span.reset(token)
+
+
+def annotate(**attrs: Any):
+    """Acrescenta atributos ao span em andamento (ex.: tamanho do XML, tokens); sem trace ativo, nada faz."""
+    sp = _current_span.get()
+    if sp is not None:
+        sp["attrs"].update(attrs)
+
+
+def traced(name: str) -> Callable:
+    """Decorador: executa a função dentro de span(name)."""
+    def deco(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def export_trace(trace: Trace, directory: str) -> str:
+    """Grava o trace em `directory` (formato Chrome Trace Event) e devolve o caminho."""
+    os.makedirs(directory, exist_ok=True)
+    rotulo = re.sub(r"[^\w\-]", "_", str(trace.attrs.get("processo") or trace.name))
+    path = os.path.join(directory, f"trace_{rotulo}_{trace.started_at:%Y%m%d_%H%M%S}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(trace.to_chrome(), f, ensure_ascii=False)
+    return path